@@ -0,0 +1,55 @@
+"""Compares the full sweep with the adaptive sweep against the simulator: total queries, time and fill factor.
+
+Usage: python benchmarks/bench_adaptive.py [--latency 0.002] [--rep-num 5]
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from pythondaq.arduino_device import pool
+from pythondaq.pv_experiment import DiodeExperiment
+from latency import LatencyDevice
+
+
+def run(port, latency, sweep, **kwargs):
+    # every run starts on a fresh connection instead of one from the pool
+    pool.close_all()
+    with contextlib.redirect_stdout(io.StringIO()):
+        experiment = DiodeExperiment(port)
+    experiment.device.device = LatencyDevice(experiment.device.device, latency=latency)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        getattr(experiment, sweep)(**kwargs)
+    duration = time.perf_counter() - start
+
+    return {
+        "queries": experiment.device.device.queries,
+        "steps": experiment.n_steps,
+        "duration": duration,
+        "FF": experiment.FF,
+        "P_max": experiment.results["P"].max(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", default="ASRL::SIMPV::INSTR")
+    parser.add_argument("--latency", type=float, default=0.0, help="round-trip time per query in seconds")
+    parser.add_argument("--start", type=int, default=0)
+    parser.add_argument("--stop", type=int, default=1024)
+    parser.add_argument("--rep-num", type=int, default=5)
+    args = parser.parse_args()
+
+    sweep = {"start": args.start, "stop": args.stop, "rep_num": args.rep_num}
+    full = run(args.port, args.latency, "scan", **sweep)
+    adaptive = run(args.port, args.latency, "adaptive_scan", **sweep)
+
+    for name, result in (("full", full), ("adaptive", adaptive)):
+        print(f"{name:<10}{result['queries']:>8} queries {result['steps']:>6} steps {result['duration']:>8.2f} s   FF {result['FF']:.4f}   P_max {result['P_max']:.4g} W")
+    print(f"adaptive uses {adaptive['queries'] / full['queries']:.1%} of the queries, FF differs {abs(adaptive['FF'] - full['FF']) / full['FF']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
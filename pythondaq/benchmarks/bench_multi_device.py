@@ -0,0 +1,44 @@
+"""Measures how the sweep throughput scales with the amount of simulated Arduinos measured at once.
+
+Usage: python benchmarks/bench_multi_device.py [--latency 0.002]
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from pythondaq.arduino_device import pool
+from pythondaq.multi_device import MultiDeviceExperiment
+from latency import LatencyDevice
+
+PORTS = ["ASRL::SIMPV::INSTR", "ASRL::SIMPV_BRIGHT::INSTR", "ASRL::SIMLED::INSTR"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.002, help="round-trip time per query in seconds")
+    parser.add_argument("--steps", type=int, default=100)
+    parser.add_argument("--rep-num", type=int, default=5)
+    args = parser.parse_args()
+
+    single = None
+    for amount in range(1, len(PORTS) + 1):
+        # every run starts on fresh connections instead of ones from the pool
+        pool.close_all()
+        with contextlib.redirect_stdout(io.StringIO()):
+            experiment = MultiDeviceExperiment(PORTS[:amount])
+        for single_experiment in experiment.experiments.values():
+            single_experiment.device.device = LatencyDevice(single_experiment.device.device, latency=args.latency)
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            df = experiment.scan(500, 500 + args.steps, args.rep_num)
+        duration = time.perf_counter() - start
+
+        throughput = len(df) / duration
+        single = single or throughput
+        print(f"{amount} device(s) {duration:>7.2f} s {throughput:>8.1f} steps/s   speedup {throughput / single:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
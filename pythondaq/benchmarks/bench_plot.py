@@ -0,0 +1,101 @@
+"""Measures the frame time of daqGUI.plot_func while a sweep grows, against the old clear-and-redraw.
+
+Usage: QT_QPA_PLATFORM=offscreen python benchmarks/bench_plot.py [--points 1024]
+"""
+import argparse
+import time
+
+import numpy as np
+import pyqtgraph as pg
+from PySide6 import QtWidgets
+
+from pythondaq.analysis import derive_quantities
+from pythondaq.daqGUI import UserInterface
+
+
+class FakeExperiment:
+    """holds a precomputed sweep and reveals one more step every frame"""
+    def __init__(self, points, rep_num=5):
+        rng = np.random.default_rng(0)
+        self.samples = rng.uniform(0.1, 2.0, size=(points, rep_num, 2))
+        self.adc_codes = np.arange(points)
+        self.all_results = derive_quantities(self.samples, self.adc_codes)
+        self.n_steps = 0
+
+    @property
+    def results(self):
+        return self.all_results[:self.n_steps]
+
+    def rows_since(self, sequence):
+        return self.n_steps, self.all_results[sequence:self.n_steps]
+
+    def __getattr__(self, name):
+        # list_U_pv and friends, like DiodeExperiment
+        return self.results[name[len("list_"):]]
+
+
+def legacy_plot(ui):
+    """the clear-and-redraw plot_func this benchmark compares against"""
+    experiment = ui.experiment
+    for widget, x, y in ((ui.plot_widget, "list_U_pv", "list_I_pv"), (ui.plot_R_V_widget, "list_U_0", "list_R"), (ui.plot_P_R_widget, "list_R", "list_P")):
+        widget.clear()
+        widget.plot(x=list(getattr(experiment, x)), y=list(getattr(experiment, y)), symbol='o', pen=None)
+
+    error = pg.ErrorBarItem()
+    error.setData(
+        x=np.array(list(experiment.list_U_pv)), y=np.array(list(experiment.list_I_pv)),
+        left=np.array(list(experiment.list_U_err)), right=np.array(list(experiment.list_U_err)),
+        top=np.array(list(experiment.list_I_err)), bottom=np.array(list(experiment.list_I_err)),
+    )
+    ui.plot_widget.addItem(error)
+    error_R = pg.ErrorBarItem()
+    error_R.setData(
+        x=np.array(list(experiment.list_U_0)), y=np.array(list(experiment.list_R)),
+        top=np.array(list(experiment.list_R_err)), bottom=np.array(list(experiment.list_R_err)),
+    )
+    ui.plot_R_V_widget.addItem(error_R)
+    error_P = pg.ErrorBarItem()
+    error_P.setData(
+        x=np.array(list(experiment.list_R)), y=np.array(list(experiment.list_P)),
+        left=np.array(list(experiment.list_R_err)), right=np.array(list(experiment.list_R_err)),
+        top=np.array(list(experiment.list_P_err)), bottom=np.array(list(experiment.list_P_err)),
+    )
+    ui.plot_P_R_widget.addItem(error_P)
+
+
+def measure(app, ui, plot, points):
+    """returns the time per frame, including the repaint, for every amount of points"""
+    ui.experiment = FakeExperiment(points)
+    ui.plotted_steps = None
+    frame_times = []
+    for n in range(1, points + 1):
+        ui.experiment.n_steps = n
+        start = time.perf_counter()
+        plot()
+        ui.tab_widget.currentWidget().repaint()
+        app.processEvents()
+        frame_times.append(time.perf_counter() - start)
+    return np.array(frame_times)
+
+
+def report(name, frame_times):
+    tail = frame_times[-100:]
+    print(f"{name:<14} mean {frame_times.mean() * 1e3:7.2f} ms   last 100 frames {tail.mean() * 1e3:7.2f} ms   p99 {np.percentile(frame_times, 99) * 1e3:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, default=1024)
+    args = parser.parse_args()
+
+    app = QtWidgets.QApplication([])
+    ui = UserInterface()
+    ui.plot_timer.stop()
+    ui.show()
+
+    report("incremental", measure(app, ui, ui.plot_func, args.points))
+    report("clear-redraw", measure(app, ui, lambda: legacy_plot(ui), args.points))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Compares per-query reads with the batched read_channels and sweep against the simulator.
+
+Usage: python benchmarks/bench_read_channels.py [--latency 0.002] [--repeats 20] [--baud 115200]
+"""
+import argparse
+import os
+import sys
+import time
+
+from pythondaq.arduino_device import ArduinoVISADevice
+from latency import LatencyDevice
+
+# the stand-in for the optional firmware commands is kept with the tests
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests"))
+from stand_in import StandInDevice
+
+
+def per_query(device, steps, repeats):
+    for step in range(steps):
+        device.set_output_value(500 + step)
+        for _ in range(repeats):
+            device.get_output_voltage(channel=1)
+            device.get_output_voltage(channel=2)
+
+
+def batched(device, steps, repeats):
+    for step in range(steps):
+        device.set_output_value(500 + step)
+        device.read_channels([1, 2], repeats=repeats)
+
+
+def swept(device, steps, repeats):
+    for _ in device.sweep(range(500, 500 + steps), [1, 2], repeats):
+        pass
+
+
+def run(name, function, port, latency, baud, pipelined, steps, repeats, capabilities=None):
+    device = ArduinoVISADevice(port)
+    if capabilities:
+        # the stand-in answers MEAS:CHn:BURST? and MEAS:BIN? like firmware with on-board oversampling and binary frames
+        device.device = StandInDevice(port, capabilities=capabilities)
+    device.device = LatencyDevice(device.device, latency=latency, baud=baud)
+    device.pipelined = pipelined
+
+    start = time.perf_counter()
+    function(device, steps, repeats)
+    duration = time.perf_counter() - start
+
+    queries = device.device.queries
+    samples = steps * repeats * 2
+    print(f"{name:<24}{queries:>8} queries {duration:>8.3f} s {queries / duration:>10.1f} queries/s {samples / duration:>10.1f} samples/s")
+    device.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", default="ASRL::SIMPV::INSTR")
+    parser.add_argument("--latency", type=float, default=0.002, help="round-trip time per query in seconds")
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--baud", type=int, default=115200, help="speed of the serial line, 0 for no transfer time")
+    args = parser.parse_args()
+
+    run("per query", per_query, args.port, args.latency, args.baud, False, args.steps, args.repeats)
+    run("read_channels", batched, args.port, args.latency, args.baud, False, args.steps, args.repeats)
+    run("read_channels pipelined", batched, args.port, args.latency, args.baud, True, args.steps, args.repeats)
+    run("sweep pipelined", swept, args.port, args.latency, args.baud, True, args.steps, args.repeats)
+    run("read_channels burst", batched, args.port, args.latency, args.baud, False, args.steps, args.repeats, capabilities=["BURST"])
+    run("read_channels binary", batched, args.port, args.latency, args.baud, False, args.steps, args.repeats, capabilities=["BURST", "BIN"])
+
+
+if __name__ == "__main__":
+    main()
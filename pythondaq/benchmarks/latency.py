@@ -0,0 +1,87 @@
+"""Latency model for benchmarking the Arduino against the nsp2visasim simulator.
+
+The simulator answers instantly (apart from a 1 ms sleep per measurement), a
+real Arduino behind a USB-serial bridge does not. This wrapper adds a fixed
+round-trip latency, with optional random jitter, to every reply and supports
+write/read so pipelined queries can overlap their latencies like they do on a
+serial line. With a baud rate every reply also takes the time its bytes need
+on the line, so shorter replies arrive sooner.
+"""
+import collections
+import random
+import time
+
+
+class LatencyDevice:
+    """wraps a (simulated) VISA resource and delays every reply by [latency] seconds
+    """
+    def __init__(self, device, latency=0.002, jitter=0.0, seed=None, baud=None):
+        """Sets up the wrapper
+
+        Args:
+            device (object): the VISA resource or SimulatedDevice to wrap
+            latency (float): the round-trip time of one query in seconds
+            jitter (float): every round-trip takes up to this many seconds longer or shorter, never below zero
+            seed (integer): seed of the jitter, for repeatable runs
+            baud (integer): the speed of the serial line in bits per second, 10 bits per byte, replies take no time if not given
+        """
+        self.device = device
+        self.latency = latency
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self.queries = 0
+        self.baud = baud
+        self._pending = collections.deque()
+        self._received = bytearray()
+
+    def _round_trip(self, reply=""):
+        transfer = 0.0
+        if self.baud:
+            size = len(reply) if isinstance(reply, bytes) else len(reply) + 2
+            transfer = size * 10 / self.baud
+        if not self.jitter:
+            return self.latency + transfer
+        return max(self.latency + self._random.uniform(-self.jitter, self.jitter), 0.0) + transfer
+
+    def _wait_until(self, moment):
+        remaining = moment - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def query(self, command):
+        """sends a command and waits a full round-trip for the reply
+        """
+        self.queries += 1
+        sent = time.perf_counter()
+        reply = self.device.query(command)
+        self._wait_until(sent + self._round_trip(reply))
+        return reply
+
+    def write(self, command):
+        """sends a command without waiting, the reply arrives [latency] seconds later
+        """
+        self.queries += 1
+        sent = time.perf_counter()
+        reply = self.device.query(command)
+        self._pending.append((sent + self._round_trip(reply), reply))
+
+    def read(self):
+        """returns the oldest outstanding reply as soon as it has arrived
+        """
+        arrival, reply = self._pending.popleft()
+        self._wait_until(arrival)
+        return reply
+
+    def read_bytes(self, count):
+        """returns [count] bytes of the outstanding replies, waiting for the replies they are part of
+        """
+        while len(self._received) < count:
+            arrival, reply = self._pending.popleft()
+            self._wait_until(arrival)
+            self._received += reply if isinstance(reply, bytes) else f"{reply}\r\n".encode()
+        data = bytes(self._received[:count])
+        del self._received[:count]
+        return data
+
+    def close(self):
+        self.device.close()
@@ -0,0 +1,176 @@
+"""Acquisition and GUI benchmark suite against the nsp2visasim simulator, with results as JSON.
+
+Runs DiodeExperiment.scan for every combination of sweep range and rep_num
+behind a LatencyDevice, and daqGUI.UserInterface.plot_func for growing point
+counts. Keep the JSON files to compare runs over time.
+
+Usage: QT_QPA_PLATFORM=offscreen python benchmarks/suite.py --latency 0.002 --jitter 0.0005 --output bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+
+from pythondaq.arduino_device import pool
+from pythondaq.pv_experiment import DiodeExperiment
+from latency import LatencyDevice
+
+
+def percentiles(values):
+    """gives the percentiles that the report shows, in ms"""
+    if len(values) == 0:
+        return {}
+    return {f"p{q}": float(np.percentile(values, q) * 1e3) for q in (50, 90, 99)}
+
+
+def prepare_scan(port, latency, jitter, seed):
+    """opens the Arduino on a fresh connection instead of one from the pool, behind a LatencyDevice"""
+    pool.close_all()
+    with contextlib.redirect_stdout(io.StringIO()):
+        experiment = DiodeExperiment(port)
+    experiment.device.device = LatencyDevice(experiment.device.device, latency=latency, jitter=jitter, seed=seed)
+    return experiment
+
+
+def bench_scan(port, start, stop, rep_num, latency, jitter, seed):
+    """times one sweep and returns its statistics, the peak memory is measured in a second sweep because tracing
+    every allocation slows the sweep down"""
+    experiment = prepare_scan(port, latency, jitter, seed)
+
+    # records the moment every step is published
+    step_times = []
+    publish_step = experiment._publish_step
+    def timed_publish_step(*args):
+        publish_step(*args)
+        step_times.append(time.perf_counter())
+    experiment._publish_step = timed_publish_step
+
+    begin = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        experiment.scan(start, stop, rep_num)
+    duration = time.perf_counter() - begin
+    queries = experiment.device.device.queries
+    steps = experiment.n_steps
+
+    experiment = prepare_scan(port, latency, jitter, seed)
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        experiment.scan(start, stop, rep_num)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "start": start,
+        "stop": stop,
+        "rep_num": rep_num,
+        "steps": steps,
+        "duration_s": duration,
+        "queries": queries,
+        "queries_per_s": queries / duration,
+        "step_latency_ms": percentiles(np.diff([begin] + step_times)),
+        "peak_memory_bytes": peak_memory,
+    }
+
+
+def bench_gui(points):
+    """measures the frame time of plot_func for growing point counts"""
+    from PySide6 import QtWidgets
+    from pythondaq.daqGUI import UserInterface
+    from bench_plot import measure
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    ui = UserInterface()
+    ui.plot_timer.stop()
+    ui.show()
+
+    results = []
+    for amount in points:
+        frame_times = measure(app, ui, ui.plot_func, amount)
+        results.append({
+            "points": amount,
+            "frame_time_mean_ms": float(frame_times.mean() * 1e3),
+            # the last frames draw the most points
+            "frame_time_last_ms": float(frame_times[-10:].mean() * 1e3),
+            "frame_time_ms": percentiles(frame_times),
+        })
+    ui.close()
+    return results
+
+
+def warm_up(port):
+    """runs one short sweep that isn't timed, so the first row doesn't pay for importing pandas and filling caches"""
+    # the dataframe of a scan imports pandas lazily
+    import pandas
+
+    pool.close_all()
+    with contextlib.redirect_stdout(io.StringIO()):
+        DiodeExperiment(port).scan(500, 510, 1)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_range(text):
+    start, stop = text.split(":")
+    return int(start), int(stop)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", default="ASRL::SIMPV::INSTR")
+    parser.add_argument("--latency", type=float, default=0.002, help="round-trip time per query in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random spread of the round-trip time in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ranges", default="500:600,0:1024", help="comma separated start:stop sweep ranges in ADC")
+    parser.add_argument("--rep-nums", default="1,5,20", help="comma separated rep_num values")
+    parser.add_argument("--points", default="256,1024", help="comma separated point counts for the GUI frame time, empty to skip")
+    parser.add_argument("--output", default="", help="file to write the JSON report to, stdout if empty")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "port": args.port,
+            "latency_s": args.latency,
+            "jitter_s": args.jitter,
+        },
+        "scan": [],
+        "gui": [],
+    }
+
+    warm_up(args.port)
+    for sweep in args.ranges.split(","):
+        start, stop = parse_range(sweep)
+        for rep_num in map(int, args.rep_nums.split(",")):
+            result = bench_scan(args.port, start, stop, rep_num, args.latency, args.jitter, args.seed)
+            report["scan"].append(result)
+            print(f"scan {start}:{stop} rep_num {rep_num:>3}: {result['duration_s']:8.2f} s {result['queries_per_s']:8.1f} queries/s", flush=True)
+
+    if args.points:
+        report["gui"] = bench_gui([int(amount) for amount in args.points.split(",")])
+        for result in report["gui"]:
+            print(f"plot {result['points']:>6} points: {result['frame_time_last_ms']:7.2f} ms per frame at the end", flush=True)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# calculates the derived values of a sweep from its raw samples, used by the experiment and by saved captures
+import numpy as np
+from pythondaq.calibration import ADC_RESOLUTION, DIVIDER, R_SENSE
+
+# the values derived for every ADC step
+RESULT_DTYPE = np.dtype([
+    ("U_pv", float), ("U_0", float), ("I_pv", float), ("R", float), ("P", float),
+    ("U_err", float), ("I_err", float), ("R_err", float), ("P_err", float),
+])
+
+
+def derive_quantities(samples, adc_codes):
+    """calculates the voltage, current, resistance, power and their errors for all ADC steps at once
+
+    Args:
+        samples (numpy array): the voltages of channel 1 and 2 with shape (steps, rep_num, 2), repetitions that weren't measured are nan
+        adc_codes (numpy array): the output value in ADC of every step
+
+    Returns:
+        numpy array: a record array with the fields of RESULT_DTYPE, one record per step
+    """
+    U_1 = samples[..., 0]
+    U_2 = samples[..., 1]
+    P_n = U_1 * U_2
+    # resistance over photocell effectively same as resistance of transistor, 5000 Ohm if no current flows
+    with np.errstate(divide="ignore", invalid="ignore"):
+        R_n = np.where(U_2 != 0, U_1 * DIVIDER * R_SENSE / U_2, 5000)
+
+    results = np.empty(len(samples), dtype=RESULT_DTYPE)
+    # voltage on channel 1 (U_1) is a third of voltage over photocell
+    results["U_pv"] = DIVIDER * np.nanmean(U_1, axis=1)
+    results["U_err"] = DIVIDER * np.nanstd(U_1, axis=1)
+    # current over resistor of 4.7 Ohm with voltage of channel 2 (U_2)
+    results["I_pv"] = np.nanmean(U_2, axis=1) / R_SENSE
+    results["I_err"] = np.nanstd(U_2, axis=1) / R_SENSE
+    results["R"] = np.nanmean(R_n, axis=1)
+    results["R_err"] = np.nanstd(R_n, axis=1)
+    results["P"] = np.nanmean(P_n, axis=1)
+    results["P_err"] = np.nanstd(P_n, axis=1)
+    results["U_0"] = adc_codes * ADC_RESOLUTION
+    return results
+
+
+def results_from_table(U_pv, U_err, I_pv, I_err, R, U_0=None):
+    """rebuilds the derived values from the columns of a saved measurement, which only keeps U_pv, I_pv, R and their errors.
+    The power is taken as U_pv * I_pv with the error propagated from U_err and I_err
+
+    Args:
+        U_pv (numpy array): the voltage over the photocell per step
+        U_err (numpy array): the error on U_pv
+        I_pv (numpy array): the current through the photocell per step
+        I_err (numpy array): the error on I_pv
+        R (numpy array): the resistance per step
+        U_0 (numpy array): the output voltage per step, nan if not given
+
+    Returns:
+        numpy array: a record array with the fields of RESULT_DTYPE, R_err is nan because it isn't saved
+    """
+    results = np.empty(len(U_pv), dtype=RESULT_DTYPE)
+    results["U_pv"], results["U_err"] = U_pv, U_err
+    results["I_pv"], results["I_err"] = I_pv, I_err
+    results["R"] = R
+    results["R_err"] = np.nan
+    results["P"] = U_pv * I_pv
+    results["P_err"] = np.hypot(I_pv * U_err, U_pv * I_err)
+    results["U_0"] = np.nan if U_0 is None else U_0
+    return results
+
+
+def maximum_power_point(results):
+    """finds the step with the largest power
+
+    Args:
+        results (numpy array): record array as returned by derive_quantities
+
+    Returns:
+        dict: the voltage U_mpp and current I_mpp at the maximum power P_max and its error P_max_err, nan without results
+    """
+    if len(results) == 0:
+        return {"U_mpp": np.nan, "I_mpp": np.nan, "P_max": np.nan, "P_max_err": np.nan}
+    best = np.nanargmax(results["P"])
+    return {
+        "U_mpp": results["U_pv"][best],
+        "I_mpp": results["I_pv"][best],
+        "P_max": results["P"][best],
+        "P_max_err": results["P_err"][best],
+    }
+
+
+def fill_factor(results):
+    """calculates the fill factor from the derived values of a sweep
+
+    Args:
+        results (numpy array): record array as returned by derive_quantities
+
+    Returns:
+        float: the maximum power divided by the product of the short-circuit current and open voltage, nan without results
+            or when that product is 0, like for a sweep in the dark
+    """
+    # a scan that was stopped before its first step has no fill factor
+    if len(results) == 0:
+        return np.nan
+    P_max = results["P"].max()
+    I_oc = results["I_pv"][-1]
+    U_oc = results["U_pv"][0]
+    # without current or voltage the fill factor isn't defined
+    if I_oc * U_oc == 0 or not np.isfinite(I_oc * U_oc):
+        return np.nan
+    return P_max / (I_oc * U_oc)
+
+
+def sweep_summary(results):
+    """gives the numbers that describe a whole sweep, in the same way as fill_factor
+
+    Args:
+        results (numpy array): record array as returned by derive_quantities, in order of ADC value
+
+    Returns:
+        dict: the fill factor FF, the maximum power P_max, the open voltage U_oc and the short-circuit current I_sc, nan without results
+    """
+    if len(results) == 0:
+        return {"FF": np.nan, "P_max": np.nan, "U_oc": np.nan, "I_sc": np.nan}
+    return {
+        "FF": fill_factor(results),
+        "P_max": results["P"].max(),
+        "U_oc": results["U_pv"][0],
+        "I_sc": results["I_pv"][-1],
+    }
+
+
+def sort_by_adc(results):
+    """puts the derived values in order of ADC value, steps of an adaptive sweep are measured out of order
+
+    Args:
+        results (numpy array): record array as returned by derive_quantities
+
+    Returns:
+        numpy array: a sorted copy of the results
+    """
+    return results[np.argsort(results["U_0"], kind="stable")]
+
+
+def results_dataframe(results):
+    """turns the derived values into the dataframe that is saved as .csv file
+
+    Args:
+        results (numpy array): record array as returned by derive_quantities
+
+    Returns:
+        pandas DataFrame: the columns of the saved measurements (U pv, U ERR, I pv, I ERR and R)
+    """
+    # pandas is only needed here, importing it takes longer than the rest of the experiment
+    import pandas as pd
+
+    dictionary = {"U pv": results["U_pv"], "U ERR": results["U_err"], "I pv": results["I_pv"], "I ERR": results["I_err"], "R": results["R"]}
+    return pd.DataFrame(dictionary)
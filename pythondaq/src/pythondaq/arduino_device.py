@@ -1,83 +1,709 @@
-try:
-    from nsp2visasim import sim_pyvisa as pyvisa
-except ModuleNotFoundError:
-    import pyvisa
-
-import time
-
-
-class ArduinoVISADevice:
-    """this class turns the Arduino on and allows the user to perform action
-    """
-    # 
-    def __init__(self,port):
-        """tuns the Arduino on
-
-        Args:
-            port (string): fill in the USB-port to turn the Arduino on
-        """
-        self.rm = pyvisa.ResourceManager("@py")
-        self.port = port
-        self.device = self.rm.open_resource(
-        self.port, read_termination="\r\n", write_termination="\n"
-        )
-        self.value = 0
-
-    def get_identification(self):
-        """gives the identification of the Arduino
-        """
-        return self.device.query("*IDN?")
-
-    def set_output_value(self,value):
-        """turns the light on at the given value and remembers that value in ADC and Volt
-
-        Args:
-            value (integer): the value in ADC that will be used to turn the light on and off
-        """
-        self.value = value
-        self.voltage = float(value) * (3.3/1023)
-        self.device.query(f"OUT:CH0 {self.value}")
-
-    def get_output_value(self):
-        """gives the ouput value in ADC
-        """
-        return self.device.query(f"MEAS:CH0?")
-
-    def get_output_voltage(self, channel):
-        """returns the ouput value in Volt in a given channel
-
-        Args:
-            channel (integer): the channel number to find the output value from
-        """
-        return float(self.device.query(f"MEAS:CH{channel}?")) * (3.3/1023)
-
-    def get_input_value(self,channel):
-        """returns the input value in ADC in a given channel
-
-        Args:
-            channel (integer): the channel number to find the input value from
-        """	
-        return self.device.query(f"MEAS:CH{channel}?")
-
-    def get_input_voltage(self,channel):
-        """returns the input value in Volt in a given channel
-
-        Args:
-            channel (integer): the channel number to find the input value from
-        """	
-        return float(self.device.query(f"MEAS:CH{channel}?")) * (3.3 / 1023)
-
-    def close(self):
-        "Turns off the device"
-        self.device.query(f"OUT:CH0 0")
-        self.device.close()
-
-def list_devices():
-    """"gives the USB-port in which the Arduino has been put
-
-    Returns:
-        string: the name of the USB-port(s) where the Arduino is in
-    """
-    rm = pyvisa.ResourceManager("@py")
-    ports = rm.list_resources()
-    return ports
+try:
+    from nsp2visasim import sim_pyvisa as pyvisa
+except ModuleNotFoundError:
+    import pyvisa
+
+import collections
+import itertools
+import re
+import threading
+import time
+import numpy as np
+from pythondaq.calibration import ADC_RESOLUTION, CalibrationStore, check_codes
+from pythondaq.emulator import emulated_resources
+from pythondaq.frames import HEADER_SIZE, read_codes, read_header
+from pythondaq.telemetry import telemetry
+
+# the resource manager is made once per process, making one enumerates the whole bus
+_resource_manager = None
+_resource_manager_lock = threading.Lock()
+
+# the result of the last list_devices call and when it was made
+_device_list = None
+_device_list_time = 0.0
+
+
+def get_resource_manager():
+    """gives the resource manager of this process, it is only made the first time
+
+    Returns:
+        ResourceManager: the pyvisa resource manager with the pyvisa-py backend
+    """
+    global _resource_manager
+    with _resource_manager_lock:
+        if _resource_manager is None:
+            _resource_manager = pyvisa.ResourceManager("@py")
+        return _resource_manager
+
+
+class ArduinoVISADevice:
+    """this class turns the Arduino on and allows the user to perform action
+    """
+    # 
+    def __init__(self,port, calibration_path=None):
+        """tuns the Arduino on
+
+        Args:
+            port (string): fill in the USB-port to turn the Arduino on
+            calibration_path (string): the calibration store that the conversion to Volt is read from, calibration.DEFAULT_PATH if not given
+        """
+        self.rm = get_resource_manager()
+        self.port = port
+        self.device = self.rm.open_resource(
+        self.port, read_termination="\r\n", write_termination="\n"
+        )
+        self.value = 0
+
+        # amount of commands that may be sent ahead of their replies, the
+        # serial buffer of the Arduino only holds 64 bytes so keep this small
+        self.pipeline_depth = 4
+        self.pipelined = None
+
+        # the optional firmware features, read from *IDN? when first needed
+        self._capabilities = None
+        # the largest amount of samples that the firmware returns in one burst
+        self.burst_size = 250
+
+        # whether measurments are read as binary frames, set from the capabilities when first needed
+        # and can be set to False to keep the text protocol
+        self.binary = None
+        # the sequence number of the last binary frame
+        self._sequence = None
+
+        # the lookup table from ADC codes to Volt, read from the calibration store when first needed
+        self.calibration_path = calibration_path
+        self._calibration = None
+        # the reply to *IDN?, the marker that the stream is found back by after a garbled or missing reply
+        self._identification = None
+
+        # a reply that takes longer than [timeout] seconds is missing, a failed query or reading is tried [retries]
+        # times more with a wait of [backoff] seconds that doubles every time
+        self._timeout = None
+        self.timeout = 1.0
+        self.retries = 2
+        self.backoff = 0.05
+        # an event that ends a measurement between two queries when it is set, like the stop_event of an experiment
+        self.cancel_event = None
+
+    @property
+    def timeout(self):
+        """the time in seconds that the Arduino gets to answer a query
+        """
+        return self._timeout
+
+    @timeout.setter
+    def timeout(self, timeout):
+        self._timeout = timeout
+        # the simulator has no timeout, a real VISA resource takes it in ms
+        if hasattr(self.device, "timeout"):
+            self.device.timeout = timeout * 1000
+
+    def query(self, command):
+        """sends a command to the Arduino and returns its reply, tries again when the reply doesn't come in time
+
+        Args:
+            command (string): the command to send
+
+        Returns:
+            string: the reply of the Arduino
+        """
+        return self._with_retries(lambda: self._query_once(command))
+
+    def _query_once(self, command):
+        """sends a command and returns its reply, timed when the telemetry is on"""
+        telemetry.count("visa.queries")
+        with telemetry.timer("visa.query"):
+            return self.device.query(command)
+
+    def _with_retries(self, operation):
+        """calls [operation] and calls it again when the Arduino doesn't answer in time or answers something that can't
+        be read, after finding the stream back with resync. The error of the last try is raised
+
+        Args:
+            operation (callable): sends the commands, reads and checks the replies
+
+        Returns:
+            object: what the operation returns
+        """
+        for attempt in range(self.retries + 1):
+            started = time.perf_counter()
+            try:
+                if attempt:
+                    with telemetry.timer("visa.recover"):
+                        self._wait(self.backoff * 2 ** (attempt - 1))
+                        self.resync()
+                return operation()
+            except (pyvisa.errors.VisaIOError, ValueError) as error:
+                # the time of a try that failed, with the wait for a reply that didn't come
+                telemetry.observe("visa.lost", time.perf_counter() - started)
+                telemetry.count("visa.timeouts" if isinstance(error, pyvisa.errors.VisaIOError) else "visa.bad_replies")
+                if attempt == self.retries:
+                    telemetry.count("visa.failures")
+                    raise
+                telemetry.count("visa.retries")
+
+    def resync(self):
+        """finds the start of the next reply again after a reply went missing or was garbled. *IDN? is sent and everything
+        up to its reply is thrown away, the replies that were late or still in flight with it. Without a known identification
+        everything that arrives within 50 ms is thrown away
+        """
+        telemetry.count("visa.resyncs")
+        # the frame after a resync may follow any frame
+        self._sequence = None
+        if not hasattr(self.device, "read_raw"):
+            return
+        if self._identification is None:
+            previous = self.timeout
+            self.timeout = 0.05
+            try:
+                while True:
+                    self.device.read_raw()
+            except pyvisa.errors.VisaIOError:
+                pass
+            finally:
+                self.timeout = previous
+            return
+        marker = self._identification.encode()
+        self.device.write("*IDN?")
+        # binary frames don't end in the termination, they may arrive glued to the front of the marker
+        while not self.device.read_raw().rstrip(b"\r\n").endswith(marker):
+            pass
+
+    def _wait(self, seconds):
+        """waits [seconds], or less when the measurement is stopped"""
+        if self.cancel_event is not None:
+            self.cancel_event.wait(seconds)
+        else:
+            time.sleep(seconds)
+        self._check_cancelled()
+
+    def _check_cancelled(self):
+        """ends the measurement if the cancel event is set
+
+        Raises:
+            InterruptedError: when the measurement is stopped
+        """
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            telemetry.count("visa.cancelled")
+            raise InterruptedError(f"the measurement on {self.port} was stopped")
+
+    @property
+    def capabilities(self):
+        """the optional firmware features that the Arduino announces between brackets in its identification,
+        like "Arduino VISA firmware v1.1 [BURST]"
+        """
+        if self._capabilities is None:
+            self._capabilities = parse_capabilities(self.get_identification())
+        return self._capabilities
+
+    @property
+    def calibration(self):
+        """the conversion of ADC codes to Volt of this Arduino, the calibration that is kept for its identification
+        or the ideal conversion if it was never calibrated
+        """
+        if self._calibration is None:
+            self._calibration = CalibrationStore(self.calibration_path).get(self.get_identification())
+        return self._calibration
+
+    @calibration.setter
+    def calibration(self, calibration):
+        self._calibration = calibration
+
+    def get_identification(self):
+        """gives the identification of the Arduino
+        """
+        self._identification = self.query("*IDN?")
+        return self._identification
+
+    def set_output_value(self,value):
+        """turns the light on at the given value and remembers that value in ADC and Volt
+
+        Args:
+            value (integer): the value in ADC that will be used to turn the light on and off
+        """
+        self.value = value
+        self.voltage = value * ADC_RESOLUTION
+        self.query(f"OUT:CH0 {self.value}")
+
+    def get_output_value(self):
+        """gives the ouput value in ADC
+        """
+        return self.query(f"MEAS:CH0?")
+
+    def get_output_voltage(self, channel):
+        """returns the ouput value in Volt in a given channel
+
+        Args:
+            channel (integer): the channel number to find the output value from
+        """
+        return self.calibration.to_volt(int(self.query(f"MEAS:CH{channel}?")), [channel])[0]
+
+    def get_input_value(self,channel):
+        """returns the input value in ADC in a given channel
+
+        Args:
+            channel (integer): the channel number to find the input value from
+        """	
+        return self.query(f"MEAS:CH{channel}?")
+
+    def get_input_voltage(self,channel):
+        """returns the input value in Volt in a given channel
+
+        Args:
+            channel (integer): the channel number to find the input value from
+        """	
+        return self.calibration.to_volt(int(self.query(f"MEAS:CH{channel}?")), [channel])[0]
+
+    def read_channels(self, channels, repeats=1):
+        """measures the given channels [repeats] times and returns the values in Volt
+
+        Args:
+            channels (list): the channel numbers to measure
+            repeats (integer): the amount of times every channel is measured
+
+        Returns:
+            numpy array: the voltages with shape (repeats, len(channels))
+        """
+        return self.calibration.to_volt(self.read_channels_raw(channels, repeats), channels)
+
+    def read_channels_raw(self, channels, repeats=1):
+        """measures the given channels [repeats] times and returns the values in ADC,
+        the queries are pipelined if the device supports it so the serial latency is only paid once per batch.
+        A batch whose replies time out or can't be read is measured again
+
+        Args:
+            channels (list): the channel numbers to measure
+            repeats (integer): the amount of times every channel is measured
+
+        Returns:
+            numpy array: the integer ADC values with shape (repeats, len(channels))
+        """
+        if self.uses_binary():
+            return self._read_binary(channels, repeats)
+        if repeats > 1 and "BURST" in self.capabilities:
+            return self._read_burst(channels, repeats)
+
+        commands = [f"MEAS:CH{channel}?" for channel in channels] * repeats
+
+        if self.pipelined is None:
+            self.pipelined = self._probe_pipelining()
+
+        def read():
+            if self.pipelined:
+                replies = self._query_pipelined(commands)
+            else:
+                # one round-trip per query for firmware or simulators that can't do better
+                replies = []
+                for command in commands:
+                    self._check_cancelled()
+                    replies.append(self._query_once(command))
+            with telemetry.timer("parse"):
+                return check_codes(np.array(replies, dtype=int).reshape(repeats, len(channels)))
+        return self._with_retries(read)
+
+    def sweep(self, values, channels, repeats=1, settle=None):
+        """sets the output to every value in turn and measures the given channels [repeats] times at each of them.
+        If the device can be pipelined the OUT:CH0 command of the next value is sent while the readings of the current one
+        are still arriving, and the first measurment of a value waits [settle] after its output is set.
+        When a reply of the pipeline goes missing or is garbled the rest of the sweep is measured one step at a time
+
+        Args:
+            values (iterable): the output values in ADC
+            channels (list): the channel numbers to measure
+            repeats (integer): the amount of times every channel is measured per value
+            settle (object): a settle model from pythondaq.settle, no waiting if not given
+
+        Yields:
+            tuple: the output value and the voltages with shape (repeats, len(channels))
+        """
+        if self.pipelined is None:
+            self.pipelined = self._probe_pipelining()
+
+        if not self.pipelined or self.uses_binary() or (repeats > 1 and "BURST" in self.capabilities):
+            yield from self._sweep_steps(values, channels, repeats, settle)
+            return
+
+        measure = [f"MEAS:CH{channel}?" for channel in channels] * repeats
+        # asks for the identification before any command is in flight
+        calibration = self.calibration
+        # the kind of every command that is written and not read yet, "out" or "meas"
+        in_flight = collections.deque()
+        replies = []
+
+        def read_one():
+            if in_flight.popleft() == "meas":
+                replies.append(self.device.read())
+            else:
+                self.device.read()
+
+        def write(command, kind):
+            if len(in_flight) == self.pipeline_depth:
+                read_one()
+            telemetry.count("visa.queries")
+            self.device.write(command)
+            in_flight.append(kind)
+
+        values = iter(values)
+        value = next(values, None)
+        if value is not None:
+            write(f"OUT:CH0 {value}", "out")
+        try:
+            while value is not None:
+                self.value = value
+                self.voltage = value * ADC_RESOLUTION
+                next_value = None
+                try:
+                    # the settle time starts once the Arduino has set the output
+                    if settle is not None and settle.delay() > 0:
+                        while in_flight:
+                            read_one()
+                        self.wait_to_settle(settle)
+
+                    for command in measure:
+                        self._check_cancelled()
+                        write(command, "meas")
+                    # the next output is set as soon as the Arduino has taken the last measurment of this value
+                    next_value = next(values, None)
+                    if next_value is not None:
+                        write(f"OUT:CH0 {next_value}", "out")
+                    while "meas" in in_flight:
+                        read_one()
+
+                    with telemetry.timer("parse"):
+                        readings = calibration.to_volt(np.array(replies, dtype=int).reshape(repeats, len(channels)), channels)
+                except (pyvisa.errors.VisaIOError, ValueError) as error:
+                    telemetry.count("visa.timeouts" if isinstance(error, pyvisa.errors.VisaIOError) else "visa.bad_replies")
+                    telemetry.count("visa.retries")
+                    # the replies in flight are thrown away by the resync, this value and the rest are measured again
+                    in_flight.clear()
+                    replies.clear()
+                    with telemetry.timer("visa.recover"):
+                        self.resync()
+                    rest = [value] if next_value is None else [value, next_value]
+                    yield from self._sweep_steps(itertools.chain(rest, values), channels, repeats, settle)
+                    return
+                replies.clear()
+                if settle is not None:
+                    settle.observe(readings)
+                yield value, readings
+                value = next_value
+        finally:
+            # leaves no replies behind for the next command, also when the sweep is stopped early
+            while in_flight:
+                read_one()
+
+    def _sweep_steps(self, values, channels, repeats, settle):
+        """the sweep with one step after the other, see sweep"""
+        for value in values:
+            self._check_cancelled()
+            self.set_output_value(value)
+            self.wait_to_settle(settle)
+            readings = self.read_channels(channels, repeats)
+            if settle is not None:
+                settle.observe(readings)
+            yield value, readings
+
+    def wait_to_settle(self, settle):
+        """waits the settle time of the settle model, if there is one, a stop ends the wait
+
+        Args:
+            settle (object): a settle model from pythondaq.settle or None
+        """
+        if settle is not None and settle.delay() > 0:
+            with telemetry.timer("scan.settle"):
+                self._wait(settle.delay())
+
+    def uses_binary(self):
+        """checks whether the Arduino sends its measurments as binary frames, which needs firmware with the BIN
+        feature and a connection that can read raw bytes
+
+        Returns:
+            bool: True if the binary protocol is used
+        """
+        if self.binary is None:
+            self.binary = "BIN" in self.capabilities and hasattr(self.device, "read_bytes")
+        return self.binary
+
+    def _read_binary(self, channels, repeats):
+        """lets the Arduino measure [repeats] samples of every channel and send their ADC codes in binary frames
+        of at most [burst_size] repetitions
+
+        Args:
+            channels (list): the channel numbers to measure
+            repeats (integer): the amount of times every channel is measured
+
+        Returns:
+            numpy array: the ADC values with shape (repeats, len(channels))
+        """
+        raw = np.empty((repeats, len(channels)), dtype=int)
+        for begin in range(0, repeats, self.burst_size):
+            self._check_cancelled()
+            amount = min(self.burst_size, repeats - begin)
+            # the codes of every repetition follow each other in the order of the channels
+            raw[begin:begin + amount] = self._with_retries(lambda: self._read_frame(channels, amount)).reshape(amount, len(channels))
+        return raw
+
+    def _read_frame(self, channels, amount):
+        """asks for one binary frame of [amount] repetitions and reads it
+
+        Args:
+            channels (list): the channel numbers to measure
+            amount (integer): the amount of times every channel is measured
+
+        Returns:
+            numpy array: the ADC codes in the frame
+        """
+        telemetry.count("visa.queries")
+        with telemetry.timer("visa.query"):
+            self.device.write(f"MEAS:BIN? {','.join(map(str, channels))} {amount}")
+            header = self.device.read_bytes(HEADER_SIZE)
+            sequence, count = self._check_frame(header, amount * len(channels))
+            body = self.device.read_bytes(2 * count + 2)
+        with telemetry.timer("parse"):
+            try:
+                return check_codes(read_codes(header, body))
+            except ValueError:
+                telemetry.count("visa.bad_frames")
+                raise
+
+    def _check_frame(self, header, expected):
+        """reads the header of a binary frame and checks that no frame went missing
+
+        Args:
+            header (bytes): the header of the frame
+            expected (integer): the amount of codes that were asked for
+
+        Returns:
+            tuple: the sequence number and the amount of codes in the frame
+        """
+        try:
+            sequence, count = read_header(header)
+            previous, self._sequence = self._sequence, sequence
+            if previous is not None and sequence != (previous + 1) & 0xFFFF:
+                raise ValueError(f"binary frame {sequence} follows frame {previous}")
+            if count != expected:
+                raise ValueError(f"binary frame has {count} codes instead of {expected}")
+        except ValueError:
+            telemetry.count("visa.bad_frames")
+            raise
+        return sequence, count
+
+    def _read_burst(self, channels, repeats):
+        """lets the Arduino measure [repeats] samples per channel and send them in one reply
+
+        Args:
+            channels (list): the channel numbers to measure
+            repeats (integer): the amount of times every channel is measured
+
+        Returns:
+            numpy array: the ADC values with shape (repeats, len(channels))
+        """
+        raw = np.empty((repeats, len(channels)), dtype=int)
+        for column, channel in enumerate(channels):
+            for begin in range(0, repeats, self.burst_size):
+                self._check_cancelled()
+                amount = min(self.burst_size, repeats - begin)
+                raw[begin:begin + amount, column] = self._with_retries(lambda: self._read_burst_reply(channel, amount))
+        return raw
+
+    def _read_burst_reply(self, channel, amount):
+        """asks for one burst and reads its codes, a reply with another amount of codes is garbled"""
+        reply = self._query_once(f"MEAS:CH{channel}:BURST? {amount}")
+        with telemetry.timer("parse"):
+            codes = np.array(reply.split(","), dtype=int)
+        if len(codes) != amount:
+            raise ValueError(f"burst reply has {len(codes)} codes instead of {amount}")
+        return check_codes(codes)
+
+    def _query_pipelined(self, commands):
+        """writes the commands ahead of their replies, keeping at most [pipeline_depth] of them in flight.
+        A stop reads the replies in flight before it ends the measurement, so none are left for the next command
+
+        Args:
+            commands (list): the commands to send
+
+        Returns:
+            list: the replies in the same order as the commands
+        """
+        telemetry.count("visa.queries", len(commands))
+        telemetry.count("visa.pipelined_batches")
+        replies = []
+        in_flight = 0
+        for command in commands:
+            if in_flight == self.pipeline_depth:
+                replies.append(self.device.read())
+                in_flight -= 1
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                break
+            self.device.write(command)
+            in_flight += 1
+        for _ in range(in_flight):
+            replies.append(self.device.read())
+        self._check_cancelled()
+        return replies
+
+    def _probe_pipelining(self):
+        """checks whether the device answers commands that are sent ahead of their replies
+
+        Returns:
+            bool: True if pipelined queries can be used
+        """
+        if not (hasattr(self.device, "write") and hasattr(self.device, "read")):
+            return False
+        try:
+            expected = self.get_identification()
+            replies = self._query_pipelined(["*IDN?", "*IDN?"])
+        except pyvisa.errors.VisaIOError:
+            return False
+        return replies == [expected, expected]
+
+    def is_healthy(self, timeout=0.5):
+        """checks that the Arduino still answers, without waiting longer than [timeout] seconds
+
+        Args:
+            timeout (float): the time in seconds that the Arduino gets to answer
+
+        Returns:
+            bool: True if the Arduino answered *IDN?
+        """
+        # the simulator has no timeout, a real VISA resource takes it in ms
+        previous = getattr(self.device, "timeout", None)
+        try:
+            if previous is not None:
+                self.device.timeout = timeout * 1000
+            # not tried again, a connection that doesn't answer at once is opened again
+            self._query_once("*IDN?")
+            return True
+        except (pyvisa.errors.Error, OSError):
+            return False
+        finally:
+            if previous is not None:
+                try:
+                    self.device.timeout = previous
+                except (pyvisa.errors.Error, OSError):
+                    pass
+
+    def close(self):
+        "Turns off the device"
+        self.query(f"OUT:CH0 0")
+        self.device.close()
+
+
+def parse_capabilities(identification):
+    """reads the optional firmware features from an identification like "Arduino VISA firmware v1.1 [BURST, BIN]"
+
+    Args:
+        identification (string): the reply to *IDN?
+
+    Returns:
+        set: the names of the features in capitals, empty for firmware without them
+    """
+    capabilities = set()
+    for group in re.findall(r"\[([^\]]*)\]", identification):
+        capabilities.update(name.strip().upper() for name in group.split(",") if name.strip())
+    return capabilities
+
+
+class DevicePool:
+    """Keeps the connections to Arduinos open between scans, so the next scan doesn't have to open the port again.
+    A connection is checked with *IDN? before it is reused and closed when it hasn't been used for [idle_timeout] seconds.
+    """
+    def __init__(self, idle_timeout=300, health_timeout=0.5):
+        """Sets up an empty pool
+
+        Args:
+            idle_timeout (float): the amount of seconds that an unused connection is kept open
+            health_timeout (float): the amount of seconds that an Arduino gets to answer the health check
+        """
+        self.idle_timeout = idle_timeout
+        self.health_timeout = health_timeout
+        # the unused connections per port, with the time they were handed back
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, port):
+        """gives an open connection to the Arduino on [port], an idle one if there is a healthy one
+
+        Args:
+            port (string): the USB-port of the Arduino
+
+        Returns:
+            ArduinoVISADevice: the opened Arduino
+        """
+        self.evict_idle()
+        while True:
+            with self._lock:
+                idle = self._idle.get(port)
+                if not idle:
+                    break
+                device, _ = idle.pop()
+            if device.is_healthy(self.health_timeout):
+                return device
+            self._close(device)
+        return ArduinoVISADevice(port)
+
+    def release(self, device):
+        """turns the light off and keeps the connection for the next scan
+
+        Args:
+            device (ArduinoVISADevice): the Arduino that is no longer used
+        """
+        try:
+            device.set_output_value(0)
+        except (pyvisa.errors.Error, OSError):
+            # a broken connection is not worth keeping
+            self._close(device)
+            return
+        with self._lock:
+            self._idle.setdefault(device.port, []).append((device, time.monotonic()))
+        self.evict_idle()
+
+    def evict_idle(self):
+        """closes the connections that haven't been used for [idle_timeout] seconds
+        """
+        expired = []
+        now = time.monotonic()
+        with self._lock:
+            for port, idle in self._idle.items():
+                expired += [device for device, since in idle if now - since > self.idle_timeout]
+                idle[:] = [(device, since) for device, since in idle if now - since <= self.idle_timeout]
+        for device in expired:
+            self._close(device)
+
+    def close_all(self):
+        """closes every idle connection
+        """
+        with self._lock:
+            devices = [device for idle in self._idle.values() for device, _ in idle]
+            self._idle.clear()
+        for device in devices:
+            self._close(device)
+
+    def _close(self, device):
+        try:
+            device.close()
+        except (pyvisa.errors.Error, OSError):
+            pass
+
+
+# the pool that the experiments share
+pool = DevicePool()
+
+
+def list_devices(max_age=5.0):
+    """"gives the USB-port in which the Arduino has been put, the ports are only looked up again when the last lookup is older than [max_age] seconds.
+    The virtual Arduinos of running emulators are listed after the real ports
+
+    Args:
+        max_age (float): the amount of seconds that the last lookup may be reused, 0 always looks the ports up
+
+    Returns:
+        string: the name of the USB-port(s) where the Arduino is in
+    """
+    global _device_list, _device_list_time
+    now = time.monotonic()
+    if _device_list is None or now - _device_list_time > max_age:
+        resources = tuple(get_resource_manager().list_resources())
+        _device_list = resources + tuple(resource for resource in emulated_resources() if resource not in resources)
+        _device_list_time = now
+    return _device_list
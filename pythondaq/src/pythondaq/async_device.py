@@ -0,0 +1,99 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from pythondaq.arduino_device import ArduinoVISADevice
+
+
+class AsyncArduinoDevice:
+    """Gives async versions of the methods of ArduinoVISADevice. The blocking VISA calls run in one I/O thread
+    per Arduino, so the calls to one Arduino never overlap and many Arduinos don't need a thread per action.
+    """
+    def __init__(self, device):
+        """Starts the I/O thread for an Arduino that is already open
+
+        Args:
+            device (ArduinoVISADevice): the opened Arduino
+        """
+        self.device = device
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"visa-{device.port}")
+
+    @classmethod
+    async def open(cls, port):
+        """opens the Arduino without blocking the event loop
+
+        Args:
+            port (string): fill in the USB-port to turn the Arduino on
+
+        Returns:
+            AsyncArduinoDevice: the opened Arduino
+        """
+        device = await asyncio.get_running_loop().run_in_executor(None, ArduinoVISADevice, port)
+        return cls(device)
+
+    def submit(self, function, *args):
+        """puts a blocking call in line on the I/O thread without waiting for it
+
+        Args:
+            function (callable): the function to call
+        """
+        return self._executor.submit(function, *args)
+
+    async def run(self, function, *args):
+        """calls a blocking function on the I/O thread and waits for it without blocking the event loop
+
+        Args:
+            function (callable): the function to call
+
+        Returns:
+            object: what the function returns
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(function, *args))
+
+    async def get_identification(self):
+        """gives the identification of the Arduino
+        """
+        return await self.run(self.device.get_identification)
+
+    async def set_output_value(self, value):
+        """turns the light on at the given value in ADC
+        """
+        return await self.run(self.device.set_output_value, int(value))
+
+    async def get_output_value(self):
+        """gives the ouput value in ADC
+        """
+        return await self.run(self.device.get_output_value)
+
+    async def get_output_voltage(self, channel):
+        """returns the ouput value in Volt in a given channel
+        """
+        return await self.run(self.device.get_output_voltage, channel)
+
+    async def get_input_value(self, channel):
+        """returns the input value in ADC in a given channel
+        """
+        return await self.run(self.device.get_input_value, channel)
+
+    async def get_input_voltage(self, channel):
+        """returns the input value in Volt in a given channel
+        """
+        return await self.run(self.device.get_input_voltage, channel)
+
+    async def read_channels(self, channels, repeats=1):
+        """measures the given channels [repeats] times and returns the values in Volt
+        """
+        return await self.run(self.device.read_channels, channels, repeats)
+
+    def shutdown(self):
+        """stops the I/O thread after the calls that are already in line
+        """
+        self._executor.shutdown(wait=False)
+
+    async def close(self):
+        """Turns off the device and stops the I/O thread
+        """
+        try:
+            await self.run(self.device.close)
+        finally:
+            self.shutdown()
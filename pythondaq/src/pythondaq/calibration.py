@@ -0,0 +1,193 @@
+import json
+import os
+import threading
+import time
+import numpy as np
+
+# the Arduino has a 10-bit ADC and DAC with a reference of 3.3 V
+V_REF = 3.3
+ADC_MAX = 1023
+ADC_CODES = ADC_MAX + 1
+# one ADC step in Volt, the smallest difference the Arduino can see
+ADC_RESOLUTION = V_REF / ADC_MAX
+
+# channel 1 measures a third of the voltage over the photocell, channel 2 the voltage over a resistor of 4.7 Ohm
+DIVIDER = 3
+R_SENSE = 4.7
+
+# the channels that a table is kept for, CH0 is the output
+CHANNELS = 6
+
+# where the calibrations are kept if no other file is given, read when a store is made so it can be pointed elsewhere
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".config", "pythondaq", "calibration.json")
+
+
+def volt_to_adc(voltage):
+    """gives the ADC value that sets the output closest to [voltage]
+
+    Args:
+        voltage (float): the output voltage in Volt, between 0 and V_REF
+    """
+    return round(voltage / ADC_RESOLUTION)
+
+
+def check_codes(codes):
+    """checks that ADC codes are between 0 and ADC_MAX, a code outside that comes from a garbled reply
+
+    Args:
+        codes (numpy array): the integer ADC codes
+
+    Returns:
+        numpy array: the same codes
+    """
+    codes = np.asarray(codes)
+    if codes.size and (codes.min() < 0 or codes.max() > ADC_MAX):
+        raise ValueError(f"ADC code {codes.min() if codes.min() < 0 else codes.max()} is outside 0 to {ADC_MAX}")
+    return codes
+
+
+class Calibration:
+    """Turns the raw ADC codes of one Arduino into Volt with a lookup table of 1024 voltages per channel,
+    so the offset and nonlinearity of every input is corrected by one np.take over all samples.
+    Channels without a calibration use the ideal conversion code * V_REF / ADC_MAX.
+    """
+    def __init__(self, tables=None, idn=None):
+        """Sets up the lookup table
+
+        Args:
+            tables (dict): the 1024 voltages of a code per channel number, the ideal conversion for the channels that aren't given
+            idn (string): the identification of the Arduino that the tables belong to
+        """
+        self.idn = idn
+        # one row per channel, the codes of channel c start at c * ADC_CODES in the flat table
+        self.table = np.tile(np.arange(ADC_CODES) * ADC_RESOLUTION, (CHANNELS, 1))
+        self.calibrated = set()
+        for channel, table in (tables or {}).items():
+            self.table[int(channel)] = table
+            self.calibrated.add(int(channel))
+        self._flat = self.table.ravel()
+
+    def to_volt(self, raw, channels):
+        """looks the voltages of raw ADC codes up
+
+        Args:
+            raw (numpy array): integer ADC codes with shape (repeats, len(channels))
+            channels (list): the channel number of every column
+
+        Returns:
+            numpy array: the voltages with the shape of [raw]
+        """
+        # a code outside the table would read the table of another channel
+        return np.take(self._flat, check_codes(raw) + ADC_CODES * np.asarray(channels))
+
+    @classmethod
+    def from_sweep(cls, channel, reference, codes, idn=None, tables=None):
+        """makes the table of a channel from a calibration sweep, a set of known input voltages with the average code
+        that was read for each of them. Between the measured points the voltage is interpolated, outside them a line
+        through all points is followed
+
+        Args:
+            channel (integer): the calibrated channel
+            reference (numpy array): the known input voltages
+            codes (numpy array): the average ADC code that was read at every reference voltage
+            idn (string): the identification of the Arduino
+            tables (dict): the tables of other channels that are kept
+
+        Returns:
+            Calibration: the calibration with the new table
+        """
+        codes = np.asarray(codes, dtype=float)
+        reference = np.asarray(reference, dtype=float)
+        # codes that were read for several voltages are averaged, np.interp needs rising codes
+        unique, inverse = np.unique(codes, return_inverse=True)
+        volts = np.bincount(inverse, weights=reference) / np.bincount(inverse)
+
+        all_codes = np.arange(ADC_CODES)
+        gain, offset = np.polyfit(unique, volts, 1) if len(unique) > 1 else (ADC_RESOLUTION, volts[0] - ADC_RESOLUTION * unique[0])
+        table = np.where(
+            (all_codes < unique[0]) | (all_codes > unique[-1]),
+            offset + gain * all_codes,
+            np.interp(all_codes, unique, volts),
+        )
+        tables = dict(tables or {})
+        tables[channel] = table
+        return cls(tables, idn=idn)
+
+    def tables(self):
+        """gives the tables of the calibrated channels
+
+        Returns:
+            dict: the 1024 voltages per calibrated channel number
+        """
+        return {channel: self.table[channel] for channel in sorted(self.calibrated)}
+
+
+def calibration_sweep(device, channel, codes=range(0, ADC_CODES, 8), repeats=8, reference=None, settle=0.01):
+    """measures the codes that a channel reads for known voltages. Without a reference the output is looped back to
+    the input, so CH0 must be wired to [channel], and its ideal voltage is taken as the truth
+
+    Args:
+        device (ArduinoVISADevice): the Arduino to calibrate
+        channel (integer): the input channel
+        codes (iterable): the output values in ADC to measure at
+        repeats (integer): the amount of readings that are averaged per output value
+        reference (callable): gives the voltage that was really put on the input for an output value, for example from a multimeter
+        settle (float): the time in seconds between setting the output and reading the input
+
+    Returns:
+        tuple: the reference voltages and the average codes that were read for them
+    """
+    volts, measured = [], []
+    for code in codes:
+        device.set_output_value(code)
+        time.sleep(settle)
+        measured.append(device.read_channels_raw([channel], repeats).mean())
+        volts.append(reference(code) if reference else code * ADC_RESOLUTION)
+    device.set_output_value(0)
+    return np.array(volts), np.array(measured)
+
+
+class CalibrationStore:
+    """Keeps the calibration of every Arduino in a json file, by the identification that it answers to *IDN?
+    """
+    def __init__(self, path=None):
+        """Reads the file, a file that doesn't exist or can't be read starts empty
+
+        Args:
+            path (string): the name of the json file, DEFAULT_PATH if not given
+        """
+        self.path = path or DEFAULT_PATH
+        self._lock = threading.Lock()
+        try:
+            with open(self.path) as file:
+                self.entries = json.load(file)
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    def get(self, idn):
+        """gives the calibration of an Arduino, the ideal conversion if it was never calibrated
+
+        Args:
+            idn (string): the identification of the Arduino
+        """
+        entry = self.entries.get(idn)
+        tables = {int(channel): np.array(table) for channel, table in entry["tables"].items()} if entry else None
+        return Calibration(tables, idn=idn)
+
+    def put(self, calibration):
+        """keeps the tables of a calibration and writes the file
+
+        Args:
+            calibration (Calibration): the calibration, with the identification of its Arduino
+        """
+        with self._lock:
+            self.entries[calibration.idn] = {
+                "created": time.time(),
+                "tables": {str(channel): table.tolist() for channel, table in calibration.tables().items()},
+            }
+            # writes a new file and swaps it in
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            temporary = self.path + ".tmp"
+            with open(temporary, "w") as file:
+                json.dump(self.entries, file)
+            os.replace(temporary, self.path)
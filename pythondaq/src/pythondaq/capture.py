@@ -0,0 +1,192 @@
+import json
+import os
+import time
+import numpy as np
+from pythondaq.analysis import RESULT_DTYPE, derive_quantities, results_dataframe, sort_by_adc
+
+# a capture file starts with MAGIC, the length of the JSON header and the header itself,
+# padded so the fixed-size records that follow start on an 8 byte boundary
+MAGIC = b"PVCAP\x01"
+HEADER_LENGTH = np.dtype("<u4")
+
+
+def record_dtype(rep_num, channels):
+    """gives the layout of one record, the ADC code of a step followed by all its raw samples
+
+    Args:
+        rep_num (integer): the amount of repetitions per step
+        channels (integer): the amount of measured channels
+
+    Returns:
+        numpy dtype: the structured type of one record
+    """
+    return np.dtype([("adc", "<i8"), ("samples", "<f8", (rep_num, channels))])
+
+
+class CaptureWriter:
+    """Writes the raw samples of a sweep to disk while it is measured. Every step is appended as one record
+    and flushed right away, so a crash only loses the step that was being measured.
+    """
+    def __init__(self, path, rep_num, channels, metadata=None, fsync_interval=1.0):
+        """Creates the file and writes the header
+
+        Args:
+            path (string): the name of the capture file
+            rep_num (integer): the amount of repetitions per step
+            channels (integer): the amount of measured channels
+            metadata (dict): extra values to keep in the header, like the port or start and stop
+            fsync_interval (float): the maximum amount of seconds between forcing the data onto the disk
+        """
+        self.path = path
+        self.dtype = record_dtype(rep_num, channels)
+        self.fsync_interval = fsync_interval
+        self.n_records = 0
+
+        header = {"rep_num": rep_num, "channels": channels, "created": time.time()}
+        header.update(metadata or {})
+        header = json.dumps(header).encode()
+        # pads the header with spaces, which json ignores
+        header += b" " * (-(len(MAGIC) + HEADER_LENGTH.itemsize + len(header)) % 8)
+
+        self._file = open(path, "wb")
+        self._file.write(MAGIC + np.array(len(header), dtype=HEADER_LENGTH).tobytes() + header)
+        self._sync()
+
+    @classmethod
+    def resume(cls, path, fsync_interval=1.0):
+        """opens an existing capture file to append more steps, a record that was only partly written is cut off
+
+        Args:
+            path (string): the name of the capture file
+            fsync_interval (float): the maximum amount of seconds between forcing the data onto the disk
+
+        Returns:
+            CaptureWriter: the writer that appends after the last complete record
+        """
+        capture = Capture(path)
+        end = capture.offset + len(capture) * capture.dtype.itemsize
+
+        writer = cls.__new__(cls)
+        writer.path = path
+        writer.dtype = capture.dtype
+        writer.fsync_interval = fsync_interval
+        writer.n_records = len(capture)
+        del capture
+
+        writer._file = open(path, "r+b")
+        writer._file.truncate(end)
+        writer._file.seek(end)
+        writer._sync()
+        return writer
+
+    def append(self, adc_code, samples):
+        """writes the samples of one finished step
+
+        Args:
+            adc_code (integer): the output value in ADC of the step
+            samples (numpy array): the voltages with shape (rep_num, channels)
+        """
+        record = np.empty(1, dtype=self.dtype)
+        record["adc"] = adc_code
+        record["samples"] = samples
+        self._file.write(record.tobytes())
+        self._file.flush()
+        self.n_records += 1
+
+        if time.monotonic() - self._last_sync > self.fsync_interval:
+            self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        """forces everything onto the disk and closes the file
+        """
+        if not self._file.closed:
+            self._sync()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Capture:
+    """Reads a capture file through a memory map, so large captures are not loaded into memory at once.
+    A record that was only partly written when the measurement crashed is ignored.
+    """
+    def __init__(self, path):
+        """Reads the header and maps the complete records
+
+        Args:
+            path (string): the name of the capture file
+        """
+        self.path = path
+        with open(path, "rb") as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a capture file")
+            length = int(np.frombuffer(file.read(HEADER_LENGTH.itemsize), dtype=HEADER_LENGTH)[0])
+            self.header = json.loads(file.read(length))
+
+        self.offset = len(MAGIC) + HEADER_LENGTH.itemsize + length
+        self.dtype = record_dtype(self.header["rep_num"], self.header["channels"])
+        n_records = (os.path.getsize(path) - self.offset) // self.dtype.itemsize
+
+        if n_records > 0:
+            self.records = np.memmap(path, dtype=self.dtype, mode="r", offset=self.offset, shape=(n_records,))
+        else:
+            self.records = np.empty(0, dtype=self.dtype)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def adc_codes(self):
+        """the output value in ADC of every step
+        """
+        return self.records["adc"]
+
+    @property
+    def samples(self):
+        """the raw voltages with shape (steps, rep_num, channels)
+        """
+        return self.records["samples"]
+
+    def results(self, chunk_size=65536):
+        """calculates the derived values of every step, a chunk of steps at a time to limit memory use
+
+        Args:
+            chunk_size (integer): the amount of steps that is read from disk at once
+
+        Returns:
+            numpy array: a record array as returned by derive_quantities
+        """
+        results = np.empty(len(self), dtype=RESULT_DTYPE)
+        for begin in range(0, len(self), chunk_size):
+            chunk = self.records[begin:begin + chunk_size]
+            results[begin:begin + chunk_size] = derive_quantities(np.asarray(chunk["samples"]), np.asarray(chunk["adc"]))
+        return results
+
+    def to_csv(self, path):
+        """saves the derived values in the same .csv layout as a saved measurement
+
+        Args:
+            path (string): the name of the .csv file
+        """
+        results_dataframe(sort_by_adc(self.results())).to_csv(path_or_buf=path)
+
+
+def open_capture(path):
+    """opens a capture file for reading
+
+    Args:
+        path (string): the name of the capture file
+
+    Returns:
+        Capture: the memory-mapped capture
+    """
+    return Capture(path)
@@ -1,6 +1,23 @@
 import click
-from pythondaq.diode_experiment import DiodeExperiment
-from pythondaq.arduino_device import ArduinoVISADevice,list_devices
+
+# the experiment, pandas and pyvisa are only imported in the commands that use them, so --help and list start fast
+
+
+def settle_option(ctx, param, value):
+    """checks the --settle option before any Arduino is opened
+
+    Returns:
+        float or string: the settle time in seconds or "adaptive"
+    """
+    if value == "adaptive":
+        return value
+    try:
+        seconds = float(value)
+    except ValueError:
+        raise click.BadParameter(f"{value!r} is not a time in seconds or 'adaptive'")
+    if not seconds >= 0:
+        raise click.BadParameter(f"{value} is not a time of at least 0 seconds")
+    return seconds
 
 @click.group()
 def diode_group():
@@ -9,38 +26,312 @@ def diode_group():
     pass
 
 @diode_group.command()
-@click.option("-d", "--device", default="ASRL4::INSTR", help="Input the USB-port that the device is in, if you dont know it, use the list command")
-@click.option("-s" "--start", default=0, help="Input the start value in Volt for the measurment")
-@click.option("-e" "--stop", default=3.3, help="Input the stop value in Volt for the measurment")
-@click.option("-r", "--rep_num", default=5, help="The amount of times that the measurement is repeated for a better significance")
-@click.option("-o","--output", default="", help="if you want to save the dataframe and graph(if asked for with -g or --graph) fill in the name that you want the saved file to have")
-@click.option("-g/-no-g","--graph/--no-graph", default=False, help="use -g or  --graph to show the graph, saves it if a name was given with -o or --output")
-def scan(device, start, stop, rep_num, output, graph):
-    """takes the measurment and saves a dataframe if asked for. Also shows a graph if asked for,
-    the graph is saved under the same name as the dataframe if the dataframe is saved
+@click.option("-d", "--device", default=["ASRL4::INSTR"], multiple=True, help="Input the USB-port that the device is in, if you dont know it, use the list command. Can be given more than once to measure on several devices at the same time")
+@click.option("-a", "--all", "all_devices", is_flag=True, help="Measure on every device that can be found")
+@click.option("-s", "--start", default=0.0, type=click.FloatRange(0, 3.3), help="Input the start value in Volt for the measurment")
+@click.option("-e", "--stop", default=3.3, type=click.FloatRange(0, 3.3), help="Input the stop value in Volt for the measurment, this value is measured too")
+@click.option("--step", default=1, type=click.IntRange(min=1), help="Measure every [step]th ADC value between start and stop")
+@click.option("-r", "--rep_num", default=5, type=click.IntRange(min=1), help="The amount of times that the measurement is repeated for a better significance")
+@click.option("-o","--output", default="-", help="The file that every measured step is written to while measuring, - writes to the screen")
+@click.option("-f", "--format", "output_format", type=click.Choice(["csv", "ndjson", "parquet"]), default=None, help="The format of the output, taken from the extension of the output file if not given and csv otherwise")
+@click.option("--profile", type=click.Choice(["json", "prometheus"]), default=None, help="times every stage of the measurment and prints the timings in the given format afterwards")
+@click.option("--settle", default="0", callback=settle_option, help="the time in seconds between setting the output and measuring it, or 'adaptive' to learn it from the drift of the first repetition")
+@click.option("--resume/--no-resume", default=False, help="reuses the steps of the last sweep with the same Arduino and rep_num from the last hour and only measures the missing steps")
+def scan(device, all_devices, start, stop, step, rep_num, output, output_format, profile, settle, resume):
+    """takes the measurment and streams every step as a row while measuring, without a window so it can run in scripts.
+    A summary with the fill factor, maximum power, duration and queries per second is printed at the end, on stderr when
+    the rows go to the screen
 
     Args:
-        device (string): takes the USB-port in which the Arduino is placed in
-        start (integer): Starts the measurment at this value in Volt
-        stop (integer): Stops the measurment at this value in Volt
+        device (tuple): takes the USB-port(s) in which the Arduino(s) are placed in
+        all_devices (True/False): measures on every Arduino that can be found instead
+        start (float): Starts the measurment at this value in Volt
+        stop (float): Stops the measurment at this value in Volt
+        step (integer): the distance in ADC between two measured steps
         rep_num (integer): the amount of times that the measurment is repeated to ensure a better significance 
-        ms_name (integer): if filled will save the dataframe as a .csv file and name the file [ms_name]
-        graph (True/False): returns a graph if True, also names and saves that graph if [ms_name] is filled
+        output (string): the file that the rows are written to, - for the screen
+        output_format (string): csv, ndjson or parquet
+        profile (string): prints the timings of the measurment as json or prometheus text if filled
+        settle (string): the settle time in seconds or "adaptive"
+        resume (True/False): resumes or extends the last sweep from the sweep cache if True
     """
-    # sets up the Arduino
+    import contextlib
+    import importlib.util
+    import os
+    import sys
+    import time
+    from pythondaq.analysis import maximum_power_point, sort_by_adc, sweep_summary
+    from pythondaq.calibration import volt_to_adc
+    from pythondaq.export import guess_format, open_stream
+    from pythondaq.multi_device import MultiDeviceExperiment
+    from pythondaq.telemetry import telemetry
+
+    to_screen = output == "-"
+    output_format = output_format or ("csv" if to_screen else guess_format(output))
+    if output_format == "parquet" and to_screen:
+        raise click.UsageError("parquet can only be written to a file, use -o")
+    if stop < start:
+        raise click.UsageError("the stop value must not be below the start value")
+    # the summary and the messages of the Arduinos don't mix with the rows
+    messages = sys.stderr if to_screen else sys.stdout
+
+    if output_format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        raise click.UsageError("writing parquet needs pyarrow, install it with: pip install pyarrow")
+
+    # the queries are counted for the summary
+    telemetry.enable()
+
+    # sets up the Arduino(s), the sweeps on several Arduinos run at the same time
+    with contextlib.redirect_stdout(messages):
+        if all_devices:
+            experiment = MultiDeviceExperiment.from_discovered()
+        else:
+            experiment = MultiDeviceExperiment(device)
+    for port, error in experiment.skipped.items():
+        print(f"skipping {port}: {error}", file=messages)
+    for single in experiment.experiments.values():
+        single.verbose = False
+
+    cache = None
+    if resume:
+        from pythondaq.sweep_cache import SweepCache
+        cache = SweepCache()
+
+    # the output is only opened once the Arduinos are, so a wrong port leaves no empty file behind
+    if to_screen:
+        file = sys.stdout
+    elif output_format == "parquet":
+        file = output
+    else:
+        file = open(output, "w", newline="")
+    try:
+        stream = open_stream(file, output_format)
+    except BaseException:
+        if not to_screen and output_format != "parquet":
+            file.close()
+        raise
+
+    # the stop value is measured too
+    started = time.perf_counter()
+    try:
+        steps = experiment.stream(volt_to_adc(start), volt_to_adc(stop) + 1, rep_num, settle=settle, cache=cache, step=step)
+        for port, adc_codes, results in steps:
+            stream.write(port, adc_codes, results)
+    except KeyboardInterrupt:
+        # the steps that were written are kept
+        print("stopped", file=messages)
+    except BrokenPipeError:
+        # the program that reads the rows has stopped, like head, so the measurement is stopped too
+        sys.stdout = open(os.devnull, "w")
+        print("stopped, the output was closed", file=messages)
+    finally:
+        stream.close()
+        if not to_screen and output_format != "parquet":
+            file.close()
+    duration = time.perf_counter() - started
+
+    for port, single in experiment.experiments.items():
+        summary = sweep_summary(sort_by_adc(single.results))
+        print(f"{port}: FF = {summary['FF']:.4f}  P_max = {summary['P_max']:.4g} W  U_mpp = {maximum_power_point(single.results)['U_mpp']:.4g} V  {single.n_steps} steps", file=messages)
+    counters = telemetry.to_dict()["counters"]
+    queries = counters.get("visa.queries", 0)
+    print(f"{duration:.2f} s  {queries} queries  {queries / duration:.1f} queries/s", file=messages)
+    if counters.get("visa.retries") or counters.get("visa.failures"):
+        # the time of the tries that failed, with the wait for replies that didn't come and finding the stream back,
+        # summed over the Arduinos
+        histograms = telemetry.to_dict()["histograms"]
+        lost = sum(histograms.get(name, {}).get("sum", 0.0) for name in ("visa.lost", "visa.recover"))
+        print(f"{counters.get('visa.retries', 0)} retries  {counters.get('visa.timeouts', 0)} timeouts  {counters.get('visa.bad_replies', 0)} bad replies  "
+              f"{counters.get('visa.failures', 0)} failures  {lost:.2f} s lost", file=messages)
+
+    if profile == "json":
+        print(telemetry.to_json(), file=messages)
+    elif profile == "prometheus":
+        print(telemetry.to_prometheus(), file=messages)
+
+@diode_group.command()
+@click.option("-d", "--device", default="ASRL4::INSTR", help="Input the USB-port that the device is in")
+@click.option("-s", "--start", default=0.0, help="Input the start value in Volt for every measurment")
+@click.option("-e", "--stop", default=3.3, help="Input the stop value in Volt for every measurment")
+@click.option("-r", "--rep_num", default=5, help="The amount of times that the measurement is repeated for a better significance")
+@click.option("-i", "--interval", default=60.0, type=click.FloatRange(min=0, min_open=True), help="The time in seconds between the start of two measurements")
+@click.option("-n", "--count", default=0, type=click.IntRange(min=0), help="The amount of measurements, 0 keeps measuring until Ctrl+C")
+@click.option("-o", "--output", default="monitor.pvts", help="The time series file that the summary of every measurement is appended to")
+@click.option("--adaptive/--full", default=False, help="use the adaptive sweep instead of measuring every step")
+def monitor(device, start, stop, rep_num, interval, count, output, adaptive):
+    """measures the solar cell again and again and keeps the fill factor, maximum power, open voltage and short-circuit current of every measurement
+
+    Args:
+        device (string): the USB-port in which the Arduino is placed
+        start (float): Starts every measurment at this value in Volt
+        stop (float): Stops every measurment at this value in Volt
+        rep_num (integer): the amount of times that the measurment is repeated to ensure a better significance
+        interval (float): the time in seconds between the start of two measurements
+        count (integer): the amount of measurements, 0 for no limit
+        output (string): the time series file that the summaries are appended to
+        adaptive (True/False): uses the adaptive sweep if True
+    """
+    import time
+    from pythondaq.calibration import volt_to_adc
+    from pythondaq.monitor import Monitor
+    from pythondaq.pv_experiment import DiodeExperiment
+
     experiment = DiodeExperiment(device)
-    
-    #changes the start and stop values to ADC in order for easier communication with the Arduino
-    start = round(start*(1023/3.3)) + 1
-    stop = round(stop*(1023/3.3)) + 1
+    experiment.verbose = False
+    monitor = Monitor(
+        experiment, volt_to_adc(start), volt_to_adc(stop) + 1, rep_num, output,
+        interval=interval, adaptive=adaptive,
+    )
+
+    def show(summary):
+        moment = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(summary["time"]))
+        print(f"{moment}  FF = {summary['FF']:.4f}  P_max = {summary['P_max']:.4g} W  U_oc = {summary['U_oc']:.4g} V  I_sc = {summary['I_sc']:.4g} A", flush=True)
 
-    # does the experiment
-    experiment.scan(start, stop, rep_num, ms_name=output, graph = graph)
+    try:
+        monitor.run(count=count or None, callback=show)
+    except KeyboardInterrupt:
+        # every finished measurement is already in the time series file
+        pass
+    finally:
+        monitor.close()
+
+@diode_group.command()
+@click.argument("patterns", nargs=-1, required=True)
+@click.option("-o", "--output", default="", help="if filled the summary table is also saved as a .csv file with this name")
+@click.option("-j", "--jobs", default=0, help="The amount of processes, 0 uses one per processor")
+@click.option("--cache", default=".pythondaq-analysis.json", help="The file that remembers the results of files that didn't change")
+@click.option("--no-cache", is_flag=True, help="analyses every file again")
+def analyze(patterns, output, jobs, cache, no_cache):
+    """calculates the fill factor, maximum power point, open voltage and short-circuit current of saved measurements,
+    for example: analyze "src/pythondaq/Measurements/*.csv"
+
+    Args:
+        patterns (tuple): glob patterns of the saved .csv files, ** also searches the folders below
+        output (string): if filled will save the summary table as a .csv file and name the file [output]
+        jobs (integer): the amount of processes, 0 for one per processor
+        cache (string): the json file with the results of earlier runs
+        no_cache (True/False): ignores and doesn't update the cache if True
+    """
+    import csv
+    import sys
+    from pythondaq.reanalysis import SUMMARY_COLUMNS, HashCache, analyze as analyze_files, expand
+
+    paths = expand(patterns)
+    if not paths:
+        raise click.UsageError(f"no files match {' '.join(patterns)}")
+
+    writer = None
+    file = open(output, "w", newline="") if output else None
+    try:
+        if file:
+            writer = csv.DictWriter(file, fieldnames=SUMMARY_COLUMNS)
+            writer.writeheader()
+
+        # every row is printed as soon as its file is analysed
+        print(f"{'FF':>8} {'P_max':>11} {'U_mpp':>8} {'I_mpp':>11} {'U_oc':>8} {'I_sc':>11} {'steps':>6}  file")
+        failed = 0
+        for row in analyze_files(paths, cache=None if no_cache else HashCache(cache), workers=jobs or None):
+            if "error" in row:
+                failed += 1
+                print(f"{row['file']}: {row['error']}", file=sys.stderr)
+                continue
+            name = f"{row['file']} {row['port']}".strip()
+            print(f"{row['FF']:8.4f} {row['P_max']:11.4g} {row['U_mpp']:8.4f} {row['I_mpp']:11.4g} {row['U_oc']:8.4f} {row['I_sc']:11.4g} {row['steps']:6d}  {name}", flush=True)
+            if writer:
+                writer.writerow(row)
+    finally:
+        if file:
+            file.close()
+
+    print(f"{len(paths) - failed} of {len(paths)} files analysed")
+
+@diode_group.command()
+@click.option("-d", "--device", default="ASRL4::INSTR", help="Input the USB-port that the device is in")
+@click.option("-c", "--channel", default=[1, 2], multiple=True, help="The input channel that is calibrated, wired to the output CH0. Can be given more than once")
+@click.option("--step", default=8, type=click.IntRange(min=1), help="The distance in ADC between two calibration points")
+@click.option("-r", "--rep_num", default=8, type=click.IntRange(min=1), help="The amount of readings that are averaged per calibration point")
+@click.option("--calibration", default=None, help="The json file with the calibrations, the one in the user's config folder if not given")
+def calibrate(device, channel, step, rep_num, calibration):
+    """calibrates the inputs of an Arduino, with the output CH0 wired to every calibrated input. The table is kept
+    for the identification of the Arduino and used by every measurement with it
+
+    Args:
+        device (string): the USB-port in which the Arduino is placed
+        channel (tuple): the calibrated input channels
+        step (integer): the distance in ADC between two calibration points
+        rep_num (integer): the amount of readings that are averaged per point
+        calibration (string): the json file with the calibrations
+    """
+    import numpy as np
+    from pythondaq.arduino_device import ArduinoVISADevice
+    from pythondaq.calibration import ADC_CODES, ADC_RESOLUTION, Calibration, CalibrationStore, calibration_sweep
+
+    store = CalibrationStore(calibration)
+    arduino = ArduinoVISADevice(device)
+    idn = arduino.get_identification()
+    result = store.get(idn)
+    try:
+        for number in channel:
+            reference, codes = calibration_sweep(arduino, number, range(0, ADC_CODES, step), rep_num)
+            result = Calibration.from_sweep(number, reference, codes, idn=idn, tables=result.tables())
+            # the largest difference with the ideal conversion, in ADC steps
+            error = np.abs(result.table[number] - np.arange(ADC_CODES) * ADC_RESOLUTION).max() / ADC_RESOLUTION
+            print(f"CH{number}: largest correction {error:.1f} ADC steps")
+    finally:
+        arduino.close()
+    store.put(result)
+    print(f"calibration of {idn} saved in {store.path}")
+
+@diode_group.command()
+@click.option("-n", "--count", default=4, type=click.IntRange(min=1), help="The amount of virtual Arduinos")
+@click.option("-t", "--transport", type=click.Choice(["tcp", "pty"]), default="tcp", help="Serve every Arduino on a TCP port or on a pseudo-terminal")
+@click.option("--port", default=0, help="The TCP port of the first Arduino, the others count up from it. 0 picks free ports")
+@click.option("--latency", default=0.002, help="The time in seconds between a command and its reply")
+@click.option("--jitter", default=0.0, help="Every reply takes up to this many seconds longer or shorter")
+@click.option("--noise", default=1.0, help="The noise on every reading in ADC steps")
+@click.option("--settle-time", default=0.0, help="The time constant in seconds of the solar cell after the output changes")
+@click.option("--fault-rate", default=0.0, type=click.FloatRange(0, 1), help="The chance per reply to drop it, garble it or stall it, each")
+@click.option("--seed", default=None, type=int, help="Seed of the light, noise and faults for repeatable runs")
+def emulate(count, transport, port, latency, jitter, noise, settle_time, fault_rate, seed):
+    """serves virtual Arduinos with a solar cell until Ctrl+C, the list command and the other commands find them as devices
+
+    Args:
+        count (integer): the amount of virtual Arduinos
+        transport (string): tcp or pty
+        port (integer): the TCP port of the first Arduino
+        latency (float): the time in seconds between a command and its reply
+        jitter (float): the variation on the latency in seconds
+        noise (float): the noise on every reading in ADC steps
+        settle_time (float): the time constant in seconds of the solar cell
+        fault_rate (float): the chance of every fault per reply
+        seed (integer): seed of the virtual Arduinos
+    """
+    import time
+    from pythondaq.emulator import EmulatorServer
+
+    faults = {"drop": fault_rate, "garble": fault_rate, "stall": fault_rate}
+    server = EmulatorServer(
+        count, transport=transport, port=port, seed=seed,
+        latency=latency, jitter=jitter, noise=noise, settle_time=settle_time, faults=faults,
+    )
+    with server:
+        for resource in server.resources:
+            print(resource, flush=True)
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+    injected = {fault: sum(board.injected[fault] for board in server.boards) for fault in faults}
+    if fault_rate:
+        print(", ".join(f"{amount} {fault}" for fault, amount in injected.items()) + " injected")
 
 @diode_group.command()
 def list():
     """gives the USB-port that the Arduino is connected to
     """
+    from pythondaq.arduino_device import list_devices
+
     print(list_devices())
 
 @diode_group.command()
@@ -48,6 +339,8 @@ def list():
 def info(device):
     """gives the identification of the Arduino
     """
+    from pythondaq.arduino_device import ArduinoVISADevice
+
     ArduinoDevice = ArduinoVISADevice(device)
 
     print(ArduinoDevice.get_identification())
@@ -1,14 +1,66 @@
 import click
+import collections
+import os
 import sys
-import numpy as np
-import pandas as pd
 import time
-import matplotlib.pyplot as plt
+import numpy as np
 from pythondaq.pv_experiment import DiodeExperiment
-from pythondaq.arduino_device import ArduinoVISADevice, list_devices
+from pythondaq.arduino_device import ArduinoVISADevice, list_devices, pool
+from pythondaq.analysis import results_dataframe, sort_by_adc
+from pythondaq.calibration import volt_to_adc
+from pythondaq.capture import open_capture
+from pythondaq.fitting import FIT_DTYPE, fit_results, model_current
+from pythondaq.lod import SavedMeasurement
+from pythondaq.monitor import Monitor
+from pythondaq.sweep_cache import SweepCache
+from pythondaq.telemetry import telemetry
 from PySide6 import QtWidgets,QtCore, QtGui
 from PySide6.QtCore import Slot
 import pyqtgraph as pg
+from pyvisa.errors import Error as VisaError
+
+# where the captures and time series of the measurements are kept, in the folder of the user so it doesn't depend on
+# the folder that the GUI is started from or on the package folder being writable
+MEASUREMENTS_DIRECTORY = os.path.join(os.path.expanduser("~"), ".local", "share", "pythondaq", "measurements")
+# the amount of files of every kind that is kept, the oldest ones are removed
+MAX_MEASUREMENTS = 100
+
+
+def measurement_path(kind, extension, directory=MEASUREMENTS_DIRECTORY, max_files=MAX_MEASUREMENTS):
+    """makes a new empty file in the directory with the time in its name, the directory is made if it is missing.
+    A counter is added when the name is already taken, and the oldest files of the same kind are removed
+
+    Args:
+        kind (string): what is measured, like "capture" or "monitor"
+        extension (string): the extension of the file, like ".pvcap"
+        directory (string): the folder of the measurements
+        max_files (integer): the amount of files of this kind that is kept, the new one included
+
+    Returns:
+        string: the name of the new file
+    """
+    os.makedirs(directory, exist_ok=True)
+    stamp = time.strftime('%Y%m%d_%H%M%S')
+    counter = 0
+    while True:
+        path = os.path.join(directory, f"{kind}_{stamp}{f'_{counter}' if counter else ''}{extension}")
+        try:
+            # the file is made right away, so a second measurement in the same second can't take the same name
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            counter += 1
+
+    # the files that were written to longest ago are removed first
+    previous = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.startswith(f"{kind}_") and entry.name.endswith(extension)),
+        key=lambda entry: (entry.stat().st_mtime_ns, entry.name),
+    )
+    for entry in previous[:max(len(previous) - max_files, 0)]:
+        if entry.path != path:
+            os.remove(entry.path)
+    return path
+
 
 @click.group()
 def app_group():
@@ -43,6 +95,21 @@ class UserInterface(QtWidgets.QMainWindow):
         self.plot_widget = pg.PlotWidget()
         self.plot_R_V_widget = pg.PlotWidget()
         self.plot_P_R_widget = pg.PlotWidget()
+        self.history_widget = pg.GraphicsLayoutWidget()
+
+        # opens saved captures and monitor histories of any size, only the points that fit in the view are drawn
+        self.viewer_widget = QtWidgets.QWidget()
+        self.viewer_plot = pg.PlotWidget()
+        self.open_button = QtWidgets.QPushButton("Open...")
+        self.field_input = QtWidgets.QComboBox()
+        self.viewer_label = QtWidgets.QLabel("")
+        viewer_bar = QtWidgets.QHBoxLayout()
+        viewer_bar.addWidget(self.open_button)
+        viewer_bar.addWidget(self.field_input)
+        viewer_bar.addWidget(self.viewer_label, 1)
+        viewer_box = QtWidgets.QVBoxLayout(self.viewer_widget)
+        viewer_box.addLayout(viewer_bar)
+        viewer_box.addWidget(self.viewer_plot)
 
         # makes the Min spinbox
         self.StartSpinBox = QtWidgets.QDoubleSpinBox()
@@ -109,10 +176,40 @@ class UserInterface(QtWidgets.QMainWindow):
         self.End_button = QtWidgets.QPushButton("End measurement")
         self.vbox.addWidget(self.End_button)
 
+        # repeats the measurement every interval and plots the history of the fill factor and maximum power
+        self.Monitor_button = QtWidgets.QPushButton("Monitor")
+        self.vbox.addWidget(self.Monitor_button)
+        self.IntervalSpinBox = QtWidgets.QDoubleSpinBox()
+        self.IntervalSpinBox.setPrefix("every ")
+        self.IntervalSpinBox.setSuffix(" s")
+        self.IntervalSpinBox.setMaximum(86400)
+        self.IntervalSpinBox.setValue(60)
+        self.vbox.addWidget(self.IntervalSpinBox)
+
         # prompts the user to save the file
         self.save_button = QtWidgets.QPushButton("Save")
         self.vbox.addWidget(self.save_button)
 
+        # only draws the points that fit on the screen for long measurements
+        self.downsample_box = QtWidgets.QCheckBox("Downsample plots")
+        self.downsample_box.setChecked(True)
+        self.vbox.addWidget(self.downsample_box)
+
+        # continues the last measurement with the same settings instead of starting over
+        self.resume_box = QtWidgets.QCheckBox("Resume last measurement")
+        self.resume_box.setChecked(False)
+        self.vbox.addWidget(self.resume_box)
+
+        # fits the single-diode model after every new point and shows the fill factor of the fitted curve
+        self.fit_box = QtWidgets.QCheckBox("Fit diode model")
+        self.vbox.addWidget(self.fit_box)
+        self.fit_label = QtWidgets.QLabel("")
+        self.vbox.addWidget(self.fit_label)
+
+        # times the acquisition and plotting and shows it in the status bar
+        self.profile_box = QtWidgets.QCheckBox("Profile")
+        self.vbox.addWidget(self.profile_box)
+
         # closes the program
         self.close_button = QtWidgets.QPushButton("Close")
         self.vbox.addWidget(self.close_button)
@@ -120,6 +217,8 @@ class UserInterface(QtWidgets.QMainWindow):
         self.tab_widget.addTab(self.plot_widget,"U_pv tegen I_pv")
         self.tab_widget.addTab(self.plot_R_V_widget,"U_0 tegen R")
         self.tab_widget.addTab(self.plot_P_R_widget, "P tegen R")
+        self.tab_widget.addTab(self.history_widget, "Geschiedenis")
+        self.tab_widget.addTab(self.viewer_widget, "Bekijken")
 
         self.hbox.addWidget(self.tab_widget)
         self.hbox.addLayout(self.vbox)
@@ -130,94 +229,278 @@ class UserInterface(QtWidgets.QMainWindow):
 
         self.Run_button.clicked.connect(self.start_scan)
         self.End_button.clicked.connect(self.End)
+        self.Monitor_button.clicked.connect(self.start_monitor)
         self.close_button.clicked.connect(self.close_program)
         self.save_button.clicked.connect(self.save)
         self.StartSpinBox.valueChanged.connect(self.hold_max)
         self.StopSpinBox.valueChanged.connect(self.hold_max)
+        self.downsample_box.stateChanged.connect(self.set_downsampling)
+        self.profile_box.stateChanged.connect(self.set_profiling)
+        self.open_button.clicked.connect(self.open_saved)
+        self.field_input.currentTextChanged.connect(self.show_field)
 
         self.experiment = None
+        self.fit = None
+        self.monitor = None
+        self.plotted_sweeps = 0
+        self.cache = SweepCache()
+        self.plotted_steps = 0
+        self.frame_times = collections.deque(maxlen=1000)
+        self.saved = None
+        self.lod = None
+        self.make_plot_items()
+        self.set_downsampling()
+
+        # zooming and panning ask for new points at most once per frame of 60 fps
+        self.view_timer = QtCore.QTimer()
+        self.view_timer.setSingleShot(True)
+        self.view_timer.setInterval(16)
+        self.view_timer.timeout.connect(self.plot_view)
+        self.viewer_plot.getViewBox().sigXRangeChanged.connect(self.schedule_view)
 
         self.plot_timer = QtCore.QTimer()
         # Roep iedere 100 ms de plotfunctie aan
         self.plot_timer.timeout.connect(self.plot_func)
+        self.plot_timer.timeout.connect(self.plot_history)
         self.plot_timer.start(100)
     
-    @Slot()
-    def plot_func(self):
-        """Plots the given function
+    def make_plot_items(self):
+        """Makes the curves and errorbars once, every plot only updates their data afterwards
         """
+        self.IV_curve = self.plot_widget.plot(symbol='o', color = "darkviolet", pen=None)
+        self.fit_curve = self.plot_widget.plot(pen=pg.mkPen("r", width=2))
+        self.R_V_curve = self.plot_R_V_widget.plot(symbol='o', color = 'b', pen=None)
+        self.P_R_curve = self.plot_P_R_widget.plot(symbol='o', color = 'b', pen=None)
+
+        self.error = pg.ErrorBarItem()
+        self.plot_widget.addItem(self.error)
+        self.error_R = pg.ErrorBarItem()
+        self.plot_R_V_widget.addItem(self.error_R)
+        self.error_P = pg.ErrorBarItem()
+        self.plot_P_R_widget.addItem(self.error_P)
+
+        # self.plot_P_R_widget.setXRange(0,8000)
+        # self.plot_P_R_widget.setLimits(xMin=0, xMax=8000,disableAutoRange = True)
+        # self.plot_P_R_widget.setLogMode(x=True)
+
+        # Gives the axes
+        self.plot_widget.setLabel("bottom", "Voltage U_pv(V)", color = "k")
+        self.plot_widget.setLabel("left", "Current I_pv(A)", color = "k")
+
+        self.plot_R_V_widget.setLabel("bottom", "Voltage U_0(V)", color = "k")
+        self.plot_R_V_widget.setLabel("left", "Resistance R(Ohm)", color = "k")
+
+        self.plot_P_R_widget.setLabel("bottom", "Resistance R(Ohm)", color = "k")
+        self.plot_P_R_widget.setLabel("left", "Vermogen P(Watt)", color = "k")
+
+        # the history of the monitor, both plots share the time axis
+        self.FF_plot = self.history_widget.addPlot(row=0, col=0, axisItems={"bottom": pg.DateAxisItem()})
+        self.P_max_plot = self.history_widget.addPlot(row=1, col=0, axisItems={"bottom": pg.DateAxisItem()})
+        self.P_max_plot.setXLink(self.FF_plot)
+        self.FF_plot.setLabel("left", "Fill factor FF", color = "k")
+        self.P_max_plot.setLabel("left", "Vermogen P_max(Watt)", color = "k")
+        self.P_max_plot.setLabel("bottom", "Tijd", color = "k")
+        self.FF_curve = self.FF_plot.plot(symbol='o', symbolSize=4, pen='b')
+        self.P_max_curve = self.P_max_plot.plot(symbol='o', symbolSize=4, pen='b')
+        # a history of months has more points than pixels
+        for curve in (self.FF_curve, self.P_max_curve):
+            curve.setDownsampling(auto=True, method="peak")
+            curve.setClipToView(True)
+
+        # the viewer picks its points itself, the x range is only changed by the user
+        self.viewer_curve = self.viewer_plot.plot(pen='b')
+        self.viewer_plot.enableAutoRange(x=False)
 
-        if self.experiment != None:
-            self.plot_widget.clear()
-
-            self.plot_widget.plot(
-            x = self.experiment.list_U_pv, 
-            y = self.experiment.list_I_pv, 
-            symbol='o', color = "darkviolet",
-            pen=None)
+    @Slot()
+    def set_downsampling(self):
+        """Only draws as many points as the screen can show if the downsample box is checked
+        """
+        downsample = self.downsample_box.isChecked()
+        for curve in (self.IV_curve, self.R_V_curve, self.P_R_curve):
+            curve.setDownsampling(auto=downsample, method="peak")
+            curve.setClipToView(downsample)
 
-            self.plot_R_V_widget.clear()
+    @Slot()
+    def set_profiling(self):
+        """Turns the telemetry on or off, it starts counting from zero every time it is turned on
+        """
+        if self.profile_box.isChecked():
+            telemetry.reset()
+            telemetry.enable()
+        else:
+            telemetry.disable()
+            self.statusBar().clearMessage()
 
-            self.plot_R_V_widget.plot(
-            x = self.experiment.list_U_0, 
-            y = self.experiment.list_R, 
-            symbol='o', color = 'b', 
-            pen=None)
+    @Slot()
+    def plot_func(self):
+        """Plots the measured points, only when new points have been measured
+        """
+        if self.experiment == None or self.experiment.n_steps == self.plotted_steps:
+            return
+
+        frame_start = time.perf_counter()
+
+        # takes a consistent view of all finished steps, rows are only added by the scan thread so nothing is copied here
+        self.plotted_steps, results = self.experiment.rows_since(0)
+        U_pv, I_pv, U_0 = results["U_pv"], results["I_pv"], results["U_0"]
+        R, P = results["R"], results["P"]
+
+        self.IV_curve.setData(x = U_pv, y = I_pv)
+        self.R_V_curve.setData(x = U_0, y = R)
+        self.P_R_curve.setData(x = R, y = P)
+
+        # Plots the errorbars
+        self.error.setData(
+            x = U_pv, y = I_pv,
+            left = results["U_err"], right = results["U_err"],
+            top = results["I_err"], bottom = results["I_err"]
+        )
+        self.error_R.setData(
+            x = U_0, y = R,
+            top = results["R_err"], bottom = results["R_err"]
+        )
+        self.error_P.setData(
+            x = R, y = P,
+            left = results["R_err"], right = results["R_err"],
+            top = results["P_err"], bottom = results["P_err"]
+        )
+
+        if self.fit_box.isChecked():
+            self.plot_fit(results)
+
+        # keeps the time it took to update the plots, to compare rendering speed
+        frame_time = time.perf_counter() - frame_start
+        self.frame_times.append(frame_time)
+
+        if telemetry.enabled:
+            telemetry.observe("gui.plot", frame_time)
+            self.statusBar().showMessage(telemetry.summary())
+
+    def plot_fit(self, results):
+        """fits the single-diode model to the measured points and draws the fitted curve. The fit starts both from the last fit,
+        which only takes a few iterations after a new point, and from a fresh guess, in case the new points changed the curve. Both are
+        fitted in one batch and the best one is kept
+
+        Args:
+            results (numpy array): the derived values of the finished steps
+        """
+        # the model has 5 parameters
+        if len(results) < 8:
+            return
+        fresh = np.zeros(1, dtype=FIT_DTYPE)
+        fresh["I_L"] = np.nan
+        initial = fresh if self.fit is None else np.concatenate([self.fit, fresh])
+        with telemetry.timer("gui.fit"):
+            fits = fit_results([results] * len(initial), initial=initial)
+        finite = np.isfinite(fits["FF"])
+        if not finite.any():
+            return
+        fit = self.fit = fits[[np.argmin(np.where(finite, fits["chi2"], np.inf))]]
+
+        U = np.linspace(0, fit["U_oc"][0], 200)
+        self.fit_curve.setData(x = U, y = model_current(fit, U)[0])
+        self.fit_label.setText(
+            f"FF = {fit['FF'][0]:.3f}  P_max = {fit['P_max'][0]:.3g} W\n"
+            f"U_oc = {fit['U_oc'][0]:.3f} V  I_sc = {fit['I_sc'][0]:.3g} A"
+        )
 
-            self.plot_P_R_widget.clear()
+    @Slot()
+    def plot_history(self):
+        """Plots the fill factor and maximum power of every sweep of the monitor, only when a sweep has been added
+        """
+        if self.monitor == None or self.monitor.sweeps == self.plotted_sweeps:
+            return
+        self.plotted_sweeps = self.monitor.sweeps
+        history = self.monitor.history()
+        self.FF_curve.setData(x = history["time"], y = history["FF"])
+        self.P_max_curve.setData(x = history["time"], y = history["P_max"])
 
-            self.plot_P_R_widget.plot(
-            x = self.experiment.list_R, 
-            y = self.experiment.list_P, 
-            symbol='o', color = 'b', 
-            pen=None)
-            
-            
-            # Plots the errorbars
-            self.error =pg.ErrorBarItem()
-            self.error.setData(
-                x = np.array(self.experiment.list_U_pv), y = np.array(self.experiment.list_I_pv),
-                left = np.array(self.experiment.list_U_err), right = np.array(self.experiment.list_U_err),
-                top = np.array(self.experiment.list_I_err), bottom = np.array(self.experiment.list_I_err)
-            )
-            self.plot_widget.addItem(self.error)
-
-
-            self.error_R =pg.ErrorBarItem()
-            self.error_R.setData(
-                x = np.array(self.experiment.list_U_0), y = np.array(self.experiment.list_R),
-                top = np.array(self.experiment.list_R_err), bottom = np.array(self.experiment.list_R_err)
-            )
-            self.plot_R_V_widget.addItem(self.error_R)
-            
-            self.error_P =pg.ErrorBarItem()
-            self.error_P.setData(
-                x = np.array(self.experiment.list_R), y = np.array(self.experiment.list_P),
-                left = np.array(self.experiment.list_R_err), right = np.array(self.experiment.list_R_err),
-                top = np.array(self.experiment.list_P_err), bottom = np.array(self.experiment.list_P_err)
-            )
-            self.plot_P_R_widget.addItem(self.error_P)
+    @Slot()
+    def open_saved(self):
+        """Opens a capture or monitor history in the viewer
+        """
+        filename, _ = QtWidgets.QFileDialog.getOpenFileName(filter="Measurements (*.pvcap *.pvts)", dir=MEASUREMENTS_DIRECTORY)
+        if filename:
+            self.open_measurement(filename)
 
-            # self.plot_P_R_widget.setXRange(0,8000)
-            # self.plot_P_R_widget.setLimits(xMin=0, xMax=8000,disableAutoRange = True)
-            # self.plot_P_R_widget.setLogMode(x=True)
+    def open_measurement(self, filename):
+        """Shows a capture or monitor history in the viewer, an unreadable file gives an error to the user
 
-            # Gives the axes
-            self.plot_widget.setLabel("bottom", "Voltage U_pv(V)", color = "k")
-            self.plot_widget.setLabel("left", "Current I_pv(A)", color = "k")
+        Args:
+            filename (string): the name of the .pvcap or .pvts file
+        """
+        try:
+            self.saved = SavedMeasurement(filename)
+        except (OSError, ValueError) as error:
+            wrong_file_box = QtWidgets.QMessageBox()
+            wrong_file_box.setWindowTitle("Error")
+            wrong_file_box.setText(f"{filename} can't be opened: {error}")
+            wrong_file_box.exec()
+            return
+
+        # a history is plotted against the time
+        bottom = pg.DateAxisItem() if self.saved.capture is None else pg.AxisItem("bottom")
+        self.viewer_plot.setAxisItems({"bottom": bottom})
+        self.viewer_plot.setLabel("bottom", self.saved.x_label, color = "k")
+
+        self.lod = None
+        self.field_input.blockSignals(True)
+        self.field_input.clear()
+        self.field_input.addItems(self.saved.fields)
+        self.field_input.blockSignals(False)
+        self.show_field(self.saved.fields[0])
+
+    @Slot(str)
+    def show_field(self, field):
+        """Plots one field of the opened measurement over its whole range, the levels of detail are made the first time
+        """
+        if self.saved is None or not field:
+            return
+        QtWidgets.QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+        try:
+            self.lod = self.saved.lod(field)
+        finally:
+            QtWidgets.QApplication.restoreOverrideCursor()
+        self.viewer_plot.setLabel("left", field, color = "k")
+        self.viewer_label.setText(f"{len(self.saved):,} points")
+        self.viewer_plot.setXRange(*self.lod.x_range, padding=0)
+        self.plot_view()
 
-            self.plot_R_V_widget.setLabel("bottom", "Voltage U_0(V)", color = "k")
-            self.plot_R_V_widget.setLabel("left", "Resistance R(Ohm)", color = "k")
+    @Slot()
+    def schedule_view(self):
+        """Plots the viewer again after the next frame, the range changes of one frame are taken together
+        """
+        if not self.view_timer.isActive():
+            self.view_timer.start()
 
-            self.plot_P_R_widget.setLabel("bottom", "Resistance R(Ohm)", color = "k")
-            self.plot_P_R_widget.setLabel("left", "Vermogen P(Watt)", color = "k")
+    @Slot()
+    def plot_view(self):
+        """Plots the points of the opened measurement that are in view, at most two per pixel
+        """
+        if self.lod is None:
+            return
+        (x_min, x_max), _ = self.viewer_plot.getViewBox().viewRange()
+        with telemetry.timer("gui.view"):
+            x, y = self.lod.view(x_min, x_max, max_points=max(2 * self.viewer_plot.width(), 200))
+            self.viewer_curve.setData(x = x, y = y)
 
     @Slot()
     def save(self):
         """Saves the file
         """
-        filename, _ = QtWidgets.QFileDialog.getSaveFileName(filter="CSV files (*.csv)", dir="src/pythondaq/Measurements")
-        self.experiment.df.to_csv(path_or_buf=f"{filename}")
+        # nothing has been measured yet
+        if self.experiment is None:
+            return
+        filename, _ = QtWidgets.QFileDialog.getSaveFileName(filter="CSV files (*.csv)", dir=MEASUREMENTS_DIRECTORY)
+        # the dialog was cancelled
+        if not filename:
+            return
+        if self.experiment.capture_path:
+            # the capture also holds the steps of a measurement that is still running or has crashed
+            open_capture(self.experiment.capture_path).to_csv(f"{filename}")
+        else:
+            # the sweeps of the monitor are not captured, the last one is saved
+            results_dataframe(sort_by_adc(self.experiment.results)).to_csv(f"{filename}")
         # saves a plot with the same name
 
     @Slot()
@@ -237,38 +520,75 @@ class UserInterface(QtWidgets.QMainWindow):
             # Turns the device on
             device = self.port_input.currentText()
             self.experiment = DiodeExperiment(device)
+            self.plotted_steps = None
+            self.fit = None
 
             # Takes the given values
             rep_num = self.MeasSpinBox.value()
-            start = round(self.StartSpinBox.value() *(1023/3.3))
-            stop = round(self.StopSpinBox.value() *(1023/3.3)) + 1
+            start = volt_to_adc(self.StartSpinBox.value())
+            stop = volt_to_adc(self.StopSpinBox.value()) + 1
 
-            # Enters the values into the scan
-            self.experiment.start_scan(start, stop, rep_num)
+            # Enters the values into the scan, every step is written to a capture file right away.
+            # When resuming the steps of the last measurement are kept and only the missing ones are measured
+            capture_path = measurement_path("capture", ".pvcap")
+            cache = self.cache if self.resume_box.isChecked() else None
+            self.experiment.start_scan(start, stop, rep_num, capture_path, cache=cache)
 
             
 
-            # If a wrong port has been set it gives an error code back
-        except:
+            # If a wrong port has been set, the Arduino doesn't answer or the capture can't be made it gives an error code back
+        except (OSError, ValueError, VisaError) as error:
+            wrong_port_box = QtWidgets.QMessageBox()
+            wrong_port_box.setWindowTitle("Error")
+            wrong_port_box.setText(f"The Arduino isn't connected to the port {device}\n{error}")
+            wrong_port_box.exec()
+
+    @Slot()
+    def start_monitor(self):
+        """Starts measuring again and again with the given values, the summary of every measurement is kept in a time series file
+        """
+        if self.monitor != None and self.monitor.is_running:
+            return
+        device = self.port_input.currentText()
+        experiment = None
+        try:
+            experiment = DiodeExperiment(device)
+            experiment.verbose = False
+
+            start = volt_to_adc(self.StartSpinBox.value())
+            stop = volt_to_adc(self.StopSpinBox.value()) + 1
+            store_path = measurement_path("monitor", ".pvts")
+            monitor = Monitor(experiment, start, stop, self.MeasSpinBox.value(), store_path, interval=self.IntervalSpinBox.value())
+
+            # If a wrong or busy port has been set or the time series can't be made it gives an error code back
+        except (OSError, ValueError, VisaError) as error:
+            # the Arduino of a monitor that couldn't start is handed back
+            if experiment is not None:
+                pool.release(experiment.device)
             wrong_port_box = QtWidgets.QMessageBox()
             wrong_port_box.setWindowTitle("Error")
-            wrong_port_box.setText(f"The Arduino isn't connected to the port {device}")
+            wrong_port_box.setText(f"The monitor on port {device} couldn't start\n{error}")
             wrong_port_box.exec()
+            return
+
+        # only a monitor that started replaces the measurement on screen
+        self.experiment = experiment
+        self.monitor = monitor
+        self.plotted_steps = None
+        self.fit = None
+        self.plotted_sweeps = 0
+        self.monitor.start_monitor()
 
     @Slot()
     def End(self):
         """Ends the measurement, if no measurement is happening it gives an error to the user
         """
-        try:
-            if self.experiment.end_meas == None:
-                self.experiment.end_meas = True
-
-            else: 
-                wrong_port_box = QtWidgets.QMessageBox()
-                wrong_port_box.setWindowTitle("Error")
-                wrong_port_box.setText(f"No measurement is taking place")
-                wrong_port_box.exec()
-        except: 
+        if self.monitor != None and self.monitor.is_running:
+            self.monitor.stop()
+        elif self.experiment != None and self.experiment.is_running:
+            self.experiment.stop()
+
+        else: 
             wrong_port_box = QtWidgets.QMessageBox()
             wrong_port_box.setWindowTitle("Error")
             wrong_port_box.setText(f"No measurement is taking place")
@@ -0,0 +1,446 @@
+# virtual Arduinos with a photovoltaic cell, served over TCP sockets or pseudo-terminals so the real VISA stack
+# can be load tested against many boards on one machine
+import json
+import os
+import queue
+import re
+import socket
+import threading
+import time
+import numpy as np
+from pythondaq.calibration import ADC_CODES, ADC_MAX, ADC_RESOLUTION, DIVIDER, R_SENSE
+from pythondaq.frames import encode_frame
+
+# the running emulators write their resources here, so list_devices finds them
+REGISTRY_PATH = os.path.join(os.path.expanduser("~"), ".cache", "pythondaq", "emulators.json")
+_registry_lock = threading.Lock()
+
+# os.kill(pid, 0) ends the process on Windows, there the process is looked up with the Windows API
+_WINDOWS = os.name == "nt"
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+ERROR_ACCESS_DENIED = 5
+STILL_ACTIVE = 259
+
+
+class PVResponse:
+    """The circuit of the experiment: a solar cell that follows the single-diode model, loaded by a transistor whose
+    gate is driven by the output CH0 and a resistor of R_SENSE. The operating point of every output value is
+    calculated once
+    """
+    def __init__(self, I_L=0.01, I_0=1e-9, a=0.377, R_s=5.0, R_sh=5000.0, V_th=1.65, K=2.0):
+        """Sets up the cell and the transistor
+
+        Args:
+            I_L (float): the light current in A
+            I_0 (float): the saturation current of the diode in A
+            a (float): the ideality factor times the thermal voltage times the amount of cells in series, in V
+            R_s (float): the series resistance in Ohm
+            R_sh (float): the shunt resistance in Ohm
+            V_th (float): the gate voltage in V above which the transistor starts to conduct
+            K (float): the conductance of the transistor grows as K * (U_0 - V_th)**2
+        """
+        # the diode voltage gives the current and the cell voltage directly, a fine grid of it gives the whole curve
+        V_d = np.linspace(0, a * np.log(I_L / I_0 + 1) + 1, 20000)
+        I = I_L - I_0 * np.expm1(V_d / a) - V_d / R_sh
+        U = V_d - I * R_s
+        on_curve = (I > 0) & (U >= 0)
+        U, I = U[on_curve], I[on_curve]
+
+        # the load of every output value, from open circuit below V_th to a few Ohm
+        U_0 = np.arange(ADC_CODES) * ADC_RESOLUTION
+        R_load = 1 / (K * np.maximum(U_0 - V_th, 0) ** 2 + 1e-9) + R_SENSE
+        # U / I rises along the curve, the operating point is where it equals the load
+        self.U_pv = np.interp(np.log(R_load), np.log(U / I), U)
+        self.I_pv = self.U_pv / R_load
+
+    def codes(self, setting):
+        """gives the ADC codes that channel 1 and 2 read without noise
+
+        Args:
+            setting (float): the output value in ADC, between two values while the circuit settles
+
+        Returns:
+            tuple: the codes of channel 1 and 2 as floats
+        """
+        U_pv = np.interp(setting, np.arange(ADC_CODES), self.U_pv)
+        I_pv = np.interp(setting, np.arange(ADC_CODES), self.I_pv)
+        return U_pv / DIVIDER / ADC_RESOLUTION, I_pv * R_SENSE / ADC_RESOLUTION
+
+
+class VirtualArduino:
+    """Answers the commands of the Arduino VISA firmware for a PVResponse, with noise on every reading, a settle time
+    after the output changes and faults that happen at random: a reply that never comes, a reply with a flipped byte or
+    a reply that takes [stall_time] longer
+    """
+    def __init__(self, response=None, name="virtual PV cell", capabilities=("BURST", "BIN"), noise=1.0, settle_time=0.0,
+                 latency=0.0, jitter=0.0, faults=None, stall_time=0.5, sample_time=1e-4, seed=None):
+        """Sets up the board
+
+        Args:
+            response (PVResponse): the circuit, the default cell if not given
+            name (string): put in the identification
+            capabilities (tuple): the optional firmware features that the board announces and answers
+            noise (float): the standard deviation of the noise on every reading, in ADC steps
+            settle_time (float): the time constant in seconds of the circuit after the output changes
+            latency (float): the time in seconds between a command and its reply
+            jitter (float): every reply takes up to this many seconds longer or shorter
+            faults (dict): the chance per reply of "drop", "garble" and "stall"
+            stall_time (float): the extra time in seconds of a stalled reply
+            sample_time (float): the time in seconds that one reading takes
+            seed (integer): seed of the noise and faults, for repeatable runs
+        """
+        self.response = response or PVResponse()
+        self.name = name
+        self.capabilities = [capability.upper() for capability in capabilities]
+        self.noise = noise
+        self.settle_time = settle_time
+        self.latency = latency
+        self.jitter = jitter
+        self.faults = dict(faults or {})
+        self.stall_time = stall_time
+        self.sample_time = sample_time
+        self._random = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+        self.setting = 0
+        self._previous_setting = 0
+        self._changed_at = 0.0
+        self._sequence = 0xFFFF
+        # the amount of every fault that happened
+        self.injected = {"drop": 0, "garble": 0, "stall": 0}
+
+    def identification(self):
+        features = f" [{','.join(self.capabilities)}]" if self.capabilities else ""
+        return f"Emulated Arduino VISA firmware ({self.name}){features}"
+
+    def handle(self, command):
+        """answers one command
+
+        Args:
+            command (string): the command without its termination
+
+        Returns:
+            string or bytes: the reply, bytes for a binary frame, None for a command without reply
+        """
+        with self._lock:
+            if command == "*IDN?":
+                return self.identification()
+            if match := re.fullmatch(r"OUT:CH0 (\d+)", command):
+                self._set(int(match[1]))
+                return match[1]
+            if match := re.fullmatch(r"OUT:CH0:VOLT (\d*\.?\d+)", command):
+                self._set(round(float(match[1]) / ADC_RESOLUTION))
+                return match[1]
+            if command == "OUT:CH0?":
+                return str(self.setting)
+            if match := re.fullmatch(r"MEAS:CH(\d+)\?", command):
+                return str(self._read([int(match[1])], 1)[0, 0])
+            if "BURST" in self.capabilities and (match := re.fullmatch(r"MEAS:CH(\d+):BURST\? (\d+)", command)):
+                return ",".join(map(str, self._read([int(match[1])], int(match[2]))[:, 0]))
+            if "BIN" in self.capabilities and (match := re.fullmatch(r"MEAS:BIN\? ([\d,]+) (\d+)", command)):
+                codes = self._read([int(channel) for channel in match[1].split(",")], int(match[2]))
+                self._sequence = (self._sequence + 1) & 0xFFFF
+                return encode_frame(self._sequence, codes.ravel())
+            return f"ERROR: unknown command {command}"
+
+    def delay(self):
+        """gives the time in seconds until the next reply is sent, with jitter and stalls
+
+        Returns:
+            float: the delay
+        """
+        delay = self.latency
+        if self.jitter:
+            delay = max(delay + self._random.uniform(-self.jitter, self.jitter), 0.0)
+        if self._happens("stall"):
+            delay += self.stall_time
+        return delay
+
+    def inject(self, reply):
+        """drops or garbles a reply, by the chances in [faults]
+
+        Args:
+            reply (bytes): the encoded reply
+
+        Returns:
+            bytes: the reply to send, None if it is dropped
+        """
+        if self._happens("drop"):
+            return None
+        if reply and self._happens("garble"):
+            reply = bytearray(reply)
+            # the termination is kept so the reply still arrives
+            position = int(self._random.integers(max(len(reply) - 2, 1)))
+            reply[position] ^= 1 << int(self._random.integers(8))
+            reply = bytes(reply)
+        return reply
+
+    def _happens(self, fault):
+        if self.faults.get(fault, 0) > 0 and self._random.random() < self.faults[fault]:
+            self.injected[fault] += 1
+            return True
+        return False
+
+    def _set(self, setting):
+        if setting != self.setting:
+            self._previous_setting, self._changed_at = self._current_setting(), time.monotonic()
+            self.setting = setting
+
+    def _current_setting(self):
+        """the output that the circuit sees, moving from the previous output to the new one with the settle time"""
+        if self.settle_time <= 0:
+            return self.setting
+        remaining = np.exp(-(time.monotonic() - self._changed_at) / self.settle_time)
+        return self.setting + (self._previous_setting - self.setting) * remaining
+
+    def _read(self, channels, repeats):
+        """takes [repeats] noisy readings of the channels
+
+        Returns:
+            numpy array: the integer codes with shape (repeats, len(channels))
+        """
+        if self.sample_time:
+            time.sleep(self.sample_time * repeats * len(channels))
+        U_code, I_code = self.response.codes(self._current_setting())
+        clean = np.array([{1: U_code, 2: I_code, 0: self.setting}.get(channel, 0) for channel in channels], dtype=float)
+        noisy = clean + self._random.normal(0, self.noise, (repeats, len(channels))) if self.noise else np.tile(clean, (repeats, 1))
+        return np.clip(np.rint(noisy), 0, ADC_MAX).astype(int)
+
+
+def _encode(reply):
+    return reply if isinstance(reply, bytes) else f"{reply}\r\n".encode()
+
+
+class _Connection:
+    """Serves one client of a virtual Arduino. A reader thread takes the commands as they arrive, a writer thread
+    answers them in order, each [latency] after it arrived, so commands that are sent ahead overlap like on a serial line
+    """
+    def __init__(self, board, receive, send, on_close=None):
+        self.board = board
+        self.receive = receive
+        self.send = send
+        self.on_close = on_close
+        self.commands = queue.Queue()
+        self.closed = threading.Event()
+        threading.Thread(target=self._read_commands, daemon=True).start()
+        threading.Thread(target=self._answer, daemon=True).start()
+
+    def _read_commands(self):
+        buffer = b""
+        try:
+            while not self.closed.is_set():
+                data = self.receive()
+                if not data:
+                    break
+                buffer += data
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    self.commands.put((time.monotonic(), line.strip(b"\r").decode(errors="replace")))
+        except OSError:
+            pass
+        self.close()
+
+    def _answer(self):
+        while True:
+            item = self.commands.get()
+            if item is None:
+                return
+            arrival, command = item
+            reply = self.board.inject(_encode(self.board.handle(command)))
+            wait = arrival + self.board.delay() - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            if reply is None:
+                continue
+            try:
+                self.send(reply)
+            except OSError:
+                self.close()
+                return
+
+    def close(self):
+        if not self.closed.is_set():
+            self.closed.set()
+            self.commands.put(None)
+            if self.on_close:
+                self.on_close()
+
+
+class EmulatorServer:
+    """Serves [count] virtual Arduinos, every board on its own TCP port or pseudo-terminal. The boards get a bit more
+    or less light each, so their curves differ. While running the resources are in the registry that list_devices reads
+    """
+    def __init__(self, count=1, transport="tcp", host="127.0.0.1", port=0, registry=REGISTRY_PATH, seed=None, **board_options):
+        """Sets up the boards, nothing is served before start
+
+        Args:
+            count (integer): the amount of virtual Arduinos
+            transport (string): "tcp" for TCPIP::host::port::SOCKET resources, "pty" for ASRL/dev/pts/N::INSTR resources
+            host (string): the address that the TCP ports listen on
+            port (integer): the TCP port of the first board, the next boards count up from it. 0 lets the system pick free ports
+            registry (string): the json file where the resources are kept while the server runs, None to not register them
+            seed (integer): seed of the light, noise and faults of the boards
+            board_options: passed to every VirtualArduino, like latency, noise or faults
+        """
+        if transport not in ("tcp", "pty"):
+            raise ValueError(f"unknown transport {transport}, use tcp or pty")
+        self.transport = transport
+        self.host = host
+        self.port = port
+        self.registry = registry
+        seeds = np.random.SeedSequence(seed).spawn(count)
+        light = np.random.default_rng(seed).uniform(0.8, 1.2, count)
+        self.boards = [
+            VirtualArduino(PVResponse(I_L=0.01 * light[index]), name=f"virtual PV cell {index}", seed=seeds[index], **board_options)
+            for index in range(count)
+        ]
+        self.resources = []
+        self._closers = []
+
+    def start(self):
+        """serves every board and registers the resources
+
+        Returns:
+            list: the VISA resource names of the boards
+        """
+        for index, board in enumerate(self.boards):
+            if self.transport == "tcp":
+                self.resources.append(self._serve_tcp(board, self.port + index if self.port else 0))
+            else:
+                self.resources.append(self._serve_pty(board))
+        if self.registry:
+            _update_registry(self.registry, self._key(), self.resources)
+        return self.resources
+
+    def _key(self):
+        return f"{os.getpid()}:{id(self)}"
+
+    def _serve_tcp(self, board, port):
+        listener = socket.create_server((self.host, port))
+        connections = []
+
+        def accept():
+            while True:
+                try:
+                    client, _ = listener.accept()
+                except OSError:
+                    return
+                client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                connections.append(_Connection(board, lambda client=client: client.recv(4096), client.sendall, client.close))
+
+        def close():
+            listener.close()
+            for connection in connections:
+                connection.close()
+
+        threading.Thread(target=accept, daemon=True).start()
+        self._closers.append(close)
+        return f"TCPIP::{self.host}::{listener.getsockname()[1]}::SOCKET"
+
+    def _serve_pty(self, board):
+        import pty
+        import tty
+
+        controller, terminal = pty.openpty()
+        # no echo and no translation of line endings, binary frames must arrive unchanged
+        tty.setraw(terminal)
+        path = os.ttyname(terminal)
+
+        def send(data):
+            while data:
+                data = data[os.write(controller, data):]
+
+        # the terminal itself stays open here, so a client that closes and opens it again talks to the same connection
+        connection = _Connection(board, lambda: os.read(controller, 4096), send)
+
+        def close():
+            connection.close()
+            for fd in (controller, terminal):
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+
+        self._closers.append(close)
+        return f"ASRL{path}::INSTR"
+
+    def stop(self):
+        """stops serving and removes the resources from the registry
+        """
+        for close in self._closers:
+            close()
+        self._closers = []
+        if self.registry:
+            _update_registry(self.registry, self._key(), None)
+        self.resources = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def _read_registry(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _update_registry(path, key, resources):
+    """adds the resources of a server, or removes them when [resources] is None, and forgets servers that have ended"""
+    with _registry_lock:
+        entries = {key: entry for key, entry in _read_registry(path).items() if _alive(entry["pid"])}
+        if resources is None:
+            entries.pop(key, None)
+        else:
+            entries[key] = {"pid": os.getpid(), "resources": list(resources)}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(entries, file)
+        os.replace(temporary, path)
+
+
+def _alive(pid):
+    """checks whether a process still runs, without sending it anything"""
+    if _WINDOWS:
+        return _alive_windows(pid)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _alive_windows(pid):
+    """asks Windows for the exit code of a process, os.kill would end it there"""
+    import ctypes
+
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        # a process of another user can't be opened but does run
+        return ctypes.get_last_error() == ERROR_ACCESS_DENIED
+    try:
+        code = ctypes.c_ulong()
+        return bool(kernel32.GetExitCodeProcess(handle, ctypes.byref(code))) and code.value == STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def emulated_resources(path=None):
+    """gives the resources of the emulators that are running
+
+    Args:
+        path (string): the registry of the emulators, REGISTRY_PATH if not given
+
+    Returns:
+        list: the VISA resource names
+    """
+    return [resource for entry in _read_registry(path or REGISTRY_PATH).values() if _alive(entry["pid"]) for resource in entry["resources"]]
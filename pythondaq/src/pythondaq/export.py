@@ -0,0 +1,137 @@
+import csv
+import json
+import os
+
+# the columns of a streamed measurement, one row per ADC step
+ROW_FIELDS = ["port", "adc", "U_0", "U_pv", "U_err", "I_pv", "I_err", "R", "R_err", "P", "P_err"]
+
+# the formats that can be streamed and the extensions they are recognised by
+FORMATS = {"csv": (".csv",), "ndjson": (".ndjson", ".jsonl"), "parquet": (".parquet",)}
+
+
+def guess_format(path):
+    """gives the format that belongs to the extension of a file, csv if it is not known
+
+    Args:
+        path (string): the name of the file
+    """
+    extension = os.path.splitext(path)[1].lower()
+    for name, extensions in FORMATS.items():
+        if extension in extensions:
+            return name
+    return "csv"
+
+
+def _columns(port, adc_codes, results):
+    """gives the values of every column as python lists, numpy numbers can't be written by csv and json"""
+    columns = {"port": [port] * len(results), "adc": adc_codes.tolist()}
+    for name in ROW_FIELDS[2:]:
+        columns[name] = results[name].tolist()
+    return columns
+
+
+class CsvStream:
+    """Writes rows as comma separated values with a header
+    """
+    def __init__(self, file):
+        self.file = file
+        self.writer = csv.writer(file, lineterminator="\n")
+        self.writer.writerow(ROW_FIELDS)
+
+    def write(self, port, adc_codes, results):
+        """writes the rows of some finished steps and flushes them
+
+        Args:
+            port (string): the USB-port of the Arduino that measured them
+            adc_codes (numpy array): the output value in ADC of every step
+            results (numpy array): record array as returned by derive_quantities
+        """
+        columns = _columns(port, adc_codes, results)
+        self.writer.writerows(zip(*(columns[name] for name in ROW_FIELDS)))
+        self.file.flush()
+
+    def close(self):
+        pass
+
+
+class NdjsonStream:
+    """Writes every row as a JSON object on its own line, nan is written as null
+    """
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, port, adc_codes, results):
+        """writes the rows of some finished steps and flushes them, like CsvStream.write
+        """
+        columns = _columns(port, adc_codes, results)
+        lines = []
+        for row in zip(*(columns[name] for name in ROW_FIELDS)):
+            # nan isn't valid JSON
+            row = [None if value != value else value for value in row]
+            lines.append(json.dumps(dict(zip(ROW_FIELDS, row)), allow_nan=False))
+        if lines:
+            self.file.write("\n".join(lines) + "\n")
+            self.file.flush()
+
+    def close(self):
+        pass
+
+
+class ParquetStream:
+    """Writes the rows to a Parquet file, every [row_group] rows are written as a row group.
+    Needs pyarrow, which is not a dependency of pythondaq
+    """
+    def __init__(self, path, row_group=4096):
+        """Opens the file
+
+        Args:
+            path (string): the name of the Parquet file
+            row_group (integer): the amount of rows that are kept before they are written
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self.schema = pa.schema([("port", pa.string()), ("adc", pa.int64())] + [(name, pa.float64()) for name in ROW_FIELDS[2:]])
+        self.writer = pq.ParquetWriter(path, self.schema)
+        self.row_group = row_group
+        self._pending = []
+        self._rows = 0
+
+    def write(self, port, adc_codes, results):
+        """keeps the rows of some finished steps, like CsvStream.write, and writes a row group once there are enough
+        """
+        self._pending.append(_columns(port, adc_codes, results))
+        self._rows += len(results)
+        if self._rows >= self.row_group:
+            self._flush()
+
+    def _flush(self):
+        if self._rows:
+            columns = {name: [value for batch in self._pending for value in batch[name]] for name in ROW_FIELDS}
+            self.writer.write_table(self._pa.table(columns, schema=self.schema))
+        self._pending = []
+        self._rows = 0
+
+    def close(self):
+        self._flush()
+        self.writer.close()
+
+
+def open_stream(file, format):
+    """makes the writer of a format
+
+    Args:
+        file (file or string): an open text file for csv and ndjson, the name of the file for parquet
+        format (string): one of FORMATS
+
+    Returns:
+        object: a writer with write(port, adc_codes, results) and close()
+    """
+    if format == "csv":
+        return CsvStream(file)
+    if format == "ndjson":
+        return NdjsonStream(file)
+    if format == "parquet":
+        return ParquetStream(file)
+    raise ValueError(f"unknown format {format}, use one of {', '.join(FORMATS)}")
@@ -0,0 +1,266 @@
+# fits the single-diode model of a solar cell to measured I-V curves, many sweeps at once
+import numpy as np
+from pythondaq.calibration import ADC_RESOLUTION, DIVIDER, R_SENSE
+
+# the parameters of I = I_L - I_0 * (exp((U + I * R_s) / a) - 1) - (U + I * R_s) / R_sh,
+# a is the ideality factor times the thermal voltage times the amount of cells in series
+FIT_DTYPE = np.dtype([
+    ("I_L", float), ("I_0", float), ("a", float), ("R_s", float), ("R_sh", float),
+    ("chi2", float), ("iterations", int), ("converged", bool),
+    ("U_oc", float), ("I_sc", float), ("U_mpp", float), ("I_mpp", float), ("P_max", float), ("FF", float),
+])
+
+# the smallest errors that the Arduino can give, one ADC step over sqrt(12), so steps without spread don't get an infinite weight
+U_ERR_MIN = DIVIDER * ADC_RESOLUTION / np.sqrt(12)
+I_ERR_MIN = ADC_RESOLUTION / R_SENSE / np.sqrt(12)
+
+# exp overflows above this
+_EXP_MAX = 700.0
+
+
+def _unpack(theta):
+    """gives the model parameters from the fitted ones, the fit uses ln(I_0) and the shunt conductance 1/R_sh"""
+    return theta[:, 0:1], np.exp(theta[:, 1:2]), theta[:, 2:3], theta[:, 3:4], theta[:, 4:5]
+
+
+def _residuals(theta, U, I, U_err, I_err, mask, weight=None):
+    """gives the weighted residuals of the implicit model and their derivatives to the fitted parameters
+
+    The errors on both U and I are turned into an error on the residual with the derivatives of the model to U and I (effective variance).
+    The weights are only calculated when not given, a step is judged with the weights of the parameters it starts from so a fit can't
+    make its residuals small by making their errors large.
+
+    Returns:
+        tuple: the residuals with shape (sweeps, points), the jacobian with shape (sweeps, points, 5) and the weights, zero where mask is False
+    """
+    I_L, I_0, a, R_s, G_sh = _unpack(theta)
+    U_d = U + I * R_s
+    x = U_d / a
+    E = np.exp(np.minimum(x, _EXP_MAX))
+    f = I_L - I_0 * (E - 1) - G_sh * U_d - I
+
+    df_dU = -I_0 * E / a - G_sh
+    if weight is None:
+        df_dI = R_s * df_dU - 1
+        sigma = np.sqrt((df_dU * U_err) ** 2 + (df_dI * I_err) ** 2)
+        weight = np.where(mask, 1 / sigma, 0)
+
+    jacobian = np.stack([
+        np.ones_like(f),
+        -I_0 * (E - 1),
+        I_0 * E * x / a,
+        I * df_dU,
+        -U_d,
+    ], axis=-1)
+    return np.where(mask, f, 0) * weight, jacobian * weight[..., None], weight
+
+
+def _initial_guess(U, I, mask):
+    """estimates the parameters from the shape of the curves"""
+    U_oc = np.nanmax(np.where(mask, U, np.nan), axis=1)
+    I_sc = np.nanmax(np.where(mask, I, np.nan), axis=1)
+
+    # the shunt conductance from the slope of the lowest fifth of the voltages
+    low = mask & (U <= U_oc[:, None] * 0.2)
+    low &= low.sum(axis=1, keepdims=True) >= 3
+    n = np.maximum(low.sum(axis=1), 1)
+    U_mean = np.where(low, U, 0).sum(axis=1) / n
+    I_mean = np.where(low, I, 0).sum(axis=1) / n
+    slope = (np.where(low, (U - U_mean[:, None]) * (I - I_mean[:, None]), 0).sum(axis=1)
+             / np.maximum(np.where(low, (U - U_mean[:, None]) ** 2, 0).sum(axis=1), 1e-12))
+    G_sh = np.clip(-slope, 1e-9, I_sc / np.maximum(U_oc, 1e-9))
+
+    # puts the open voltage about 20 times a above the voltage where I_0 matters
+    a = np.maximum(U_oc / 20, 1e-3)
+    I_L = I_sc
+    ln_I_0 = np.log(np.maximum(I_L, 1e-12)) - U_oc / a
+    R_s = 0.01 * U_oc / np.maximum(I_sc, 1e-12)
+    return np.stack([I_L, ln_I_0, a, R_s, G_sh], axis=1)
+
+
+# the lowest values of the fitted parameters, a, R_s and the shunt conductance can't be negative
+_LOWER = np.array([-np.inf, -np.inf, 1e-4, 0.0, 0.0])
+
+
+def _constrain(theta):
+    """keeps a, R_s and the shunt conductance physical"""
+    return np.maximum(theta, _LOWER)
+
+
+def _solve(A, g):
+    """solves the damped normal equations of every sweep"""
+    try:
+        return np.linalg.solve(A, -g[..., None])[..., 0]
+    except np.linalg.LinAlgError:
+        return -g / np.einsum("bpp->bp", A)
+
+
+def _bisect(function, lo, hi, iterations=60):
+    """finds the root of a decreasing function between lo and hi for all elements at once"""
+    for _ in range(iterations):
+        middle = (lo + hi) / 2
+        positive = function(middle) > 0
+        lo = np.where(positive, middle, lo)
+        hi = np.where(positive, hi, middle)
+    return (lo + hi) / 2
+
+
+def model_current(fit, U):
+    """gives the current of the fitted model at the given voltages
+
+    Args:
+        fit (numpy array): records of FIT_DTYPE, one per sweep
+        U (numpy array): the voltages with shape (points,) or (sweeps, points)
+
+    Returns:
+        numpy array: the currents with shape (sweeps, points)
+    """
+    fit = np.atleast_1d(fit)
+    I_L, I_0, a, R_s, R_sh = (fit[name][:, None] for name in ("I_L", "I_0", "a", "R_s", "R_sh"))
+    U = np.broadcast_to(U, (len(fit), np.shape(U)[-1]))
+
+    def g(I):
+        U_d = U + I * R_s
+        return I_L - I_0 * (np.exp(np.minimum(U_d / a, _EXP_MAX)) - 1) - U_d / R_sh - I
+
+    # g decreases with I, the current lies between the short-circuit currents of the whole range
+    span = np.abs(I_L) + np.abs(U).max(axis=1, keepdims=True) / R_sh + 1e-12
+    return _bisect(g, -span - I_L, span + I_L)
+
+
+def _derive(fit, points=256):
+    """calculates the open voltage, short-circuit current and maximum power point of the fitted models"""
+    I_L, I_0, a, R_s, R_sh = (fit[name][:, None] for name in ("I_L", "I_0", "a", "R_s", "R_sh"))
+
+    # the voltage without current, at most a * ln(I_L / I_0 + 1) when no current leaks through R_sh
+    U_max = a * np.log(np.maximum(I_L / I_0, 0) + 1)
+    U_oc = _bisect(lambda U: I_L - I_0 * (np.exp(np.minimum(U / a, _EXP_MAX)) - 1) - U / R_sh, np.zeros_like(U_max), U_max)
+    fit["U_oc"] = U_oc[:, 0]
+    fit["I_sc"] = model_current(fit, np.zeros((len(fit), 1)))[:, 0]
+
+    # the maximum power on a grid, refined with the parabola through the best point and its neighbours
+    U = np.linspace(0, 1, points) * U_oc
+    P = U * model_current(fit, U)
+    best = np.clip(np.argmax(P, axis=1), 1, points - 2)
+    rows = np.arange(len(fit))
+    P_left, P_mid, P_right = P[rows, best - 1], P[rows, best], P[rows, best + 1]
+    curvature = P_left - 2 * P_mid + P_right
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shift = np.where(curvature < 0, 0.5 * (P_left - P_right) / curvature, 0)
+    U_mpp = U[rows, best] + np.clip(shift, -1, 1) * (U[:, 1] - U[:, 0])
+    I_mpp = model_current(fit, U_mpp[:, None])[:, 0]
+
+    fit["U_mpp"], fit["I_mpp"], fit["P_max"] = U_mpp, I_mpp, U_mpp * I_mpp
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fit["FF"] = fit["P_max"] / (fit["U_oc"] * fit["I_sc"])
+
+
+def fit_single_diode(U, I, U_err=None, I_err=None, initial=None, max_iter=200, tol=1e-6):
+    """fits the single-diode model to one or many I-V curves at once with Levenberg-Marquardt, weighted by the errors on U and I
+
+    Args:
+        U (numpy array): the voltages U_pv with shape (points,) or (sweeps, points), nan for missing points
+        I (numpy array): the currents I_pv with the same shape
+        U_err (numpy array): the errors on U, one ADC step if not given
+        I_err (numpy array): the errors on I, one ADC step if not given
+        initial (numpy array): records of FIT_DTYPE to start from, like the fit before the last points were measured.
+            The parameters of sweeps with a nan I_L are estimated from their curve
+        max_iter (integer): the maximum amount of iterations
+        tol (float): the fit of a sweep has converged when its chi2 improves less than this fraction
+
+    Returns:
+        numpy array: one record of FIT_DTYPE per sweep, with the parameters, the chi2 per degree of freedom
+            and the open voltage, short-circuit current, maximum power point and fill factor of the fitted curve
+    """
+    U, I = np.atleast_2d(np.asarray(U, dtype=float)), np.atleast_2d(np.asarray(I, dtype=float))
+    U_err = np.maximum(np.broadcast_to(0.0 if U_err is None else np.atleast_2d(U_err), U.shape), U_ERR_MIN)
+    I_err = np.maximum(np.broadcast_to(0.0 if I_err is None else np.atleast_2d(I_err), I.shape), I_ERR_MIN)
+    mask = ~(np.isnan(U) | np.isnan(I) | np.isnan(U_err) | np.isnan(I_err))
+    U, I = np.where(mask, U, 0), np.where(mask, I, 0)
+    U_err, I_err = np.where(mask, U_err, 1), np.where(mask, I_err, 1)
+
+    theta = _initial_guess(U, I, mask)
+    if initial is not None:
+        initial = np.atleast_1d(initial)
+        given = np.isfinite(initial["I_L"])
+        with np.errstate(divide="ignore"):
+            theta[given] = np.stack([initial["I_L"], np.log(initial["I_0"]), initial["a"], initial["R_s"], 1 / initial["R_sh"]], axis=1)[given]
+    theta = _constrain(theta)
+
+    r, J, weight = _residuals(theta, U, I, U_err, I_err, mask)
+    cost = (r ** 2).sum(axis=1)
+    damping = np.full(len(theta), 1e-3)
+    active = np.isfinite(cost)
+    iterations = np.zeros(len(theta), dtype=int)
+
+    data = (U, I, U_err, I_err, mask)
+    eye = np.eye(theta.shape[1])
+    for _ in range(max_iter):
+        # only the sweeps that haven't converged are worked on
+        rows = np.flatnonzero(active)
+        if rows.size == 0:
+            break
+        J_a, r_a, theta_a = J[rows], r[rows], theta[rows]
+        J_T = J_a.transpose(0, 2, 1)
+
+        # the damped normal equations, scaled by their diagonal so parameters of every size take steps alike
+        A = J_T @ J_a
+        g = (J_T @ r_a[..., None])[..., 0]
+        diagonal = np.einsum("bpp->bp", A) + 1e-300
+        A_damped = A + (damping[rows, None] * diagonal)[:, :, None] * eye
+        step = _solve(A_damped, g)
+        # a parameter on its bound that the step pushes further out is held, the others are solved again without it
+        held = (theta_a <= _LOWER) & (theta_a + step < _LOWER)
+        if held.any():
+            A_damped = np.where(held[:, :, None] | held[:, None, :], 0, A_damped) + held[:, :, None] * eye
+            step = _solve(A_damped, np.where(held, 0, g))
+
+        theta_new = _constrain(theta_a + step)
+        with np.errstate(over="ignore", invalid="ignore"):
+            r_new, _, _ = _residuals(theta_new, *(array[rows] for array in data), weight[rows])
+        cost_new = (r_new ** 2).sum(axis=1)
+
+        better = np.isfinite(cost_new) & (cost_new < cost[rows])
+        improvement = np.where(better, (cost[rows] - cost_new) / np.maximum(cost[rows], 1e-300), 0)
+        accepted = rows[better]
+        theta[accepted] = theta_new[better]
+        # the weights follow the accepted parameters
+        r[accepted], J[accepted], weight[accepted] = _residuals(theta[accepted], *(array[accepted] for array in data))
+        cost[accepted] = (r[accepted] ** 2).sum(axis=1)
+        damping[rows] = np.where(better, damping[rows] / 3, damping[rows] * 4)
+        iterations[rows] += 1
+
+        # done when the chi2 hardly improves anymore or no step makes it better
+        done = (better & (improvement < tol)) | (damping[rows] > 1e12)
+        active[rows[done]] = False
+
+    fit = np.zeros(len(theta), dtype=FIT_DTYPE)
+    fit["I_L"], fit["I_0"], fit["a"], fit["R_s"] = theta[:, 0], np.exp(theta[:, 1]), theta[:, 2], theta[:, 3]
+    with np.errstate(divide="ignore"):
+        fit["R_sh"] = 1 / theta[:, 4]
+    fit["chi2"] = cost / np.maximum(mask.sum(axis=1) - theta.shape[1], 1)
+    fit["iterations"] = iterations
+    fit["converged"] = ~active & np.isfinite(cost)
+    _derive(fit)
+    return fit
+
+
+def fit_results(results, initial=None):
+    """fits the single-diode model to the derived values of sweeps
+
+    Args:
+        results (numpy array or list): a record array as returned by derive_quantities, or a list of them for several sweeps
+        initial (numpy array): records of FIT_DTYPE to start from
+
+    Returns:
+        numpy array: one record of FIT_DTYPE per sweep
+    """
+    sweeps = [results] if isinstance(results, np.ndarray) else list(results)
+    # sweeps of different lengths are padded with nan
+    length = max((len(sweep) for sweep in sweeps), default=0)
+    columns = {}
+    for name in ("U_pv", "I_pv", "U_err", "I_err"):
+        columns[name] = np.full((len(sweeps), length), np.nan)
+        for row, sweep in enumerate(sweeps):
+            columns[name][row, :len(sweep)] = sweep[name]
+    return fit_single_diode(columns["U_pv"], columns["I_pv"], columns["U_err"], columns["I_err"], initial=initial)
@@ -0,0 +1,68 @@
+# the binary replies of firmware with the BIN feature. A frame is a header of three little-endian uint16: the sync word,
+# a sequence number and the amount of ADC codes, then the codes as uint16 and a Fletcher-16 checksum of everything
+# after the sync word
+import numpy as np
+
+FRAME_SYNC = 0xA55A
+HEADER_SIZE = 6
+
+
+def fletcher16(data):
+    """calculates the Fletcher-16 checksum of some bytes without a loop in python, the same sums that the firmware
+    keeps byte by byte
+
+    Args:
+        data (bytes): the bytes to check
+
+    Returns:
+        integer: the checksum, the second sum in the high byte
+    """
+    values = np.frombuffer(data, dtype=np.uint8).astype(np.uint64)
+    # the second sum adds the first sum after every byte, so every byte counts once for every byte from there on
+    weights = np.arange(len(values), 0, -1, dtype=np.uint64)
+    return int((values @ weights) % 255) << 8 | int(values.sum() % 255)
+
+
+def encode_frame(sequence, codes):
+    """packs ADC codes in a frame like the firmware sends them
+
+    Args:
+        sequence (integer): the number of the frame, counts up by one per frame and wraps at 65536
+        codes (list): the ADC codes
+
+    Returns:
+        bytes: the frame
+    """
+    body = np.array([sequence & 0xFFFF, len(codes)], dtype="<u2").tobytes() + np.asarray(codes, dtype="<u2").tobytes()
+    return np.array([FRAME_SYNC], dtype="<u2").tobytes() + body + np.array([fletcher16(body)], dtype="<u2").tobytes()
+
+
+def read_header(header):
+    """reads the header of a frame
+
+    Args:
+        header (bytes): the first HEADER_SIZE bytes of the frame
+
+    Returns:
+        tuple: the sequence number and the amount of codes that follow
+    """
+    sync, sequence, count = np.frombuffer(header, dtype="<u2")
+    if sync != FRAME_SYNC:
+        raise ValueError(f"binary reply starts with {sync:#06x} instead of the sync word")
+    return int(sequence), int(count)
+
+
+def read_codes(header, body):
+    """checks the rest of a frame and gives its codes
+
+    Args:
+        header (bytes): the header of the frame
+        body (bytes): the codes and the checksum that follow the header
+
+    Returns:
+        numpy array: the ADC codes as uint16, a view on [body]
+    """
+    data = np.frombuffer(body, dtype="<u2")
+    if data[-1] != fletcher16(header[2:] + body[:-2]):
+        raise ValueError("checksum of binary reply doesn't match")
+    return data[:-1]
@@ -0,0 +1,160 @@
+# level-of-detail for plotting saved measurements that are too large to draw or to load at once
+import os
+import numpy as np
+from pythondaq.analysis import derive_quantities
+from pythondaq.capture import MAGIC as CAPTURE_MAGIC, Capture
+from pythondaq.monitor import MAGIC as MONITOR_MAGIC, SUMMARY_DTYPE
+
+
+class MinMaxLOD:
+    """Keeps the minimum and maximum of every [bucket] points of a series, and of every [factor] buckets above that,
+    so any range of the series can be drawn with a bounded amount of points that still shows every peak.
+    The series itself is read in chunks and never held in memory, only ranges of it are read again when zoomed in.
+    """
+    def __init__(self, series, length, bucket=32, factor=4, chunk_size=1 << 20, reread=4):
+        """Reads the series once and builds the levels
+
+        Args:
+            series (callable): gives the x and y values of the points [begin:end] for series(begin, end), x must not decrease
+            length (integer): the amount of points
+            bucket (integer): the amount of points per bucket of the first level
+            factor (integer): the amount of buckets that are combined into one in the next level
+            chunk_size (integer): the amount of points that is read at once, rounded down to whole buckets
+            reread (integer): a view of up to [reread] times the amount of points that is drawn is read from the series again
+                instead of taken from the levels, more detail for a view that costs more to read
+        """
+        self.series = series
+        self.length = length
+        self.bucket = bucket
+        self.factor = factor
+        self.reread = reread
+
+        chunk_size = max(chunk_size // bucket, 1) * bucket
+        parts = []
+        for begin in range(0, length, chunk_size):
+            x, y = series(begin, min(begin + chunk_size, length))
+            parts.append(self._reduce(np.asarray(x, dtype=float), np.asarray(y, dtype=float), size=bucket))
+        x0, low, high = (np.concatenate(values) for values in zip(*parts)) if parts else (np.empty(0),) * 3
+
+        # every level has the first x, the minimum and the maximum of its buckets
+        self.levels = [(x0, low, high)]
+        while len(self.levels[-1][0]) > factor:
+            self.levels.append(self._reduce(*self.levels[-1], size=factor))
+
+    @staticmethod
+    def _reduce(x, low, high=None, size=1):
+        """combines every [size] values, nan is only kept when a whole bucket is nan"""
+        starts = np.arange(0, len(x), size)
+        if high is None:
+            high = low
+        return x[starts], np.fmin.reduceat(low, starts), np.fmax.reduceat(high, starts)
+
+    def view(self, x_min, x_max, max_points=4000):
+        """gives the points to draw for the range [x_min, x_max], one point before and after the range are added so
+        the line continues out of view
+
+        Args:
+            x_min (float): the left side of the view
+            x_max (float): the right side of the view
+            max_points (integer): the largest amount of points that is returned
+
+        Returns:
+            tuple: the x and y values, all points if they fit, else the minimum and maximum of every bucket
+        """
+        x0 = self.levels[0][0]
+        if self.length == 0:
+            return np.empty(0), np.empty(0)
+        # the buckets of the first level that overlap the view
+        first = max(np.searchsorted(x0, x_min, side="right") - 2, 0)
+        last = min(np.searchsorted(x0, x_max, side="right") + 1, len(x0))
+        begin, end = first * self.bucket, min(last * self.bucket, self.length)
+
+        if end - begin <= max_points:
+            x, y = self.series(begin, end)
+            return np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+
+        # a short range is read again and reduced to buckets that fit, a longer one is taken from the levels
+        pairs = max_points // 2
+        if end - begin <= self.reread * max_points:
+            x, y = self.series(begin, end)
+            size = -(-(end - begin) // pairs)
+            return self._interleave(*self._reduce(np.asarray(x, dtype=float), np.asarray(y, dtype=float), size=size))
+
+        # the coarsest level that is still detailed enough
+        level = 0
+        while level + 1 < len(self.levels) and (last - first) // self.factor ** level > pairs:
+            level += 1
+        scale = self.factor ** level
+        x, low, high = (values[first // scale:-(-last // scale)] for values in self.levels[level])
+        return self._interleave(x, low, high)
+
+    @staticmethod
+    def _interleave(x, low, high):
+        """draws every bucket as a vertical line from its minimum to its maximum"""
+        return np.repeat(x, 2), np.column_stack([low, high]).ravel()
+
+    @property
+    def x_range(self):
+        """the first and last x of the series
+        """
+        if self.length == 0:
+            return 0.0, 1.0
+        x, _ = self.series(self.length - 1, self.length)
+        return float(self.levels[0][0][0]), float(np.asarray(x)[-1])
+
+
+class SavedMeasurement:
+    """Opens a capture (.pvcap) or the time series of a monitor (.pvts) for the viewer, both through a memory map.
+    The steps of a capture are numbered in the order they were measured, the sweeps of a time series by their time
+    """
+    def __init__(self, path):
+        """Opens the file by what it starts with
+
+        Args:
+            path (string): the name of the file
+        """
+        self.path = path
+        with open(path, "rb") as file:
+            start = file.read(max(len(CAPTURE_MAGIC), len(MONITOR_MAGIC)))
+        if start.startswith(CAPTURE_MAGIC):
+            self.capture = Capture(path)
+            self.records = self.capture.records
+            self.x_label = "Stap"
+            self.fields = ["U_pv", "I_pv", "P", "R", "U_0"]
+        elif start.startswith(MONITOR_MAGIC):
+            # opened read-only, a monitor may still be appending to it
+            n = (os.path.getsize(path) - len(MONITOR_MAGIC)) // SUMMARY_DTYPE.itemsize
+            self.capture = None
+            self.records = np.memmap(path, dtype=SUMMARY_DTYPE, mode="r", offset=len(MONITOR_MAGIC), shape=(n,)) if n else np.empty(0, dtype=SUMMARY_DTYPE)
+            self.x_label = "Tijd"
+            self.fields = ["FF", "P_max", "U_oc", "I_sc"]
+        else:
+            raise ValueError(f"{path} is not a capture or time series file")
+        self._lods = {}
+
+    def __len__(self):
+        return len(self.records)
+
+    def series(self, field):
+        """gives a function that reads the points [begin:end] of a field
+
+        Args:
+            field (string): one of [fields]
+        """
+        if self.capture is None:
+            return lambda begin, end: (self.records["time"][begin:end], self.records[field][begin:end])
+
+        def derived(begin, end):
+            chunk = self.records[begin:end]
+            return np.arange(begin, end), derive_quantities(np.asarray(chunk["samples"]), np.asarray(chunk["adc"]))[field]
+        return derived
+
+    def lod(self, field):
+        """gives the level-of-detail of a field, it is built the first time it is asked for
+
+        Args:
+            field (string): one of [fields]
+        """
+        if field not in self._lods:
+            self._lods[field] = MinMaxLOD(self.series(field), len(self))
+        return self._lods[field]
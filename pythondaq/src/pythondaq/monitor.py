@@ -0,0 +1,170 @@
+import collections
+import os
+import threading
+import time
+import numpy as np
+from pythondaq.analysis import sort_by_adc, sweep_summary
+
+# a time series file starts with MAGIC, followed by one fixed-size record per sweep
+MAGIC = b"PVTS\x01\x00\x00\x00"
+SUMMARY_DTYPE = np.dtype([("time", "<f8"), ("FF", "<f8"), ("P_max", "<f8"), ("U_oc", "<f8"), ("I_sc", "<f8")])
+
+
+class TimeSeriesStore:
+    """An append-only file with the summary of every sweep, 40 bytes per sweep so it can run for months.
+    Every record is flushed right away and a record that was only partly written is ignored.
+    """
+    def __init__(self, path):
+        """Opens the file, it is created if it doesn't exist yet
+
+        Args:
+            path (string): the name of the time series file
+        """
+        self.path = path
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, "wb") as file:
+                file.write(MAGIC)
+        with open(path, "rb") as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a time series file")
+
+        # appends after the last complete record
+        self._file = open(path, "r+b")
+        self._file.truncate(len(MAGIC) + len(self) * SUMMARY_DTYPE.itemsize)
+        self._file.seek(0, os.SEEK_END)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return (os.path.getsize(self.path) - len(MAGIC)) // SUMMARY_DTYPE.itemsize
+
+    def append(self, summary):
+        """writes the summary of one sweep
+
+        Args:
+            summary (dict): the time and the values of sweep_summary
+        """
+        record = np.empty(1, dtype=SUMMARY_DTYPE)
+        for name in SUMMARY_DTYPE.names:
+            record[name] = summary[name]
+        with self._lock:
+            self._file.write(record.tobytes())
+            self._file.flush()
+
+    def read(self):
+        """gives all summaries as a record array, memory-mapped so a long history is not loaded at once
+
+        Returns:
+            numpy array: the records with the fields of SUMMARY_DTYPE
+        """
+        n = len(self)
+        if n == 0:
+            return np.empty(0, dtype=SUMMARY_DTYPE)
+        return np.memmap(self.path, dtype=SUMMARY_DTYPE, mode="r", offset=len(MAGIC), shape=(n,))
+
+    def close(self):
+        self._file.close()
+
+
+class Monitor:
+    """Repeats a sweep every [interval] seconds to follow a panel over time. The summary of every sweep is appended
+    to a TimeSeriesStore, only the raw curves of the last [window] sweeps are kept in memory.
+    """
+    def __init__(self, experiment, start, stop, rep_num, store_path, interval=60, window=10, adaptive=False, settle=None):
+        """Sets up the monitor
+
+        Args:
+            experiment (DiodeExperiment): the experiment that takes the sweeps
+            start (integer): Starts every sweep at this value in ADC
+            stop (integer): Stops every sweep at this value in ADC
+            rep_num (integer): the amount of times that every measurment is repeated
+            store_path (string): the time series file that the summaries are appended to
+            interval (float): the time in seconds between the start of two sweeps
+            window (integer): the amount of sweeps whose curves are kept
+            adaptive (True/False): uses DiodeExperiment.adaptive_scan instead of the full sweep
+            settle (float or string): the time in seconds between setting the output and measuring it, or "adaptive"
+        """
+        self.experiment = experiment
+        self.start_adc, self.stop_adc, self.rep_num = start, stop, rep_num
+        self.interval = interval
+        self.adaptive = adaptive
+        self.settle = settle
+        self.store = TimeSeriesStore(store_path)
+        # the time and sorted results of the last sweeps
+        self.curves = collections.deque(maxlen=window)
+        self.sweeps = 0
+
+        self.stop_event = threading.Event()
+        self._thread = None
+
+    def sweep(self):
+        """takes one sweep and stores its summary, a sweep that is cut short by stop is not stored
+
+        Returns:
+            dict: the time the sweep started and the values of sweep_summary, None if the monitor was stopped
+        """
+        started = time.time()
+        if self.adaptive:
+            self.experiment.adaptive_scan(self.start_adc, self.stop_adc, self.rep_num, settle=self.settle)
+        else:
+            self.experiment.scan(self.start_adc, self.stop_adc, self.rep_num, settle=self.settle)
+        if self.stop_event.is_set():
+            return None
+
+        results = sort_by_adc(self.experiment.results)
+        summary = dict(sweep_summary(results), time=started)
+        self.store.append(summary)
+        self.curves.append((started, results))
+        self.sweeps += 1
+        return summary
+
+    def run(self, count=None, callback=None):
+        """takes sweeps on schedule until the monitor is stopped or [count] sweeps are taken
+
+        Args:
+            count (integer): the amount of sweeps, no limit if not given
+            callback (callable): called with the summary of every sweep
+        """
+        next_sweep = time.monotonic()
+        try:
+            while not self.stop_event.is_set():
+                summary = self.sweep()
+                if callback and summary:
+                    callback(summary)
+                if count is not None and self.sweeps >= count:
+                    break
+                # a sweep that took longer than the interval is followed right away
+                next_sweep = max(next_sweep + self.interval, time.monotonic())
+                self.stop_event.wait(next_sweep - time.monotonic())
+        finally:
+            self.stop_event.clear()
+            # a stop between two sweeps must not end the next scan of the experiment
+            self.experiment.stop_event.clear()
+
+    def history(self):
+        """gives the summaries of all sweeps in the store
+
+        Returns:
+            numpy array: the records with the fields of SUMMARY_DTYPE
+        """
+        return self.store.read()
+
+    def start_monitor(self, count=None):
+        """Starts the monitor as a thread
+        """
+        self._thread = threading.Thread(target=self.run, args=(count,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the monitor, the sweep that is being measured ends after its current step
+        """
+        self.stop_event.set()
+        self.experiment.stop()
+
+    @property
+    def is_running(self):
+        """True while the monitor thread is running
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def close(self):
+        self.store.close()
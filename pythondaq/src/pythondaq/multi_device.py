@@ -0,0 +1,150 @@
+import asyncio
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from pythondaq.arduino_device import list_devices, pool
+from pythondaq.pv_experiment import DiodeExperiment
+
+
+class MultiDeviceExperiment:
+    """Carries the experiment out on several Arduinos at the same time, one thread per Arduino.
+    The VISA calls wait on the serial ports without holding the GIL, so the sweeps really run in parallel.
+    """
+    def __init__(self, ports, skip_failures=False):
+        """Sets up an experiment for every port
+
+        Args:
+            ports (list): names of the USB-ports that the Arduinos are connected to
+            skip_failures (True/False): leaves out the ports that can't be opened instead of raising the error,
+                they are kept with their error in skipped
+        """
+        self.experiments = {}
+        self.skipped = {}
+        for port in ports:
+            try:
+                self.experiments[port] = DiodeExperiment(port)
+            except Exception as error:
+                if not skip_failures:
+                    # the Arduinos that were already opened are handed back before the error is raised
+                    for experiment in self.experiments.values():
+                        pool.release(experiment.device)
+                        experiment._released = True
+                    raise
+                self.skipped[port] = error
+        self.FF = {}
+
+    @classmethod
+    def from_discovered(cls):
+        """Sets up an experiment for every discovered port that can be opened
+
+        Returns:
+            MultiDeviceExperiment: the experiment on all working ports
+        """
+        return cls(list_devices(), skip_failures=True)
+
+    def scan(self, start, stop, rep_num, adaptive=False, settle=None, cache=None, step=1):
+        """Takes the measurment on all Arduinos at once
+
+        Args:
+            start (integer): Starts the measurment at this value in ADC
+            stop (integer): Stops the measurment at this value in ADC
+            rep_num (integer): the amount of times that the measurment is repeated to ensure a better significance
+            adaptive (True/False): uses DiodeExperiment.adaptive_scan instead of the full sweep
+            settle (float or string): the time in seconds between setting the output and measuring it, or "adaptive" to learn it per Arduino
+            cache (SweepCache): resumes or extends the earlier sweep of every Arduino from this cache, only for the full sweep
+            step (integer): measures every [step]th ADC value from start, only for the full sweep
+
+        Returns:
+            pandas DataFrame: the dataframes of all Arduinos below each other, with the port and identification of the Arduino in extra columns
+        """
+        with ThreadPoolExecutor(max_workers=max(len(self.experiments), 1)) as pool:
+            futures = self._submit(pool, start, stop, rep_num, adaptive, settle, cache, step)
+            # waits for every sweep, an error on one Arduino is raised here
+            for future in futures.values():
+                future.result()
+
+        return self._merge()
+
+    def stream(self, start, stop, rep_num, adaptive=False, settle=None, cache=None, step=1, interval=0.05):
+        """Takes the measurment on all Arduinos at once like scan, and gives the steps of every Arduino while they are measured.
+        Closing the generator before the end stops the measurement
+
+        Args:
+            start, stop, rep_num, adaptive, settle, cache, step: like scan
+            interval (float): the time in seconds between two looks at the finished steps
+
+        Yields:
+            tuple: the port, the ADC codes and the derived values of the steps that finished since the last time
+        """
+        sequences = dict.fromkeys(self.experiments, 0)
+
+        def finished_steps():
+            for port, experiment in self.experiments.items():
+                n, rows = experiment.rows_since(sequences[port])
+                if len(rows):
+                    yield port, experiment.adc_codes[sequences[port]:n], rows
+                    sequences[port] = n
+
+        with ThreadPoolExecutor(max_workers=max(len(self.experiments), 1)) as pool:
+            futures = self._submit(pool, start, stop, rep_num, adaptive, settle, cache, step)
+            try:
+                while wait(futures.values(), timeout=interval, return_when=FIRST_EXCEPTION).not_done:
+                    yield from finished_steps()
+                    for future in futures.values():
+                        if future.done():
+                            future.result()
+                # the last steps are measured just before the sweeps end
+                yield from finished_steps()
+                for future in futures.values():
+                    future.result()
+            finally:
+                if not all(future.done() for future in futures.values()):
+                    self.stop()
+
+        self._merge()
+
+    def _submit(self, pool, start, stop, rep_num, adaptive, settle, cache, step):
+        """starts the sweep of every Arduino in the pool
+
+        Returns:
+            dict: the future of the sweep per port
+        """
+        if adaptive and cache is not None:
+            raise ValueError("an adaptive sweep can't be resumed from the cache")
+
+        return {
+            port: pool.submit(experiment.adaptive_scan, start, stop, rep_num, settle=settle) if adaptive
+            else pool.submit(experiment.scan, start, stop, rep_num, settle=settle, cache=cache, step=step)
+            for port, experiment in self.experiments.items()
+        }
+
+    def _merge(self):
+        """puts the dataframes of all Arduinos below each other and keeps their fill factors
+        """
+        import pandas as pd
+
+        frames = []
+        for port, experiment in self.experiments.items():
+            self.FF[port] = experiment.FF
+            frames.append(experiment.df.assign(port=port, IDN=experiment.idn))
+        self.df = pd.concat(frames) if frames else pd.DataFrame()
+        return self.df
+
+    async def scan_async(self, start, stop, rep_num, settle=None):
+        """Takes the measurment on all Arduinos at once as a coroutine, every Arduino gets its own I/O thread
+
+        Args:
+            start (integer): Starts the measurment at this value in ADC
+            stop (integer): Stops the measurment at this value in ADC
+            rep_num (integer): the amount of times that the measurment is repeated to ensure a better significance
+            settle (float or string): the time in seconds between setting the output and measuring it, or "adaptive"
+
+        Returns:
+            pandas DataFrame: the dataframes of all Arduinos below each other, with the port and identification of the Arduino in extra columns
+        """
+        await asyncio.gather(*(experiment.scan_async(start, stop, rep_num, settle=settle) for experiment in self.experiments.values()))
+        return self._merge()
+
+    def stop(self):
+        """Ends the measurement on all Arduinos
+        """
+        for experiment in self.experiments.values():
+            experiment.stop()
@@ -1,8 +1,21 @@
-import matplotlib.pyplot as plt
-import pandas as pd
-from pythondaq.arduino_device import ArduinoVISADevice, list_devices
+from pythondaq.arduino_device import list_devices, pool
+from pythondaq.async_device import AsyncArduinoDevice
+import asyncio
 import threading
 import numpy as np
+from pythondaq.analysis import RESULT_DTYPE, derive_quantities, fill_factor, results_dataframe, sort_by_adc
+from pythondaq.calibration import DIVIDER, R_SENSE
+from pythondaq.capture import CaptureWriter
+from pythondaq.settle import make_settle
+from pythondaq.telemetry import telemetry
+
+# channel 1 measures a third of the voltage over the photocell, channel 2 the voltage over the 4.7 Ohm resistor
+CHANNELS = [1, 2]
+
+def _result_field(name):
+    """makes a read-only attribute that returns one field of DiodeExperiment.results
+    """
+    return property(lambda self: self.results[name])
 
 # deze class voert het experiment uit en geeft een plot en het .csv bestand van de meting.
 class DiodeExperiment:
@@ -16,8 +29,11 @@ class DiodeExperiment:
         """
         # start the Arduino and shows the names of the USB-ports
         print(list_devices())
-        self.device = ArduinoVISADevice(port=port)
-        print(self.device.get_identification())
+        self.port = port
+        self.device = pool.acquire(port)
+        self._released = False
+        self.idn = self.device.get_identification()
+        print(self.idn)
         
         # sets up the lists for the measurments
         self.U_pv = []
@@ -26,118 +42,388 @@ class DiodeExperiment:
         self.U_err = []
         self.I_err = []
 
-    def scan(self, start, stop, rep_num):
+        # no samples until a scan is started
+        self.n_steps = 0
+        self.adc_codes = np.arange(0)
+        self.samples = np.empty((0, 0, len(CHANNELS)))
+        self._results = np.empty(0, dtype=RESULT_DTYPE)
+        self._derived_steps = 0
+
+        # guards the handoff of finished steps from the scan thread to the GUI
+        self._lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self._scan_thread = None
+
+        # prints the dataframe after every scan
+        self.verbose = True
+
+    def scan(self, start, stop, rep_num, capture_path=None, settle=None, cache=None, step=1):
         """Takes a measurment with starting at the value given with start and ending with the value given by stop
 
         Args:
             start (integer): Starts the measurment at this value in ADC
             stop (integer): Stops the measurment at this value in ADC
             rep_num (integer): the amount of times that the measurment is repeated to ensure a better significance 
+            capture_path (string): if filled every finished step is written to this capture file while measuring
+            settle (float or string): the time in seconds between setting the output and measuring it, or "adaptive" to learn it
+                from the drift between the first repetition and the others
+            cache (SweepCache): if given the steps that an earlier sweep of this Arduino with the same rep_num already measured are reused,
+                only the missing steps are measured and the sweep is written to the cache instead of [capture_path]
+            step (integer): measures every [step]th ADC value from start
         """
-        self.list_U_pv = []
-        self.list_U_0 = []
-        self.list_I_pv = []
-        self.list_R = []
-        self.list_P = []
-        self.list_U_err = []
-        self.list_I_err = []
-        self.list_R_err = []
-        self.list_P_err = []
-        self.end_meas = None
-
-        # makes the measurments between the start and stop values
-        for ADC_IN in range(start, stop):
-            if self.end_meas == None:
-                # sets the output value as ADC_IN
-                self.device.set_output_value(ADC_IN)
-                
-                # makes two clean voltage-in and -out lists
-                U_1 = []
-                U_2 = []
-                R_n = []
-                P_n = []
-                # takes [rep_num] number of measurments for the input and output values
-                for n in range(rep_num):
-                    U_n_1 = float(self.device.get_output_voltage(channel = 1))
-                    U_1.append(U_n_1)
-                    U_n_2 = float(self.device.get_output_voltage(channel = 2))
-                    U_2.append(U_n_2)
-                    P_n.append(U_n_1*U_n_2)
-
-                    try:
-                        R_n.append((U_n_1 * 14.1)/U_n_2)
-                    except:
-                        R_n.append(5000)
-                
-
-                # gives average of repeated measurement of each inputvalues 
-                U_1_avg = np.mean(U_1)
-                U_2_avg = np.mean(U_2)
-
-                # gives a expected value for the given ADC_IN for the voltage input and output based of the measurments just taken
-                # U_F_IN = 0
-                # U_F_OUT = 0
-                # for x in range(rep_num):
-                #     U_F_OUT += U_OUT[x]/rep_num
-                #     U_F_IN += U_IN[x]/rep_num 
-                
-                # voltage on channel 1 (U_1) is a third of voltage over photocell
-                U_pv = 3 * U_1_avg
-                U_1_std =np.std(U_1)
-                U_err = 3 * U_1_std
-
-                # current over resistor of 4.7 Ohm with voltage of channel 2 (U_2)
-                I_pv = U_2_avg / 4.7
-                U_2_std = np.std(U_2)
-                I_err  = U_2_std / 4.7
-
-                # resistance over photocell effectively same as resistance of transistor
-                R = np.mean(R_n)
-                R_err = np.std(P_n)
-
-                P = np.mean(P_n)
-                P_err = np.std(P_n)
-                # gives the expected error values for the given ADC_IN for the voltage input and output based of the measurments just taken
-                # err_U_sqr = 0
-                # err_I_sqr = 0
-                # for i in range(rep_num):
-                #     err_U_sqr += ((U_IN[i] - U_OUT[i]) - (U_F_IN - U_F_OUT))**2/rep_num
-                #     err_I_sqr += ((U_IN[i] - U_F_IN)/220)**2/rep_num
-
-                U_0 = ADC_IN *3.3 / 1023
-
-                # The voltage, current and their errors are calculated and put into lists
-                self.list_U_pv.append(U_pv)
-                self.list_U_0.append(U_0)
-                self.list_I_pv.append(I_pv)
-                self.list_R.append(R)
-                self.list_P.append(P)
-                self.list_U_err.append(U_err)
-                self.list_I_err.append(I_err)
-                self.list_R_err.append(R_err)
-                self.list_P_err.append(P_err)
-        
-        # calculates fill factor from
-        P_max = max(self.list_P)
-        I_oc = self.list_I_pv[-1]
-        U_oc = self.list_U_pv[0]
-        P_tmax = I_oc * U_oc
-        self.FF = P_max / P_tmax
+        self._prepare(start, stop, rep_num, capture_path, settle, cache)
+        return self._scan_prepared(start, stop, rep_num, cache, step)
+
+    def _scan_prepared(self, start, stop, rep_num, cache=None, step=1):
+        """measures the sweep that _prepare set up, see scan
+        """
+        # makes the measurments between the start and stop values that are not known yet, the next output is set while the readings of a step arrive
+        codes = np.setdiff1d(np.arange(start, stop, step), self.adc_codes[:self.n_steps]).tolist()
+        # the Arduino is handed back and the stop is cleared also when the measurment fails
+        try:
+            steps = self.device.sweep(self._until_stopped(codes), CHANNELS, rep_num, self.settle)
+            try:
+                while True:
+                    with telemetry.timer("scan.read"):
+                        measured = next(steps, None)
+                    if measured is None:
+                        break
+                    self._publish_step(*measured)
+            except InterruptedError:
+                # stopped while a step was measured, that step is dropped
+                pass
+            finally:
+                steps.close()
+            if cache is not None and not self.stop_event.is_set():
+                # a finished sweep isn't resumed, running it again measures it again
+                cache.mark_complete(self.capture_path)
+        finally:
+            results = self._finish()
+        return results
+
+    def _until_stopped(self, codes):
+        """gives the ADC steps until the scan is stopped
+        """
+        for ADC_IN in codes:
+            if self.stop_event.is_set():
+                return
+            yield ADC_IN
+
+    def adaptive_scan(self, start, stop, rep_num, coarse_step=16, max_rep_num=None, target_err=0.05, refine_tol=0.02, capture_path=None, settle=None):
+        """Takes a measurment between start and stop that spends its points where the curve changes. A coarse pass is taken first,
+        then the ADC steps in between are bisected where the power or the shape of the I-V curve changes a lot and around the maximum power point.
+        Steps where the measurment is noisy are repeated more often.
+
+        Args:
+            start (integer): Starts the measurment at this value in ADC
+            stop (integer): Stops the measurment at this value in ADC
+            rep_num (integer): the amount of times that every measurment is repeated at least
+            coarse_step (integer): the distance in ADC between the steps of the coarse pass
+            max_rep_num (integer): the maximum amount of repetitions of a noisy step, 4 times rep_num if not given
+            target_err (float): a step is repeated until the error on its mean voltage and current is below this fraction of the largest value in the sweep
+            refine_tol (float): the steps between two measured steps are refined while the power or the I-V curve changes more than this fraction
+                of its range and more than the noise in between
+            capture_path (string): if filled every finished step is written to this capture file while measuring
+            settle (float or string): the time in seconds between setting the output and measuring it, or "adaptive"
+        """
+        max_rep_num = max_rep_num or 4 * rep_num
+        self._prepare(start, stop, max_rep_num, capture_path, settle)
+
+        codes = list(range(start, stop, coarse_step))
+        if codes and codes[-1] != stop - 1:
+            codes.append(stop - 1)
+
+        # the Arduino is handed back and the stop is cleared also when the measurment fails
+        try:
+            # the coarse pass sets the scale that the errors are compared to
+            for ADC_IN in codes:
+                if self.stop_event.is_set():
+                    break
+                self._measure_step(ADC_IN, rep_num)
+            coarse = self.results
+            # a sweep that was stopped before its first step has nothing to refine
+            if len(coarse) > 1:
+                U_target = target_err * np.abs(coarse["U_pv"]).max()
+                I_target = target_err * np.abs(coarse["I_pv"]).max()
+                codes = self._codes_to_refine(refine_tol)
+            else:
+                codes = []
+            while codes and not self.stop_event.is_set():
+                for ADC_IN in codes:
+                    if self.stop_event.is_set():
+                        break
+                    self._measure_step(ADC_IN, rep_num, max_rep_num, U_target, I_target)
+                codes = self._codes_to_refine(refine_tol)
+        except InterruptedError:
+            # stopped while a step was measured, that step is dropped
+            pass
+        finally:
+            results = self._finish()
+        return results
+
+    def _codes_to_refine(self, refine_tol):
+        """picks the ADC steps halfway the measured steps where the curve still changes too much
+
+        Args:
+            refine_tol (float): the allowed change in power and in the I-V curve between two measured steps, as fraction of their range
+
+        Returns:
+            list: the new ADC steps to measure
+        """
+        n, results = self.rows_since(0)
+        order = np.argsort(self.adc_codes[:n], kind="stable")
+        adc = self.adc_codes[:n][order]
+        results = results[order]
+        gaps = np.diff(adc) > 1
+
+        # the error on the mean of every step, changes smaller than three times the combined error are noise
+        reps = np.count_nonzero(~np.isnan(self.samples[:n, :, 0]), axis=1)[order]
+        def change(field, error):
+            difference = np.abs(np.diff(results[field]))
+            sem = results[error] / np.sqrt(reps)
+            noise = 3 * np.hypot(sem[:-1], sem[1:])
+            return np.where(difference > noise, difference, 0) / (np.ptp(results[field]) or 1)
+
+        # the change in power and the distance along the I-V curve between neighbouring steps
+        dP = change("P", "P_err")
+        dIV = np.hypot(change("U_pv", "U_err"), change("I_pv", "I_err"))
+        refine = gaps & ((dP > refine_tol) | (dIV > refine_tol))
+
+        # the maximum power point is narrowed down to a single ADC step
+        P_max = np.argmax(results["P"])
+        refine[max(P_max - 1, 0):P_max + 1] |= gaps[max(P_max - 1, 0):P_max + 1]
+
+        return ((adc[:-1][refine] + adc[1:][refine]) // 2).tolist()
+
+    def _prepare(self, start, stop, rep_num, capture_path, settle=None, cache=None):
+        """preallocates room for every raw sample of the sweep, the derived values are calculated from it when asked for.
+        Repetitions that are not measured stay nan
+
+        Args:
+            start (integer): the first ADC step
+            stop (integer): the ADC step after the last one
+            rep_num (integer): the maximum amount of repetitions of a step
+            capture_path (string): if filled every finished step is written to this capture file while measuring
+            settle (float or string): the settle time in seconds or "adaptive"
+            cache (SweepCache): if given the capture is kept in the cache and the steps of its earlier sweep are loaded
+        """
+        # takes a connection from the pool again if the previous scan handed it back
+        if self._released:
+            self.device = pool.acquire(self.port)
+            self._released = False
+        # a stop ends the step that is being measured between two queries
+        self.device.cancel_event = self.stop_event
+
+        with self._lock:
+            self.n_steps = 0
+            self.adc_codes = np.zeros(stop - start, dtype=int)
+            self.samples = np.full((stop - start, rep_num, len(CHANNELS)), np.nan)
+            self._results = np.empty(stop - start, dtype=RESULT_DTYPE)
+            self._derived_steps = 0
+
+        self.capture_path = capture_path
+        self._capture = None
+        metadata = {"port": self.device.port, "start": start, "stop": stop}
+        try:
+            self.settle = make_settle(settle)
+            if cache is not None:
+                self._capture, previous = cache.open(self.idn, rep_num, start, stop, len(CHANNELS), metadata=metadata)
+                self.capture_path = self._capture.path
+                if previous is not None:
+                    self._load_steps(previous, start, stop)
+            elif capture_path:
+                self._capture = CaptureWriter(capture_path, rep_num, len(CHANNELS), metadata=metadata)
+        except BaseException:
+            # nothing is measured, the Arduino is handed back
+            self.device.cancel_event = None
+            pool.release(self.device)
+            self._released = True
+            raise
+
+    def _load_steps(self, capture, start, stop):
+        """publishes the steps between start and stop that an earlier sweep already measured
+
+        Args:
+            capture (Capture): the capture of the earlier sweep
+            start (integer): the first ADC step
+            stop (integer): the ADC step after the last one
+        """
+        codes, first = np.unique(capture.adc_codes, return_index=True)
+        keep = first[(codes >= start) & (codes < stop)]
+        n = len(keep)
+        with self._lock:
+            self.adc_codes[:n] = capture.adc_codes[keep]
+            self.samples[:n] = capture.samples[keep]
+            self.n_steps = n
+        telemetry.count("scan.cached_steps", n)
+
+    def _measure_step(self, ADC_IN, rep_num, max_rep_num=None, U_target=None, I_target=None):
+        """measures one ADC step and publishes it. If targets are given the step is repeated [rep_num] times more
+        until the errors on the mean voltage and current are below them or [max_rep_num] repetitions are taken
+
+        Args:
+            ADC_IN (integer): the output value in ADC
+            rep_num (integer): the amount of repetitions that are measured at once
+            max_rep_num (integer): the maximum amount of repetitions
+            U_target (float): the allowed error on the mean of U_pv
+            I_target (float): the allowed error on the mean of I_pv
+        """
+        # sets the output value as ADC_IN
+        with telemetry.timer("scan.set_output"):
+            self.device.set_output_value(int(ADC_IN))
+        self.device.wait_to_settle(self.settle)
+
+        with telemetry.timer("scan.read"):
+            readings = self.device.read_channels(CHANNELS, repeats=rep_num)
+        self.settle.observe(readings)
+        while max_rep_num and len(readings) + rep_num <= max_rep_num:
+            # voltage on channel 1 is a third of U_pv, channel 2 over 4.7 Ohm gives I_pv
+            U_mean_err, I_mean_err = readings.std(axis=0) * [DIVIDER, 1 / R_SENSE] / np.sqrt(len(readings))
+            if U_mean_err <= U_target and I_mean_err <= I_target:
+                break
+            with telemetry.timer("scan.read"):
+                readings = np.concatenate([readings, self.device.read_channels(CHANNELS, repeats=rep_num)])
+
+        self._publish_step(ADC_IN, readings)
+
+    def _publish_step(self, ADC_IN, readings):
+        """stores the readings of a finished step, makes it visible to rows_since and writes it to the capture
+
+        Args:
+            ADC_IN (integer): the output value in ADC
+            readings (numpy array): the voltages with shape (repetitions, channels)
+        """
+        step = self.n_steps
+        self.samples[step, :len(readings)] = readings
+        self.adc_codes[step] = ADC_IN
+        # the step is only published once all its samples are written
+        with self._lock:
+            self.n_steps = step + 1
+
+        telemetry.count("scan.steps")
+        if self._capture:
+            with telemetry.timer("scan.capture"):
+                self._capture.append(ADC_IN, self.samples[step])
+
+    def _finish(self):
+        """closes the capture, calculates the fill factor and dataframe and turns the light off
+        """
+        if self._capture:
+            self._capture.close()
+        # a stop only ends the scan it was meant for
+        self.stop_event.clear()
+        self.device.cancel_event = None
+
+        # calculates fill factor from the steps in order of ADC value
+        ordered = sort_by_adc(self.results)
+        self.FF = fill_factor(ordered)
         # Turns the data into a dataframe and prints it
-        dictionary = {"U pv": self.list_U_pv, "U ERR":self.list_U_err, "I pv": self.list_I_pv, "I ERR":self.list_I_err, "R":self.list_R}
-        self.df = pd.DataFrame(dictionary)
-        print(self.df)
+        self.df = results_dataframe(ordered)
+        if self.verbose:
+            print(self.df)
 
-        # turns the light off after the measurments are done
-        self.device.close()
+        # turns the light off after the measurments are done, the connection is kept open for the next scan
+        pool.release(self.device)
+        self._released = True
 
         return self.list_U_pv, self.list_U_0, self.list_I_pv, self.list_R, self.list_P, self.list_U_err, self.list_I_err, self.list_R_err, self.list_P_err, self.FF
 
-    def start_scan(self, start, stop, rep_num):
-        """Starts the scan as a thread
+    async def scan_async(self, start, stop, rep_num, capture_path=None, settle=None):
+        """Takes the same measurment as scan as a coroutine, the Arduino is used from its own I/O thread
+        so the event loop stays free. Cancelling the task ends the measurement at once, the step that was
+        being measured is dropped and the light is turned off in the background
+
+        Args:
+            start (integer): Starts the measurment at this value in ADC
+            stop (integer): Stops the measurment at this value in ADC
+            rep_num (integer): the amount of times that the measurment is repeated to ensure a better significance
+            capture_path (string): if filled every finished step is written to this capture file while measuring
+            settle (float or string): the time in seconds between setting the output and measuring it, or "adaptive"
+        """
+        # _prepare can take a new connection from the pool, so the I/O thread is only made for the connection after it
+        self._prepare(start, stop, rep_num, capture_path, settle)
+        device = AsyncArduinoDevice(self.device)
+
+        try:
+            try:
+                for ADC_IN in range(start, stop):
+                    if self.stop_event.is_set():
+                        break
+                    with telemetry.timer("scan.set_output"):
+                        await device.set_output_value(ADC_IN)
+                    if self.settle.delay() > 0:
+                        with telemetry.timer("scan.settle"):
+                            await asyncio.sleep(self.settle.delay())
+                    with telemetry.timer("scan.read"):
+                        readings = await device.read_channels(CHANNELS, repeats=rep_num)
+                    self.settle.observe(readings)
+                    self._publish_step(ADC_IN, readings)
+            except InterruptedError:
+                # stopped while a step was measured, that step is dropped
+                pass
+            except asyncio.CancelledError:
+                # the I/O thread finishes the current query first, then turns the light off
+                device.submit(self._finish)
+                raise
+
+            return await device.run(self._finish)
+        finally:
+            device.shutdown()
+
+    @property
+    def results(self):
+        """the derived values of every finished ADC step as a record array. Only the steps that finished since the last call are calculated,
+        the rows that were returned before never change so the array can be used while the scan goes on
+        """
+        return self.rows_since(0)[1]
+
+    def rows_since(self, sequence):
+        """gives the derived values of the steps that finished after the given sequence number, safe to call from another thread
+
+        Args:
+            sequence (integer): the amount of steps that the caller already has
+
+        Returns:
+            tuple: the new sequence number (the amount of finished steps) and a view on the rows from [sequence] up to it
+        """
+        with self._lock:
+            n = self.n_steps
+            if self._derived_steps < n:
+                done = self._derived_steps
+                with telemetry.timer("scan.reduce"):
+                    self._results[done:n] = derive_quantities(self.samples[done:n], self.adc_codes[done:n])
+                self._derived_steps = n
+            return n, self._results[sequence:n]
+
+    # the old list attributes are views on the record array
+    list_U_pv = _result_field("U_pv")
+    list_U_0 = _result_field("U_0")
+    list_I_pv = _result_field("I_pv")
+    list_R = _result_field("R")
+    list_P = _result_field("P")
+    list_U_err = _result_field("U_err")
+    list_I_err = _result_field("I_err")
+    list_R_err = _result_field("R_err")
+    list_P_err = _result_field("P_err")
+
+    def start_scan(self, start, stop, rep_num, capture_path=None, settle=None, cache=None):
+        """Starts the scan as a thread. The capture file is opened before the thread starts, so an error in opening it
+        is raised here
         """
+        self._prepare(start, stop, rep_num, capture_path, settle, cache)
         self._scan_thread = threading.Thread(
-            target=self.scan, args=(start, stop, rep_num)
+            target=self._scan_prepared, args=(start, stop, rep_num, cache)
         )
         self._scan_thread.start()
 
+    def stop(self):
+        """Ends the measurement, the step that is being measured is dropped after the query or burst that is in flight
+        """
+        self.stop_event.set()
+
+    @property
+    def is_running(self):
+        """True while a scan thread is measuring
+        """
+        return self._scan_thread is not None and self._scan_thread.is_alive()
+
@@ -0,0 +1,163 @@
+import glob
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pythondaq.analysis import maximum_power_point, results_from_table, sweep_summary
+
+# the columns of the summary table, one row per measurement
+SUMMARY_COLUMNS = ["file", "port", "steps", "FF", "P_max", "P_max_err", "U_mpp", "I_mpp", "U_oc", "I_sc"]
+
+# stored with the cache, rows of an older version of the analysis are calculated again
+ANALYSIS_VERSION = 1
+
+# the columns of U_pv, U_err, I_pv, I_err and R in a .csv saved by the GUI or save, and in one streamed by cli scan
+COLUMN_LAYOUTS = [("U pv", "U ERR", "I pv", "I ERR", "R"), ("U_pv", "U_err", "I_pv", "I_err", "R")]
+
+
+def analyze_file(path):
+    """calculates the summary of a saved measurement .csv, a file of several Arduinos gives a row per port.
+    Both the columns of a saved measurement and the rows that cli scan streams can be read
+
+    Args:
+        path (string): the name of the .csv file
+
+    Returns:
+        list: a dict per measurement with the values of SUMMARY_COLUMNS
+    """
+    # pandas is only needed here, it is imported in the worker process
+    import pandas as pd
+
+    df = pd.read_csv(path)
+    columns = next((layout for layout in COLUMN_LAYOUTS if set(layout) <= set(df.columns)), None)
+    if columns is None:
+        raise ValueError(f"{path} has none of the columns of a measurement")
+    # streamed steps are written in the order they finished
+    if "adc" in df.columns:
+        df = df.sort_values("adc", kind="stable")
+    groups = df.groupby("port", sort=False) if "port" in df.columns else [("", df)]
+
+    rows = []
+    for port, measurement in groups:
+        results = results_from_table(
+            *(measurement[name].to_numpy(float) for name in columns),
+            U_0=measurement["U_0"].to_numpy(float) if "U_0" in measurement.columns else None,
+        )
+        row = {"file": path, "port": port, "steps": len(results)}
+        row.update(sweep_summary(results))
+        row.update(maximum_power_point(results))
+        rows.append({name: _plain(row[name]) for name in SUMMARY_COLUMNS})
+    return rows
+
+
+def _plain(value):
+    """turns numpy numbers into python numbers so the row can be saved as json"""
+    return value.item() if hasattr(value, "item") else value
+
+
+def file_hash(path):
+    """gives the sha256 of the contents of a file
+
+    Args:
+        path (string): the name of the file
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class HashCache:
+    """Remembers the summary rows of every analysed file with the hash of its contents, so a file that didn't change
+    is not analysed again
+    """
+    def __init__(self, path):
+        """Reads the cache, an unreadable or old cache starts empty
+
+        Args:
+            path (string): the name of the json cache file
+        """
+        self.path = path
+        self.entries = {}
+        try:
+            with open(path) as file:
+                cache = json.load(file)
+            if cache.get("version") == ANALYSIS_VERSION:
+                self.entries = cache["files"]
+        except (FileNotFoundError, ValueError):
+            pass
+
+    def get(self, path, digest):
+        """gives the rows of a file if its contents didn't change, None otherwise
+        """
+        entry = self.entries.get(os.path.abspath(path))
+        if entry and entry["hash"] == digest:
+            return entry["rows"]
+        return None
+
+    def put(self, path, digest, rows):
+        self.entries[os.path.abspath(path)] = {"hash": digest, "rows": rows}
+
+    def save(self):
+        """writes the cache to a new file and swaps it in
+        """
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as file:
+            json.dump({"version": ANALYSIS_VERSION, "files": self.entries}, file)
+        os.replace(temporary, self.path)
+
+
+def expand(patterns):
+    """gives the files that match the glob patterns, every file once and in order
+
+    Args:
+        patterns (list): glob patterns like "Measurements/**/*.csv"
+    """
+    paths = []
+    for pattern in patterns:
+        paths += sorted(glob.glob(pattern, recursive=True))
+    return list(dict.fromkeys(path for path in paths if os.path.isfile(path)))
+
+
+def analyze(paths, cache=None, workers=None):
+    """analyses the files in a process pool and gives their summary rows as soon as they are ready,
+    the rows of unchanged files come from the cache right away
+
+    Args:
+        paths (list): the .csv files
+        cache (HashCache): the rows of earlier runs, nothing is cached if not given
+        workers (integer): the amount of processes, one per processor if not given
+
+    Yields:
+        dict: a row with the values of SUMMARY_COLUMNS, or with "file" and "error" for a file that can't be analysed
+    """
+    todo = {}
+    for path in paths:
+        digest = file_hash(path)
+        rows = cache.get(path, digest) if cache is not None else None
+        if rows is None:
+            todo[path] = digest
+        else:
+            yield from rows
+
+    if not todo:
+        return
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(analyze_file, path): path for path in todo}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    rows = future.result()
+                except (OSError, ValueError, KeyError) as error:
+                    # a file that isn't a saved measurement is reported and skipped
+                    yield {"file": path, "error": f"{type(error).__name__}: {error}"}
+                    continue
+                if cache is not None:
+                    cache.put(path, todo[path], rows)
+                yield from rows
+    finally:
+        if cache is not None:
+            cache.save()
@@ -0,0 +1,98 @@
+import numpy as np
+from pythondaq.calibration import ADC_RESOLUTION
+
+
+class FixedSettle:
+    """Waits the same time after every change of the output before measuring
+    """
+    def __init__(self, seconds=0.0):
+        """Sets up the settle time
+
+        Args:
+            seconds (float): the time in seconds between setting the output and the first measurment
+        """
+        self.seconds = seconds
+
+    def delay(self):
+        """gives the time to wait before the next step is measured
+        """
+        return self.seconds
+
+    def observe(self, readings):
+        """a fixed settle time doesn't learn from the readings
+        """
+
+
+class AdaptiveSettle:
+    """Learns the settle time from the readings. If the first repetition of a step is further from the others
+    than [threshold] times their spread, the circuit hadn't settled yet and the wait is doubled. Without drift
+    the wait slowly shrinks again.
+    """
+    def __init__(self, initial=0.0, maximum=0.05, threshold=3.0, step=0.0005, shrink=0.9):
+        """Sets up the settle time
+
+        Args:
+            initial (float): the first settle time in seconds
+            maximum (float): the longest settle time in seconds
+            threshold (float): the drift, in units of the spread of the other repetitions, that counts as unsettled
+            step (float): the settle time in seconds that is used when the first drift is seen at a settle time of 0
+            shrink (float): the factor that the settle time is multiplied with after a step without drift
+        """
+        self.seconds = initial
+        self.maximum = maximum
+        self.threshold = threshold
+        self.step = step
+        self.shrink = shrink
+
+    def delay(self):
+        """gives the time to wait before the next step is measured
+        """
+        return self.seconds
+
+    def observe(self, readings):
+        """compares the first repetition of a step with the others and adjusts the settle time
+
+        Args:
+            readings (numpy array): the voltages of the step with shape (repetitions, channels)
+        """
+        if len(readings) < 3:
+            return
+
+        first, rest = readings[0], readings[1:]
+        # a spread below one ADC step is as precise as the Arduino can measure
+        spread = np.maximum(rest.std(axis=0, ddof=1), ADC_RESOLUTION)
+        drift = np.abs(first - rest.mean(axis=0)) / spread
+
+        if (drift > self.threshold).any():
+            self.seconds = min(max(2 * self.seconds, self.step), self.maximum)
+        else:
+            self.seconds *= self.shrink
+            if self.seconds < self.step / 2:
+                self.seconds = 0.0
+
+
+def make_settle(settle):
+    """turns the settle argument of a scan into a settle model
+
+    Args:
+        settle (float, string or object): a settle time in seconds, also as text like "0.01", "adaptive", or a model with delay and observe
+
+    Returns:
+        object: the settle model
+    """
+    if settle is None:
+        return FixedSettle(0.0)
+    if settle == "adaptive":
+        return AdaptiveSettle()
+    if isinstance(settle, str):
+        try:
+            settle = float(settle)
+        except ValueError:
+            raise ValueError(f"settle must be a time in seconds or 'adaptive', not {settle!r}") from None
+    if isinstance(settle, (int, float)):
+        if not settle >= 0:
+            raise ValueError(f"settle must be a time of at least 0 seconds, not {settle}")
+        return FixedSettle(float(settle))
+    if not (hasattr(settle, "delay") and hasattr(settle, "observe")):
+        raise ValueError(f"settle must be a time in seconds, 'adaptive' or a model with delay and observe, not {settle!r}")
+    return settle
@@ -0,0 +1,167 @@
+import json
+import os
+import threading
+import time
+import uuid
+from pythondaq.capture import Capture, CaptureWriter
+
+# where the sweeps are kept if no other directory is given
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "pythondaq", "sweeps")
+
+
+class SweepCache:
+    """Keeps the captures of earlier sweeps on disk, so a sweep that was stopped can be resumed and a sweep can be
+    extended to a wider range by measuring only the ADC steps that are missing. A sweep is reused for the same Arduino
+    (by its identification) and rep_num when it was started less than [window] seconds ago, older sweeps are measured
+    again because the light on the cell may have changed. A sweep that finished is only reused to extend it, running the
+    same range again measures it again. The runs that were used longest ago are removed when there
+    are more than [max_runs] of them or they take more than [max_bytes] on disk.
+    """
+    def __init__(self, directory=DEFAULT_DIRECTORY, window=3600, max_runs=50, max_bytes=None):
+        """Opens or creates the cache directory
+
+        Args:
+            directory (string): the directory with the capture files and their index
+            window (float): the amount of seconds after its start that a sweep may be resumed or extended
+            max_runs (integer): the maximum amount of sweeps that is kept
+            max_bytes (integer): the maximum size of all captures together, no limit if not given
+        """
+        self.directory = directory
+        self.window = window
+        self.max_runs = max_runs
+        self.max_bytes = max_bytes
+        self._index_path = os.path.join(directory, "index.json")
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def runs(self):
+        """gives the index entries of all kept sweeps, with their identification, rep_num, range and times
+
+        Returns:
+            list: a dict per sweep
+        """
+        with self._lock:
+            return self._load()
+
+    def path(self, run):
+        """gives the capture file of a sweep
+
+        Args:
+            run (dict): the index entry of the sweep
+        """
+        return os.path.join(self.directory, run["file"])
+
+    def find(self, idn, rep_num, now=None, start=None, stop=None):
+        """gives the newest sweep of the Arduino with this rep_num that may still be reused
+
+        Args:
+            idn (string): the identification of the Arduino
+            rep_num (integer): the amount of repetitions per step
+            now (float): the time to compare with, the current time if not given
+            start (integer): the first ADC step of the new sweep, a finished sweep is only found for a range it doesn't cover
+            stop (integer): the ADC step after the last one
+
+        Returns:
+            dict: the index entry of the sweep, None if there is none
+        """
+        with self._lock:
+            return self._find(self._load(), idn, rep_num, time.time() if now is None else now, start, stop)
+
+    def mark_complete(self, path):
+        """remembers that the sweep of a capture file measured every step it was asked for
+
+        Args:
+            path (string): the capture file of the sweep
+        """
+        with self._lock:
+            runs = self._load()
+            for run in runs:
+                if self.path(run) == path:
+                    run["complete"] = True
+            self._save(runs)
+
+    def open(self, idn, rep_num, start, stop, channels, metadata=None):
+        """gives a capture writer for a sweep, which appends to the earlier sweep of this Arduino if there is one in the window
+
+        Args:
+            idn (string): the identification of the Arduino
+            rep_num (integer): the amount of repetitions per step
+            start (integer): the first ADC step of the new sweep
+            stop (integer): the ADC step after the last one
+            channels (integer): the amount of measured channels
+            metadata (dict): extra values to keep in the header of a new capture
+
+        Returns:
+            tuple: the CaptureWriter and the Capture with the steps that were already measured, None for a new sweep
+        """
+        with self._lock:
+            runs = self._load()
+            now = time.time()
+            run = self._find(runs, idn, rep_num, now, start, stop)
+
+            if run is None:
+                run = {"file": f"{uuid.uuid4().hex}.pvcap", "idn": idn, "rep_num": rep_num, "created": now, "start": start, "stop": stop}
+                runs.append(run)
+                header = dict(metadata or {}, idn=idn)
+                writer = CaptureWriter(self.path(run), rep_num, channels, metadata=header)
+                previous = None
+            else:
+                writer = CaptureWriter.resume(self.path(run))
+                previous = Capture(self.path(run))
+                run["start"] = min(run["start"], start)
+                run["stop"] = max(run["stop"], stop)
+
+            run["used"] = now
+            # until the new steps are measured too
+            run["complete"] = False
+            self._evict(runs, keep=run)
+            self._save(runs)
+        return writer, previous
+
+    def _find(self, runs, idn, rep_num, now, start=None, stop=None):
+        def extends(run):
+            return start is not None and (start < run["start"] or stop > run["stop"])
+
+        candidates = [
+            run for run in runs
+            if run["idn"] == idn and run["rep_num"] == rep_num and 0 <= now - run["created"] <= self.window
+            and (not run.get("complete") or extends(run)) and os.path.exists(self.path(run))
+        ]
+        return max(candidates, key=lambda run: run["created"], default=None)
+
+    def _evict(self, runs, keep):
+        """removes the sweeps that were used longest ago until the limits are met, never the sweep [keep]
+        """
+        runs[:] = [run for run in runs if os.path.exists(self.path(run))]
+        runs.sort(key=lambda run: run["used"])
+        sizes = {run["file"]: os.path.getsize(self.path(run)) for run in runs}
+        total = sum(sizes.values())
+
+        for run in list(runs):
+            if len(runs) <= self.max_runs and (self.max_bytes is None or total <= self.max_bytes):
+                break
+            if run is keep:
+                continue
+            runs.remove(run)
+            total -= sizes[run["file"]]
+            try:
+                os.remove(self.path(run))
+            except FileNotFoundError:
+                pass
+
+    def _load(self):
+        try:
+            with open(self._index_path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return []
+        except ValueError:
+            # an index that can't be read is started over
+            return []
+
+    def _save(self, runs):
+        # writes a new index and swaps it in, so a crash never leaves half an index
+        temporary = self._index_path + ".tmp"
+        with open(temporary, "w") as file:
+            json.dump(runs, file, indent=1)
+        os.replace(temporary, self._index_path)
@@ -0,0 +1,186 @@
+import bisect
+import json
+import threading
+import time
+
+# upper bounds of the histogram buckets in seconds, from 1 microsecond up to about 16 seconds
+BUCKETS = [1e-6 * 2 ** i for i in range(25)]
+
+
+class Histogram:
+    """Counts how many observed durations fall in every bucket, and keeps their sum, minimum and maximum
+    """
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, value):
+        """adds a duration
+
+        Args:
+            value (float): the duration in seconds
+        """
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def percentile(self, q):
+        """gives the upper bound of the bucket that holds the [q]th percentile
+
+        Args:
+            q (float): the percentile between 0 and 100
+
+        Returns:
+            float: the estimated percentile in seconds
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q / 100 * self.count
+        total = 0
+        for bound, count in zip(BUCKETS + [self.max], self.counts):
+            total += count
+            if total >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+        }
+
+
+class _Timer:
+    """times the block of a with statement into a histogram"""
+    __slots__ = ("telemetry", "name", "start")
+
+    def __init__(self, telemetry, name):
+        self.telemetry = telemetry
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.telemetry.observe(self.name, time.perf_counter() - self.start)
+
+
+class _NoTimer:
+    """stands in for a timer while the telemetry is disabled"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NO_TIMER = _NoTimer()
+
+
+class Telemetry:
+    """Opt-in counters and duration histograms for the acquisition loop. While disabled every call returns right away,
+    so the instrumentation can stay in the hot path.
+    """
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.reset()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        """forgets all counts and durations
+        """
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+
+    def count(self, name, amount=1):
+        """adds [amount] to the counter [name]
+        """
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, seconds):
+        """adds a duration to the histogram [name]
+        """
+        if self.enabled:
+            with self._lock:
+                if name not in self.histograms:
+                    self.histograms[name] = Histogram()
+                self.histograms[name].observe(seconds)
+
+    def timer(self, name):
+        """times a with block into the histogram [name]
+
+        Args:
+            name (string): the name of the stage, like "scan.read"
+        """
+        if self.enabled:
+            return _Timer(self, name)
+        return _NO_TIMER
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+            }
+
+    def to_json(self):
+        """gives all counters and histograms as JSON
+        """
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self):
+        """gives all counters and histograms in the Prometheus text format
+        """
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                metric = _metric_name(name) + "_total"
+                lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+            for name, histogram in sorted(self.histograms.items()):
+                metric = _metric_name(name) + "_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                total = 0
+                for bound, count in zip(BUCKETS, histogram.counts):
+                    total += count
+                    lines.append(f'{metric}_bucket{{le="{bound:.6g}"}} {total}')
+                lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+                lines.append(f"{metric}_sum {histogram.sum}")
+                lines.append(f"{metric}_count {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """gives a short line with the mean time per stage, for a status bar
+        """
+        with self._lock:
+            parts = [f"{name} {histogram.sum / histogram.count * 1e3:.2f} ms x{histogram.count}" for name, histogram in sorted(self.histograms.items())]
+        return "   ".join(parts)
+
+
+def _metric_name(name):
+    return "pythondaq_" + name.replace(".", "_").replace("-", "_")
+
+
+# the telemetry that the device, experiment and GUI report to
+telemetry = Telemetry()
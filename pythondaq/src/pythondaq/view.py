@@ -1,8 +1,11 @@
-from pythondaq.diode_experiment import DiodeExperiment
+from pythondaq.pv_experiment import DiodeExperiment
 
 def measurement():
     """takes the measurment with given values
     """
+    # matplotlib is only needed for the graph, importing it at the top would slow down every start
+    import matplotlib.pyplot as plt
+
     # port is automatically ASRL4::INSTR
     port = "ASRL4::INSTR"
     experiment = DiodeExperiment(port=port)
@@ -10,5 +13,10 @@ def measurement():
     # takes the measurment with ADC values as start and stop
     # repeats the measurments 10 times
     # doesnt save the dataframe or graph
+    experiment.scan(start=0, stop=1024, rep_num=10)
+
     # graph is shown 
-    experiment.scan(start=0, stop=1024, rep_num=10, ms_name="", graph=True)
\ No newline at end of file
+    plt.errorbar(experiment.list_U_pv, experiment.list_I_pv, xerr=experiment.list_U_err, yerr=experiment.list_I_err, fmt="o")
+    plt.xlabel("Voltage U_pv(V)")
+    plt.ylabel("Current I_pv(A)")
+    plt.show()
\ No newline at end of file
@@ -0,0 +1,13 @@
+import pytest
+
+from pythondaq import calibration
+
+
+@pytest.fixture(autouse=True)
+def calibration_store(tmp_path, monkeypatch):
+    """points the calibration store at an empty file, so the tests don't read the calibration of the user"""
+    path = str(tmp_path / "calibration.json")
+    monkeypatch.setattr(calibration, "DEFAULT_PATH", path)
+    # the cli that is started as a new process finds the file of the user from HOME
+    monkeypatch.setenv("HOME", str(tmp_path))
+    return path
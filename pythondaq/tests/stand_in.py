@@ -0,0 +1,117 @@
+import re
+import time
+from nsp2visasim.sim_pyvisa import SIM_DEVICES, SimulatedDevice
+from pyvisa.constants import StatusCode
+from pyvisa.errors import VisaIOError
+from pythondaq.frames import encode_frame
+
+
+class StandInDevice(SimulatedDevice):
+    """An nsp2visasim device that also answers the optional firmware commands, for tests and benchmarks of the
+    features that the simulator doesn't know. Like the simulator it plays back recorded data, it reads the recorded
+    data and setting of SimulatedDevice directly so it follows the version of nsp2visasim that is installed.
+    """
+    def __init__(self, port="ASRL::SIMPV::INSTR", capabilities=("BURST",), settle_time=0.0):
+        """Loads the recorded data of a simulated device
+
+        Args:
+            port (string): the nsp2visasim resource whose data is played back
+            capabilities (tuple): the optional features that the stand-in announces and answers
+            settle_time (float): for this many seconds after the output changes the inputs still read the previous output,
+                like a circuit that hasn't settled yet
+        """
+        super().__init__(*SIM_DEVICES[port])
+        self.capabilities = [name.upper() for name in capabilities]
+        self.settle_time = settle_time
+        self._previous_setting = 0
+        self._changed_at = 0.0
+        # the sequence number of the last binary frame and the bytes that were written but not read yet
+        self._sequence = 0xFFFF
+        self._output = bytearray()
+
+    def query(self, query):
+        """Write a command to the device and return the response.
+
+        Args:
+            query (str): the command to send to the device.
+
+        Returns:
+            str: the device's response, bytes for a binary frame.
+        """
+        if re.match(r"\*IDN\?", query) and self.capabilities:
+            return f"{super().query(query)} [{','.join(self.capabilities)}]"
+        elif "BURST" in self.capabilities and (match := re.match(r"MEAS:CH(?P<channel>\d+):BURST\? (?P<amount>\d+)", query)):
+            # the board samples in a tight loop and answers once
+            samples = [self._next_value(match["channel"]) for _ in range(int(match["amount"]))]
+            time.sleep(0.001)
+            return ",".join(map(str, samples))
+        elif "BIN" in self.capabilities and (match := re.match(r"MEAS:BIN\? (?P<channels>[\d,]+) (?P<amount>\d+)", query)):
+            channels = match["channels"].split(",")
+            codes = [int(self._next_value(channel)) for _ in range(int(match["amount"])) for channel in channels]
+            time.sleep(0.001)
+            self._sequence = (self._sequence + 1) & 0xFFFF
+            return encode_frame(self._sequence, codes)
+        elif (match := re.match(r"OUT:CH0 (?P<value>\d+)", query)) and int(match["value"]) != self.setting:
+            self._previous_setting = self.setting
+            self._changed_at = time.perf_counter()
+        return super().query(query)
+
+    def write(self, command):
+        """sends a command, its reply waits in the output until it is read with read_bytes
+
+        Args:
+            command (str): the command to send to the device.
+        """
+        reply = self.query(command)
+        self._output += reply if isinstance(reply, bytes) else f"{reply}\r\n".encode()
+
+    def read_bytes(self, count):
+        """reads [count] bytes of the replies that were written, like a serial port that times out when they aren't there
+
+        Args:
+            count (int): the amount of bytes to read.
+
+        Returns:
+            bytes: the bytes that were read.
+        """
+        if len(self._output) < count:
+            self._output.clear()
+            raise VisaIOError(StatusCode.error_timeout)
+        data = bytes(self._output[:count])
+        del self._output[:count]
+        return data
+
+    def read_raw(self):
+        """reads the replies that were written up to the next termination, like a serial port that times out when there is none
+
+        Returns:
+            bytes: the bytes that were read.
+        """
+        end = self._output.find(b"\n")
+        if end < 0:
+            self._output.clear()
+            raise VisaIOError(StatusCode.error_timeout)
+        data = bytes(self._output[:end + 1])
+        del self._output[:end + 1]
+        return data
+
+    def _get_input_value(self, channel):
+        """measures the previous output while the circuit is settling"""
+        if time.perf_counter() - self._changed_at >= self.settle_time:
+            return super()._get_input_value(channel)
+        setting, self.setting = self.setting, self._previous_setting
+        try:
+            return super()._get_input_value(channel)
+        finally:
+            self.setting = setting
+
+    def _next_value(self, channel):
+        """returns the next recorded value of a channel like _get_input_value, without its delay per value"""
+        setting = self.setting
+        if time.perf_counter() - self._changed_at < self.settle_time:
+            setting = self._previous_setting
+        ch_idx = f"ch{channel}"
+        idx = self.idxs.setdefault(setting, {}).setdefault(ch_idx, 0)
+        values = self.data[str(setting % 1024)][ch_idx]
+        self.idxs[setting][ch_idx] = (idx + 1) % len(values)
+        return values[idx % len(values)]
@@ -0,0 +1,230 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from pythondaq import arduino_device
+from pythondaq.arduino_device import ArduinoVISADevice, DevicePool, list_devices, parse_capabilities
+from pythondaq.frames import encode_frame, fletcher16
+from pythondaq.telemetry import Telemetry
+from stand_in import StandInDevice
+
+PORT = "ASRL::SIMPV::INSTR"
+
+
+class EchoDevice:
+    """answers every command with a reply that can be traced back to it"""
+    def __init__(self):
+        self.pending = []
+
+    def query(self, command):
+        return self._reply(command)
+
+    def write(self, command):
+        self.pending.append(self._reply(command))
+
+    def read(self):
+        return self.pending.pop(0)
+
+    def _reply(self, command):
+        if command == "*IDN?":
+            return "echo"
+        return command[len("MEAS:CH")]
+
+
+def test_read_channels_shape():
+    device = ArduinoVISADevice(PORT)
+    device.set_output_value(800)
+    readings = device.read_channels([1, 2], repeats=5)
+    assert readings.shape == (5, 2)
+    assert device.pipelined is False
+    device.close()
+
+
+def test_read_channels_pipelined_keeps_order():
+    device = ArduinoVISADevice(PORT)
+    device.device = EchoDevice()
+    device.pipeline_depth = 3
+    raw = device.read_channels_raw([1, 2], repeats=4)
+    assert device.pipelined is True
+    np.testing.assert_array_equal(raw, [[1, 2]] * 4)
+
+
+def test_pool_reuses_healthy_connection():
+    pool = DevicePool()
+    device = pool.acquire(PORT)
+    pool.release(device)
+    assert pool.acquire(PORT) is device
+
+    # a connection that no longer answers is replaced
+    pool.release(device)
+    device.device.close()
+    assert pool.acquire(PORT) is not device
+
+
+def test_pool_evicts_idle_connections():
+    pool = DevicePool(idle_timeout=0)
+    device = pool.acquire(PORT)
+    pool.release(device)
+    time.sleep(0.01)
+    assert pool.acquire(PORT) is not device
+    assert not device.is_healthy()
+
+
+def test_list_devices_is_cached():
+    assert list_devices() is list_devices()
+    assert PORT in list_devices(max_age=0)
+
+
+def test_parse_capabilities():
+    assert parse_capabilities("Simulated Arduino VISA firmware (photovoltaic cell)") == set()
+    assert parse_capabilities("Arduino VISA firmware v1.1 [burst, BIN]") == {"BURST", "BIN"}
+
+
+def test_burst_read_uses_one_query_per_channel():
+    device = ArduinoVISADevice(PORT)
+    device.device = StandInDevice(PORT)
+    device.burst_size = 8
+    assert device.capabilities == {"BURST"}
+
+    queries = []
+    query = device._query_once
+    device._query_once = lambda command: queries.append(command) or query(command)
+    device.set_output_value(800)
+    readings = device.read_channels_raw([1, 2], repeats=20)
+
+    assert readings.shape == (20, 2)
+    # one query to set the output, then 3 bursts of at most 8 samples per channel
+    assert len(queries) == 1 + 2 * 3
+    assert not np.isnan(readings).any()
+
+
+def test_sweep_queues_next_output_before_last_reply():
+    device = ArduinoVISADevice(PORT)
+    echo = EchoDevice()
+    device.device = echo
+    device.pipeline_depth = 3
+
+    # logs the commands and reads in the order they happen
+    log = []
+    write, read = echo.write, echo.read
+    echo.write = lambda command: log.append(command) or write(command)
+    echo.read = lambda: log.append("read") or read()
+
+    steps = list(device.sweep([10, 11, 12], [1, 2], repeats=2))
+    assert [value for value, _ in steps] == [10, 11, 12]
+    for _, readings in steps:
+        np.testing.assert_allclose(readings, np.array([[1, 2]] * 2) * 3.3 / 1023)
+
+    # the output of 11 is written while replies of 10 are still outstanding
+    out_11 = log.index("OUT:CH0 11")
+    assert log[out_11 + 1:].count("read") > log[out_11 + 1:].count("MEAS:CH1?") + log[out_11 + 1:].count("MEAS:CH2?")
+    assert not echo.pending
+
+
+def test_sweep_stopped_early_reads_every_reply():
+    device = ArduinoVISADevice(PORT)
+    device.device = EchoDevice()
+    steps = device.sweep(range(100), [1, 2], repeats=3)
+    next(steps)
+    steps.close()
+    assert not device.device.pending
+
+    # one repetition fits the default pipeline with the next output behind it
+    assert len(list(device.sweep(range(5), [1, 2]))) == 5
+    assert not device.device.pending
+
+
+def test_fletcher16():
+    # the check values of the Fletcher-16 reference
+    assert fletcher16(b"abcde") == 0xC8F0
+    assert fletcher16(b"abcdef") == 0x2057
+
+
+def test_binary_read_matches_burst_read():
+    devices = []
+    for capabilities in [("BURST",), ("BURST", "BIN")]:
+        device = ArduinoVISADevice(PORT)
+        device.device = StandInDevice(PORT, capabilities=capabilities)
+        device.burst_size = 8
+        device.set_output_value(800)
+        devices.append(device)
+    text, binary = devices
+    assert not text.uses_binary() and binary.uses_binary()
+
+    np.testing.assert_array_equal(binary.read_channels_raw([1, 2], repeats=20), text.read_channels_raw([1, 2], repeats=20))
+    np.testing.assert_array_equal(binary.read_channels_raw([2], repeats=1), text.read_channels_raw([2], repeats=1))
+    # the frames of 8, 8, 4 and 1 repetitions were counted without a gap
+    assert binary._sequence == 3
+    assert not binary.device._output
+
+    # a setup without binary frames is still read as text
+    binary.binary = False
+    assert binary.read_channels_raw([1, 2], repeats=3).shape == (3, 2)
+
+
+def test_binary_read_rejects_bad_frames():
+    device = ArduinoVISADevice(PORT)
+    device.device = StandInDevice(PORT, capabilities=("BIN",))
+    device.retries = 0
+    device.read_channels_raw([1, 2], repeats=2)
+
+    # a flipped bit in a code
+    query = device.device.query
+    def corrupted(command):
+        frame = bytearray(query(command))
+        frame[6] ^= 0x04
+        return bytes(frame)
+    device.device.query = corrupted
+    with pytest.raises(ValueError, match="checksum"):
+        device.read_channels_raw([1, 2], repeats=2)
+
+    # a frame that went missing
+    device.device.query = lambda command: encode_frame(device._sequence + 2, [1, 2])
+    with pytest.raises(ValueError, match="follows frame"):
+        device.read_channels_raw([1, 2], repeats=1)
+
+
+def test_bad_frame_is_read_again(monkeypatch):
+    counters = Telemetry()
+    counters.enable()
+    monkeypatch.setattr(arduino_device, "telemetry", counters)
+    device = ArduinoVISADevice(PORT)
+    device.device = StandInDevice(PORT, capabilities=("BIN",))
+    device.backoff = 0
+    device.read_channels_raw([1, 2], repeats=2)
+
+    # the first frame has a flipped bit, the resync finds the stream back with *IDN?
+    query = device.device.query
+    def corrupted_once(command):
+        reply = query(command)
+        if isinstance(reply, bytes) and not counters.counters.get("visa.retries"):
+            reply = bytearray(reply)
+            reply[6] ^= 0x04
+        return bytes(reply) if isinstance(reply, bytearray) else reply
+    device.device.query = corrupted_once
+    assert device.read_channels_raw([1, 2], repeats=2).shape == (2, 2)
+
+    summary = counters.to_dict()["counters"]
+    assert summary["visa.bad_frames"] == summary["visa.retries"] == summary["visa.resyncs"] == 1
+    assert "visa.failures" not in summary
+    assert not device.device._output
+
+
+def test_cancel_ends_a_reading_between_bursts():
+    device = ArduinoVISADevice(PORT)
+    device.device = StandInDevice(PORT)
+    device.burst_size = 8
+    device.cancel_event = threading.Event()
+
+    queries = []
+    query = device._query_once
+    def query_and_cancel(command):
+        queries.append(command)
+        device.cancel_event.set()
+        return query(command)
+    device._query_once = query_and_cancel
+    with pytest.raises(InterruptedError):
+        device.read_channels_raw([1, 2], repeats=100)
+    assert len(queries) == 1
@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+from pythondaq.arduino_device import pool
+from pythondaq.async_device import AsyncArduinoDevice
+from pythondaq.multi_device import MultiDeviceExperiment
+from pythondaq.pv_experiment import DiodeExperiment
+
+PORT = "ASRL::SIMPV::INSTR"
+
+
+def test_async_device_reads():
+    async def read():
+        device = await AsyncArduinoDevice.open(PORT)
+        await device.set_output_value(700)
+        readings = await device.read_channels([1, 2], repeats=3)
+        await device.close()
+        return readings
+
+    assert asyncio.run(read()).shape == (3, 2)
+
+
+def test_scan_async_matches_scan():
+    experiment = DiodeExperiment(PORT)
+    asyncio.run(experiment.scan_async(500, 530, 2))
+    assert experiment.n_steps == 30
+    assert len(experiment.df) == 30
+
+
+def test_scan_async_after_the_pool_was_emptied():
+    experiment = DiodeExperiment(PORT)
+    asyncio.run(experiment.scan_async(500, 510, 2))
+    # the connection of the first scan is closed, the second scan takes a new one from the pool
+    pool.close_all()
+    asyncio.run(experiment.scan_async(500, 510, 2))
+    assert experiment.n_steps == 10
+
+
+def test_scan_async_cancels_quickly():
+    experiment = DiodeExperiment(PORT)
+
+    async def cancel():
+        task = asyncio.create_task(experiment.scan_async(0, 1024, 10))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        cancelled = time.perf_counter()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return time.perf_counter() - cancelled
+
+    assert asyncio.run(cancel()) < 0.05
+    assert experiment.n_steps < 1024
+
+
+def test_multi_device_scan_async():
+    experiment = MultiDeviceExperiment([PORT, "ASRL::SIMPV_BRIGHT::INSTR"])
+    df = asyncio.run(experiment.scan_async(500, 510, 2))
+    assert len(df) == 20
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from pythondaq.arduino_device import ArduinoVISADevice
+from pythondaq.calibration import ADC_CODES, ADC_RESOLUTION, Calibration, CalibrationStore
+from stand_in import StandInDevice
+
+PORT = "ASRL::SIMPV::INSTR"
+
+
+def test_ideal_conversion():
+    raw = np.array([[0, 1023], [512, 7]])
+    np.testing.assert_allclose(Calibration().to_volt(raw, [1, 2]), raw * 3.3 / 1023)
+
+
+def test_from_sweep_corrects_offset_and_nonlinearity():
+    # an ADC that reads 4 codes high, 2% too steep and bends in the middle
+    reference = np.linspace(0.1, 3.2, 200)
+    ideal = reference / ADC_RESOLUTION
+    codes = 4 + 1.02 * ideal + 3 * np.sin(np.pi * ideal / ADC_CODES)
+
+    calibration = Calibration.from_sweep(2, reference, codes, idn="board")
+    np.testing.assert_allclose(calibration.to_volt(np.round(codes).astype(int)[:, None], [2])[:, 0], reference, atol=ADC_RESOLUTION)
+    # the other channels keep the ideal conversion
+    assert calibration.calibrated == {2}
+    np.testing.assert_allclose(calibration.table[1], np.arange(ADC_CODES) * ADC_RESOLUTION)
+
+
+def test_device_uses_the_stored_calibration(tmp_path):
+    path = str(tmp_path / "stored.json")
+    device = ArduinoVISADevice(PORT, calibration_path=path)
+    device.device = StandInDevice(PORT)
+    idn = device.get_identification()
+
+    # a table that reads every code of channel 1 as twice its ideal voltage
+    CalibrationStore(path).put(Calibration({1: 2 * np.arange(ADC_CODES) * ADC_RESOLUTION}, idn=idn))
+
+    device.set_output_value(800)
+    raw = device.read_channels_raw([1, 2], repeats=4)
+    device.device = StandInDevice(PORT)
+    device.set_output_value(800)
+    np.testing.assert_allclose(device.read_channels([1, 2], repeats=4), raw * [2, 1] * ADC_RESOLUTION)
+
+
+def test_codes_outside_the_table_are_rejected():
+    calibration = Calibration()
+    for code in (-3, 1024, 9023):
+        with pytest.raises(ValueError, match="outside"):
+            calibration.to_volt(np.array([[code, 5]]), [1, 2])
+
+
+def test_garbled_code_is_read_again():
+    device = ArduinoVISADevice(PORT)
+    device.device = StandInDevice(PORT)
+    device.backoff = 0
+    device.burst_size = 8
+
+    # the first burst has a digit too many, like a reply with a garbled byte
+    query = device.device.query
+    garbled = []
+    def garble_once(command):
+        reply = query(command)
+        if "BURST" in command and not garbled:
+            garbled.append(reply)
+            reply = "9" + reply
+        return reply
+    device.device.query = garble_once
+    readings = device.read_channels_raw([1, 2], repeats=8)
+    assert garbled and readings.shape == (8, 2)
+    assert readings.min() >= 0 and readings.max() <= 1023
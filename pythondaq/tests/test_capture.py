@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from pythondaq.analysis import derive_quantities
+from pythondaq.capture import CaptureWriter, open_capture
+
+SAVED_CSV = os.path.join(os.path.dirname(__file__), "..", "src", "pythondaq", "Measurements", "Test.csv")
+
+
+def test_capture_roundtrip(tmp_path):
+    path = tmp_path / "scan.pvcap"
+    samples = np.random.default_rng(1).uniform(0.1, 3.3, size=(10, 3, 2))
+
+    with CaptureWriter(path, rep_num=3, channels=2, metadata={"port": "test"}) as writer:
+        for step, adc_code in enumerate(range(100, 110)):
+            writer.append(adc_code, samples[step])
+
+    capture = open_capture(path)
+    assert capture.header["port"] == "test"
+    assert isinstance(capture.records, np.memmap)
+    np.testing.assert_array_equal(capture.adc_codes, np.arange(100, 110))
+    np.testing.assert_array_equal(capture.samples, samples)
+    np.testing.assert_array_equal(capture.results(chunk_size=4), derive_quantities(samples, np.arange(100, 110)))
+
+
+def test_capture_ignores_partial_record(tmp_path):
+    path = tmp_path / "crashed.pvcap"
+    writer = CaptureWriter(path, rep_num=2, channels=2)
+    writer.append(5, np.ones((2, 2)))
+    writer.append(6, np.ones((2, 2)))
+    writer.close()
+    # a crash halfway through writing the second record
+    os.truncate(path, os.path.getsize(path) - 7)
+
+    assert len(open_capture(path)) == 1
+
+    # resuming cuts off the partial record and appends after the complete one
+    with CaptureWriter.resume(path) as writer:
+        writer.append(7, np.zeros((2, 2)))
+    np.testing.assert_array_equal(open_capture(path).adc_codes, [5, 7])
+
+
+def test_capture_csv_matches_saved_measurements(tmp_path):
+    path = tmp_path / "scan.pvcap"
+    with CaptureWriter(path, rep_num=2, channels=2) as writer:
+        writer.append(0, np.full((2, 2), 1.0))
+    open_capture(path).to_csv(tmp_path / "scan.csv")
+
+    saved = pd.read_csv(SAVED_CSV)
+    assert list(pd.read_csv(tmp_path / "scan.csv").columns) == list(saved.columns)
@@ -0,0 +1,117 @@
+import json
+import time
+
+import numpy as np
+import pytest
+from pyvisa.errors import VisaIOError
+from pythondaq import arduino_device, emulator
+from pythondaq.arduino_device import ArduinoVISADevice, list_devices
+from pythondaq.emulator import EmulatorServer, PVResponse, emulated_resources
+from pythondaq.multi_device import MultiDeviceExperiment
+from pythondaq.pv_experiment import DiodeExperiment
+
+
+def test_response_follows_the_load():
+    response = PVResponse()
+    U_code, I_code = np.array([response.codes(setting) for setting in range(0, 1024, 16)]).T
+    # open circuit with the transistor off, the voltage only drops once it conducts
+    assert U_code[0] > 600 and I_code[0] < 1
+    assert np.all(np.diff(U_code) <= 1e-3)
+    assert np.all(np.diff(I_code) >= -1e-3)
+
+
+def test_emulators_are_listed(tmp_path, monkeypatch):
+    registry = str(tmp_path / "emulators.json")
+    monkeypatch.setattr(emulator, "REGISTRY_PATH", registry)
+    with EmulatorServer(3, registry=registry, seed=0) as server:
+        assert emulated_resources() == server.resources
+        assert set(server.resources) <= set(list_devices(max_age=0))
+    assert emulated_resources() == []
+
+
+@pytest.mark.parametrize("transport", ["tcp", "pty"])
+def test_read_channels(tmp_path, transport):
+    with EmulatorServer(1, transport=transport, registry=None, seed=0, noise=0.0) as server:
+        device = ArduinoVISADevice(server.resources[0])
+        try:
+            assert device.get_identification().startswith("Emulated Arduino")
+            device.set_output_value(0)
+            assert device.uses_binary()
+            binary = device.read_channels_raw([1, 2], 20)
+            device.binary = False
+            text = device.read_channels_raw([1, 2], 20)
+            assert binary.shape == text.shape == (20, 2)
+            assert (binary == text).all()
+            assert binary[0, 0] > 600
+        finally:
+            device.device.close()
+
+
+def test_scan_on_many_emulated_devices(tmp_path):
+    with EmulatorServer(4, registry=None, seed=1, latency=0.001) as server:
+        experiment = MultiDeviceExperiment(server.resources)
+        df = experiment.scan(500, 620, 2, step=8)
+        assert sorted(df["port"].unique()) == sorted(server.resources)
+        assert (df.groupby("port").size() == 15).all()
+        assert set(experiment.FF) == set(server.resources)
+        arduino_device.pool.close_all()
+
+
+def test_dropped_replies_time_out():
+    with EmulatorServer(1, registry=None, seed=0, faults={"drop": 1.0}) as server:
+        device = ArduinoVISADevice(server.resources[0])
+        device.timeout = 0.2
+        device.retries = 1
+        try:
+            with pytest.raises(VisaIOError):
+                device.get_identification()
+        finally:
+            device.device.close()
+        # the query and the query again, without a known identification the resync only throws the late replies away
+        assert server.boards[0].injected["drop"] == 2
+
+
+def test_garbled_frames_and_stalls_are_read_again():
+    faults = {"garble": 0.2, "stall": 0.1}
+    with EmulatorServer(1, registry=None, seed=2, noise=0.0, faults=faults, stall_time=0.3) as server:
+        device = ArduinoVISADevice(server.resources[0])
+        device.timeout = 0.2
+        device.retries = 5
+        device.burst_size = 4
+        try:
+            device.get_identification()
+            device.set_output_value(0)
+            clean = np.rint(server.boards[0].response.codes(0))
+            for _ in range(10):
+                np.testing.assert_array_equal(device.read_channels_raw([1, 2], 8), np.tile(clean, (8, 1)))
+        finally:
+            device.device.close()
+        assert server.boards[0].injected["garble"] and server.boards[0].injected["stall"]
+
+
+def test_stop_ends_the_step_that_is_measured():
+    with EmulatorServer(1, registry=None, seed=0, sample_time=1e-4) as server:
+        experiment = DiodeExperiment(server.resources[0])
+        experiment.verbose = False
+        # a step of 2000 repetitions takes 0.4 s
+        experiment.start_scan(0, 1024, 2000)
+        time.sleep(0.6)
+        stopped = time.perf_counter()
+        experiment.stop()
+        experiment._scan_thread.join(2)
+        assert time.perf_counter() - stopped < 0.2
+        assert 1 <= experiment.n_steps <= 2
+        arduino_device.pool.close_all()
+
+
+def test_discovery_never_signals_processes_on_windows(tmp_path, monkeypatch):
+    registry = str(tmp_path / "emulators.json")
+    with open(registry, "w") as file:
+        json.dump({"1:1": {"pid": 1, "resources": ["TCPIP::127.0.0.1::1::SOCKET"]}}, file)
+
+    def kill(pid, signal):
+        raise AssertionError("os.kill ends the process on Windows")
+    monkeypatch.setattr(emulator, "_WINDOWS", True)
+    monkeypatch.setattr(emulator.os, "kill", kill)
+    monkeypatch.setattr(emulator, "_alive_windows", lambda pid: pid == 1)
+    assert emulated_resources(registry) == ["TCPIP::127.0.0.1::1::SOCKET"]
@@ -0,0 +1,39 @@
+import io
+import json
+
+import numpy as np
+
+from pythondaq.analysis import derive_quantities
+from pythondaq.export import ROW_FIELDS, guess_format, open_stream
+
+
+def make_rows():
+    samples = np.array([[[1.0, 0.5], [1.2, 0.7]], [[2.0, 0.0], [np.nan, np.nan]]])
+    adc_codes = np.array([10, 11])
+    return adc_codes, derive_quantities(samples, adc_codes)
+
+
+def test_csv_stream_writes_a_header_once():
+    file = io.StringIO()
+    stream = open_stream(file, "csv")
+    stream.write("COM1", *make_rows())
+    stream.write("COM2", *make_rows())
+    lines = file.getvalue().splitlines()
+    assert lines[0] == ",".join(ROW_FIELDS)
+    assert len(lines) == 5
+    assert lines[3].startswith("COM2,10,")
+
+
+def test_ndjson_stream_writes_valid_json():
+    file = io.StringIO()
+    open_stream(file, "ndjson").write("COM1", *make_rows())
+    rows = [json.loads(line) for line in file.getvalue().splitlines()]
+    assert [row["adc"] for row in rows] == [10, 11]
+    assert list(rows[0]) == ROW_FIELDS
+    np.testing.assert_allclose(rows[0]["U_pv"], 3.3)
+
+
+def test_guess_format():
+    assert guess_format("meting.ndjson") == "ndjson"
+    assert guess_format("meting.PARQUET") == "parquet"
+    assert guess_format("meting") == "csv"
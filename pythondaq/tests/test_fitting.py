@@ -0,0 +1,51 @@
+import numpy as np
+
+from pythondaq.analysis import RESULT_DTYPE
+from pythondaq.fitting import FIT_DTYPE, _derive, fit_results, fit_single_diode, model_current
+
+
+def make_cells():
+    cells = np.zeros(3, dtype=FIT_DTYPE)
+    cells["I_L"] = [0.035, 0.03, 0.02]
+    cells["I_0"] = [1e-9, 5e-10, 2e-9]
+    cells["a"] = 0.3
+    cells["R_s"] = [1.0, 2.0, 0.5]
+    cells["R_sh"] = [2000, 1000, 5000]
+    _derive(cells)
+    return cells
+
+
+def test_fit_recovers_curves_in_one_batch():
+    cells = make_cells()
+    rng = np.random.default_rng(0)
+    U = np.linspace(0, 1, 300) * cells["U_oc"][:, None]
+    # the last sweep has half the steps, the rest is padded
+    U[2] = np.nan
+    U[2, :150] = np.linspace(0, cells["U_oc"][2], 150)
+    I = model_current(cells, np.nan_to_num(U)) + rng.normal(0, 3e-4, U.shape)
+    U = U + rng.normal(0, 0.01, U.shape)
+
+    fit = fit_single_diode(U, I, 0.01, 3e-4)
+    assert fit["converged"].all()
+    np.testing.assert_allclose(fit["chi2"], 1, atol=0.2)
+    for name in ["U_oc", "I_sc", "P_max", "FF"]:
+        np.testing.assert_allclose(fit[name], cells[name], rtol=0.02)
+
+
+def test_warm_start_takes_fewer_iterations():
+    cells = make_cells()[:1]
+    U = np.linspace(0, cells["U_oc"][0], 100)
+    I = model_current(cells, U)[0] + np.random.default_rng(1).normal(0, 3e-4, U.shape)
+    results = np.zeros(len(U), dtype=RESULT_DTYPE)
+    results["U_pv"], results["I_pv"], results["U_err"], results["I_err"] = U, I, 0.01, 3e-4
+
+    cold = fit_results(results[:-1])
+    warm = fit_results(results, initial=cold)
+    assert warm["converged"][0] and warm["iterations"][0] < cold["iterations"][0]
+    np.testing.assert_allclose(warm["FF"], fit_results(results)["FF"], rtol=1e-3)
+
+    # a nan I_L starts that sweep from a fresh guess, sweeps of different length are padded
+    fresh = np.zeros(1, dtype=FIT_DTYPE)
+    fresh["I_L"] = np.nan
+    both = fit_results([results, results[::2]], initial=np.concatenate([cold, fresh]))
+    assert len(both) == 2 and both["converged"].all()
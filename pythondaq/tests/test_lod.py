@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from pythondaq.capture import CaptureWriter
+from pythondaq.lod import MinMaxLOD, SavedMeasurement
+from pythondaq.monitor import TimeSeriesStore
+
+
+def make_lod(n=1_000_000):
+    y = np.sin(np.arange(n) / 5000)
+    y[654_321] = 7
+    reads = []
+    lod = MinMaxLOD(lambda begin, end: reads.append(end - begin) or (np.arange(begin, end), y[begin:end]), n, chunk_size=1 << 16)
+    return lod, y, reads
+
+
+def test_view_is_bounded_and_keeps_peaks():
+    lod, y, reads = make_lod()
+    for x_min, x_max in [(0, 1e6), (6e5, 7e5), (654_000, 655_000)]:
+        reads.clear()
+        x, values = lod.view(x_min, x_max, max_points=1000)
+        assert len(x) <= 1000
+        assert values.max() == 7
+        # the view is covered up to the last bucket, which is at most a few pixels wide
+        assert x[0] <= x_min and x[-1] >= min(x_max, 999_999) - 4 * (x_max - x_min) / 500
+        # zoomed out nothing is read from the series again
+        assert sum(reads) <= lod.reread * 1000
+
+
+def test_view_zoomed_in_gives_every_point():
+    lod, y, _ = make_lod()
+    x, values = lod.view(1000, 1100, max_points=1000)
+    np.testing.assert_array_equal(values, y[x.astype(int)])
+    assert np.all(np.diff(x) == 1)
+
+
+def test_saved_measurement_opens_captures_and_histories(tmp_path):
+    with CaptureWriter(str(tmp_path / "sweep.pvcap"), 2, 2) as writer:
+        for code in range(100):
+            writer.append(code, np.full((2, 2), code / 100))
+    capture = SavedMeasurement(str(tmp_path / "sweep.pvcap"))
+    assert len(capture) == 100 and "U_pv" in capture.fields
+    x, U_pv = capture.lod("U_pv").view(0, 99)
+    np.testing.assert_allclose(U_pv, 3 * np.arange(100) / 100)
+
+    store = TimeSeriesStore(str(tmp_path / "monitor.pvts"))
+    for moment in range(10):
+        store.append({"time": 1000 + moment, "FF": 0.5, "P_max": 0.1, "U_oc": 6, "I_sc": 0.01})
+    store.close()
+    history = SavedMeasurement(str(tmp_path / "monitor.pvts"))
+    assert history.fields[0] == "FF"
+    assert history.lod("FF").x_range == (1000, 1009)
+
+    (tmp_path / "other.csv").write_text("U pv\n1\n")
+    with pytest.raises(ValueError):
+        SavedMeasurement(str(tmp_path / "other.csv"))
@@ -0,0 +1,63 @@
+import os
+import time
+
+import numpy as np
+from click.testing import CliRunner
+
+from pythondaq.analysis import sweep_summary
+from pythondaq.cli import diode_group
+from pythondaq.monitor import SUMMARY_DTYPE, Monitor, TimeSeriesStore
+from pythondaq.pv_experiment import DiodeExperiment
+
+PORT = "ASRL::SIMPV::INSTR"
+
+
+def test_store_appends_and_ignores_partial_record(tmp_path):
+    path = tmp_path / "history.pvts"
+    store = TimeSeriesStore(path)
+    for moment in range(3):
+        store.append({"time": moment, "FF": 0.5, "P_max": 1.0, "U_oc": 2.0, "I_sc": 3.0})
+    store.close()
+    # a crash halfway through writing a record
+    with open(path, "ab") as file:
+        file.write(b"\x00" * 5)
+
+    store = TimeSeriesStore(path)
+    np.testing.assert_array_equal(store.read()["time"], [0, 1, 2])
+    store.append({"time": 3, "FF": 0.5, "P_max": 1.0, "U_oc": 2.0, "I_sc": 3.0})
+    assert len(store) == 4
+    assert os.path.getsize(path) == 8 + 4 * SUMMARY_DTYPE.itemsize
+
+
+def test_monitor_keeps_summaries_and_a_window_of_curves(tmp_path):
+    experiment = DiodeExperiment(PORT)
+    experiment.verbose = False
+    monitor = Monitor(experiment, 600, 610, 2, tmp_path / "history.pvts", interval=0, window=2)
+    summaries = []
+    monitor.run(count=3, callback=summaries.append)
+
+    history = monitor.history()
+    assert len(history) == 3 and len(monitor.curves) == 2
+    np.testing.assert_allclose(history["FF"], [summary["FF"] for summary in summaries])
+    assert history["P_max"][-1] == sweep_summary(monitor.curves[-1][1])["P_max"]
+
+
+def test_monitor_stops_between_sweeps(tmp_path):
+    experiment = DiodeExperiment(PORT)
+    experiment.verbose = False
+    monitor = Monitor(experiment, 600, 605, 1, tmp_path / "history.pvts", interval=60)
+    monitor.start_monitor()
+    while monitor.sweeps == 0:
+        time.sleep(0.01)
+    monitor.stop()
+    monitor._thread.join(timeout=5)
+    assert not monitor.is_running
+    assert not experiment.stop_event.is_set()
+
+
+def test_cli_rejects_a_bad_interval_or_count(tmp_path):
+    output = tmp_path / "monitor.pvts"
+    for option in (["-i", "0"], ["-i", "-1"], ["-n", "-1"]):
+        result = CliRunner().invoke(diode_group, ["monitor", "-d", PORT, *option, "-o", str(output)])
+        assert result.exit_code == 2 and option[0] in result.output
+    assert not output.exists()
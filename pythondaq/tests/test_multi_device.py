@@ -0,0 +1,52 @@
+import pytest
+
+from pythondaq.arduino_device import pool
+from pythondaq.multi_device import MultiDeviceExperiment
+
+PORTS = ["ASRL::SIMPV::INSTR", "ASRL::SIMPV_BRIGHT::INSTR"]
+
+
+def test_scan_merges_devices():
+    experiment = MultiDeviceExperiment(PORTS)
+    df = experiment.scan(500, 520, 2)
+
+    assert sorted(df["port"].unique()) == sorted(PORTS)
+    assert (df.groupby("port").size() == 20).all()
+    assert df["IDN"].str.startswith("Simulated Arduino").all()
+    assert set(experiment.FF) == set(PORTS)
+
+
+def test_skip_failures(capsys):
+    experiment = MultiDeviceExperiment(["ASRL::SIMPV::INSTR", "ASRL::NOPE::INSTR"], skip_failures=True)
+    assert list(experiment.experiments) == ["ASRL::SIMPV::INSTR"]
+    assert list(experiment.skipped) == ["ASRL::NOPE::INSTR"]
+    # the caller reports the skipped ports, nothing is printed between the rows
+    assert "skipping" not in capsys.readouterr().out
+
+
+def test_failure_hands_the_opened_devices_back():
+    pool.close_all()
+    with pytest.raises(ValueError):
+        MultiDeviceExperiment(["ASRL::SIMPV::INSTR", "ASRL::NOPE::INSTR"])
+    # the connection to the first Arduino is idle in the pool again
+    assert len(pool._idle["ASRL::SIMPV::INSTR"]) == 1
+
+
+def test_stream_gives_steps_while_measuring():
+    experiment = MultiDeviceExperiment(PORTS)
+    seen = {port: [] for port in PORTS}
+    for port, adc_codes, results in experiment.stream(500, 540, 2, step=4):
+        assert len(adc_codes) == len(results)
+        seen[port] += adc_codes.tolist()
+
+    for port in PORTS:
+        assert seen[port] == list(range(500, 540, 4))
+    assert set(experiment.FF) == set(PORTS)
+
+
+def test_stream_closed_early_stops_the_sweeps():
+    experiment = MultiDeviceExperiment(PORTS[:1])
+    steps = experiment.stream(0, 1024, 2)
+    next(steps)
+    steps.close()
+    assert experiment.experiments[PORTS[0]].n_steps < 1024
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from pythondaq.analysis import derive_quantities, fill_factor
+from pythondaq.pv_experiment import DiodeExperiment
+
+PORT = "ASRL::SIMPV::INSTR"
+
+
+def test_derive_quantities():
+    samples = np.array([[[1.0, 0.5], [1.2, 0.7]], [[2.0, 0.0], [2.0, 0.0]]])
+    results = derive_quantities(samples, np.array([10, 11]))
+
+    np.testing.assert_allclose(results["U_pv"], [3.3, 6.0])
+    np.testing.assert_allclose(results["U_err"], [0.3, 0.0])
+    np.testing.assert_allclose(results["I_pv"], [0.6 / 4.7, 0.0])
+    np.testing.assert_allclose(results["P"], [(0.5 + 0.84) / 2, 0.0])
+    np.testing.assert_allclose(results["U_0"], np.array([10, 11]) * 3.3 / 1023)
+    # no current means the resistance is set to 5000 Ohm
+    assert results["R"][1] == 5000
+    # the error of the resistance is the spread of the resistance samples
+    np.testing.assert_allclose(results["R_err"], [np.std([3 * 4.7 / 0.5, 3 * 1.2 * 4.7 / 0.7]), 0.0])
+
+
+def test_fill_factor_without_current_is_nan():
+    # the last step has no current, like a sweep in the dark
+    samples = np.array([[[1.0, 0.5], [1.2, 0.7]], [[2.0, 0.0], [2.0, 0.0]]])
+    with np.errstate(all="raise"):
+        assert np.isnan(fill_factor(derive_quantities(samples, np.array([10, 11]))))
+
+
+def test_scan_lists_are_views():
+    experiment = DiodeExperiment(PORT)
+    experiment.scan(600, 620, 2)
+
+    assert len(experiment.list_U_pv) == 20
+    assert experiment.samples.shape == (20, 2, 2)
+    assert np.shares_memory(experiment.list_I_pv, experiment.results)
+    assert experiment.FF == fill_factor(experiment.results)
+
+
+def test_rows_since_is_consistent_while_scanning():
+    experiment = DiodeExperiment(PORT)
+    experiment.start_scan(0, 200, 2)
+
+    sequence = 0
+    while experiment.is_running or sequence < experiment.n_steps:
+        n, rows = experiment.rows_since(sequence)
+        assert len(rows) == n - sequence
+        assert not np.isnan(rows["U_pv"]).any()
+        sequence = n
+
+    assert sequence == 200
+
+
+def test_stop_ends_scan():
+    experiment = DiodeExperiment(PORT)
+    experiment.start_scan(0, 1024, 5)
+    experiment.stop()
+    experiment._scan_thread.join()
+
+    assert not experiment.is_running
+    assert experiment.n_steps < 1024
+
+
+def test_adaptive_scan_uses_fewer_steps():
+    experiment = DiodeExperiment(PORT)
+    experiment.adaptive_scan(400, 700, 3, coarse_step=32)
+    adc_codes = experiment.adc_codes[:experiment.n_steps]
+
+    assert 0 < experiment.n_steps < 300
+    assert len(np.unique(adc_codes)) == experiment.n_steps
+    assert list(experiment.df.columns) == ["U pv", "U ERR", "I pv", "I ERR", "R"]
+    assert len(experiment.df) == experiment.n_steps
+
+
+def test_adaptive_scan_without_steps_hands_the_arduino_back():
+    experiment = DiodeExperiment(PORT)
+    experiment.stop()
+    experiment.adaptive_scan(400, 700, 3)
+    assert experiment.n_steps == 0 and np.isnan(experiment.FF)
+    assert experiment._released and not experiment.stop_event.is_set()
+
+    experiment.adaptive_scan(500, 500, 3)
+    assert experiment.n_steps == 0 and experiment._released
+
+
+def test_failed_scan_hands_the_arduino_back(monkeypatch):
+    experiment = DiodeExperiment(PORT)
+
+    def broken(*args):
+        raise ValueError("garbled reply")
+        yield
+    # the connection is shared through the pool, the test puts it back after
+    monkeypatch.setattr(experiment.device, "sweep", broken)
+    experiment.stop_event.set()
+    with pytest.raises(ValueError):
+        experiment.scan(600, 620, 2)
+    assert experiment._released and not experiment.stop_event.is_set()
+
+
+def test_start_scan_raises_a_capture_error_before_the_thread(tmp_path):
+    experiment = DiodeExperiment(PORT)
+    with pytest.raises(OSError):
+        experiment.start_scan(600, 620, 2, str(tmp_path / "missing" / "capture.pvcap"))
+    assert experiment._released and experiment._scan_thread is None
@@ -0,0 +1,64 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+
+from pythondaq.analysis import results_from_table
+from pythondaq.reanalysis import HashCache, analyze, analyze_file, expand
+
+SAVED_CSV = os.path.join(os.path.dirname(__file__), "..", "src", "pythondaq", "Measurements", "Test.csv")
+
+
+def test_results_from_table_propagates_power_error():
+    results = results_from_table(np.array([2.0]), np.array([0.1]), np.array([0.5]), np.array([0.02]), np.array([4.0]))
+    assert results["P"][0] == 1.0
+    np.testing.assert_allclose(results["P_err"], [np.hypot(0.5 * 0.1, 2.0 * 0.02)])
+
+
+def test_analyze_file_gives_a_row_per_port(tmp_path):
+    saved = pd.read_csv(SAVED_CSV, index_col=0)
+    pd.concat([saved.assign(port="A"), saved.assign(port="B")]).to_csv(tmp_path / "two.csv")
+
+    (single,) = analyze_file(SAVED_CSV)
+    rows = analyze_file(str(tmp_path / "two.csv"))
+    assert [row["port"] for row in rows] == ["A", "B"]
+    assert rows[0]["FF"] == single["FF"] and single["steps"] == len(saved)
+    assert single["P_max"] == (saved["U pv"] * saved["I pv"]).max()
+
+
+def test_analyze_skips_unchanged_files(tmp_path):
+    for name in ["a.csv", "b.csv"]:
+        shutil.copy(SAVED_CSV, tmp_path / name)
+    (tmp_path / "broken.csv").write_text("x,y\n1,2\n")
+    paths = expand([str(tmp_path / "*.csv")])
+    cache = HashCache(str(tmp_path / "cache.json"))
+
+    rows = list(analyze(paths, cache=cache, workers=2))
+    assert sorted(row["file"] for row in rows if "error" not in row) == paths[:2]
+    assert [row["file"] for row in rows if "error" in row] == [paths[2]]
+
+    # rows of unchanged files come from the cache, a changed file is analysed again
+    cache = HashCache(str(tmp_path / "cache.json"))
+    for entry in cache.entries.values():
+        entry["rows"][0]["FF"] = "cached"
+    with open(tmp_path / "b.csv", "a") as file:
+        file.write("1024,6.0,0.0,0.0,0.0,5000\n")
+    rows = {row["file"]: row for row in analyze(paths[:2], cache=cache, workers=2)}
+    assert rows[paths[0]]["FF"] == "cached"
+    assert rows[paths[1]]["steps"] == 1025
+
+
+def test_analyze_reads_the_output_of_cli_scan(tmp_path):
+    output = tmp_path / "scan.csv"
+    subprocess.run(
+        [sys.executable, "-m", "pythondaq.cli", "scan", "-d", "ASRL::SIMPV::INSTR", "-s", "1.6", "-e", "2.0", "-r", "2", "-o", str(output)],
+        capture_output=True, check=True,
+    )
+    streamed = pd.read_csv(output)
+
+    (row,) = analyze_file(str(output))
+    assert row["port"] == "ASRL::SIMPV::INSTR" and row["steps"] == len(streamed)
+    assert row["P_max"] == (streamed["U_pv"] * streamed["I_pv"]).max()
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+from pythondaq.arduino_device import ArduinoVISADevice
+from pythondaq.cli import diode_group
+from pythondaq.settle import AdaptiveSettle, FixedSettle, make_settle
+from stand_in import StandInDevice
+
+PORT = "ASRL::SIMPV::INSTR"
+
+
+def test_make_settle():
+    assert make_settle(None).delay() == 0
+    assert make_settle(0.002).delay() == 0.002
+    assert isinstance(make_settle("adaptive"), AdaptiveSettle)
+    settle = FixedSettle(0.1)
+    assert make_settle(settle) is settle
+
+
+def test_adaptive_settle_follows_the_drift():
+    settle = AdaptiveSettle(step=0.001, maximum=0.004)
+    settled = np.array([[1.0, 0.5], [1.01, 0.5], [0.99, 0.5], [1.0, 0.51]])
+    drifting = settled.copy()
+    drifting[0] = [0.2, 0.1]
+
+    settle.observe(drifting)
+    assert settle.delay() == 0.001
+    for _ in range(3):
+        settle.observe(drifting)
+    assert settle.delay() == 0.004
+
+    for _ in range(50):
+        settle.observe(settled)
+    assert settle.delay() == 0
+
+
+def test_settle_removes_bias_of_first_repetition():
+    device = ArduinoVISADevice(PORT)
+    device.device = StandInDevice(PORT, capabilities=(), settle_time=0.0015)
+
+    def first_repetition_bias(settle):
+        readings = np.array([readings for _, readings in device.sweep(range(0, 1000, 100), [1], 4, settle)])
+        return np.abs(readings[:, 0] - readings[:, 1:].mean(axis=1)).max()
+
+    assert first_repetition_bias(None) > 0.1
+    assert first_repetition_bias(FixedSettle(0.002)) < 0.1
+
+
+def test_make_settle_parses_and_rejects_text():
+    assert make_settle("0.01").delay() == 0.01
+    for settle in ("foo", "-1", object()):
+        with pytest.raises(ValueError, match="settle"):
+            make_settle(settle)
+
+
+def test_scan_rejects_a_bad_settle_before_opening_anything(tmp_path):
+    output = tmp_path / "scan.csv"
+    result = CliRunner().invoke(diode_group, ["scan", "-d", PORT, "--settle", "foo", "-o", str(output)])
+    assert result.exit_code == 2 and "--settle" in result.output
+    assert not output.exists()
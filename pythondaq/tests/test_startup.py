@@ -0,0 +1,59 @@
+import subprocess
+import sys
+
+# the sum of the top level import times of `cli list`, in microseconds, generous for slow lab machines
+LIST_IMPORT_BUDGET = 1_000_000
+
+HEAVY_MODULES = {"pandas", "matplotlib", "PySide6", "pyqtgraph"}
+
+
+def import_times(*args):
+    """runs the cli with -X importtime and returns the cumulative import time of every top level module"""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "pythondaq.cli", *args],
+        capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # nested imports are indented by two spaces per level after the separator
+        times[name[1:].rstrip()] = int(cumulative)
+    return times
+
+
+def top_level(times):
+    return {name: time for name, time in times.items() if not name.startswith(" ")}
+
+
+def imported(times):
+    return {name.strip().split(".")[0] for name in times}
+
+
+def test_help_only_imports_click():
+    times = import_times("--help")
+    assert not imported(times) & (HEAVY_MODULES | {"pyvisa", "numpy"})
+
+
+def test_list_stays_within_budget():
+    times = import_times("list")
+    assert not imported(times) & HEAVY_MODULES
+    assert sum(top_level(times).values()) < LIST_IMPORT_BUDGET
+
+
+def test_scan_never_imports_a_window(tmp_path):
+    output = tmp_path / "scan.ndjson"
+    times = import_times("scan", "-d", "ASRL::SIMPV::INSTR", "-s", "2", "-e", "2.1", "-r", "1", "-o", str(output))
+    assert not imported(times) & {"matplotlib", "PySide6", "pyqtgraph"}
+    assert len(output.read_text().splitlines()) == 32
+
+
+def test_scan_on_a_wrong_port_leaves_no_file(tmp_path):
+    output = tmp_path / "scan.csv"
+    process = subprocess.run(
+        [sys.executable, "-m", "pythondaq.cli", "scan", "-d", "ASRL::NOPE::INSTR", "-o", str(output)],
+        capture_output=True, text=True,
+    )
+    assert process.returncode != 0
+    assert not output.exists()
@@ -0,0 +1,96 @@
+import os
+import time
+
+import numpy as np
+
+from pythondaq.pv_experiment import DiodeExperiment
+from pythondaq.sweep_cache import SweepCache
+
+PORT = "ASRL::SIMPV::INSTR"
+
+
+def test_scan_resumes_and_extends(tmp_path):
+    cache = SweepCache(tmp_path)
+    experiment = DiodeExperiment(PORT)
+
+    # a finished sweep over the first steps is kept in the cache, a sweep over a wider range extends it
+    experiment.scan(600, 610, 2, cache=cache)
+    first = experiment.samples[:10].copy()
+
+    experiment.scan(600, 620, 2, cache=cache)
+    assert experiment.n_steps == 20
+    np.testing.assert_array_equal(experiment.samples[:10], first)
+    np.testing.assert_array_equal(np.sort(experiment.adc_codes), np.arange(600, 620))
+
+    # a wider range only measures the new steps and keeps the old ones
+    experiment.scan(590, 630, 2, cache=cache)
+    assert experiment.n_steps == 40
+    assert len(cache.runs()) == 1
+    assert (cache.runs()[0]["start"], cache.runs()[0]["stop"]) == (590, 630)
+    assert len(np.unique(experiment.adc_codes)) == 40
+
+    # another rep_num is another sweep
+    experiment.scan(600, 602, 3, cache=cache)
+    assert len(cache.runs()) == 2
+
+
+def test_finished_sweep_is_measured_again(tmp_path):
+    cache = SweepCache(tmp_path)
+    experiment = DiodeExperiment(PORT)
+    experiment.scan(600, 610, 2, cache=cache)
+    first_path = experiment.capture_path
+    assert cache.runs()[0]["complete"]
+
+    # the same range again is a new sweep, not the old data
+    experiment.scan(600, 610, 2, cache=cache)
+    assert experiment.capture_path != first_path
+    assert experiment.n_steps == 10
+    assert len(cache.runs()) == 2
+    assert cache.find(experiment.idn, 2, start=600, stop=610) is None
+
+
+def test_stopped_sweep_is_resumed(tmp_path):
+    cache = SweepCache(tmp_path)
+    experiment = DiodeExperiment(PORT)
+
+    # a sweep that was stopped before its end is not complete
+    experiment.stop_event.set()
+    experiment.scan(600, 610, 2, cache=cache)
+    assert not cache.runs()[0]["complete"]
+
+    experiment.scan(600, 610, 2, cache=cache)
+    assert experiment.n_steps == 10 and len(cache.runs()) == 1
+    assert cache.runs()[0]["complete"]
+
+
+def test_unfinished_sweep_is_resumed(tmp_path):
+    cache = SweepCache(tmp_path)
+    writer, _ = cache.open("idn", 2, 0, 10, 2)
+    writer.close()
+    assert cache.find("idn", 2, start=0, stop=10) is not None
+    cache.mark_complete(cache.path(cache.runs()[0]))
+    assert cache.find("idn", 2, start=0, stop=10) is None
+    assert cache.find("idn", 2, start=0, stop=20) is not None
+
+
+def test_old_sweeps_are_not_reused(tmp_path):
+    cache = SweepCache(tmp_path, window=60)
+    writer, previous = cache.open("idn", 2, 0, 10, 2)
+    writer.close()
+    assert previous is None
+    assert cache.find("idn", 2) is not None
+    assert cache.find("idn", 2, now=time.time() + 120) is None
+    assert cache.find("other", 2) is None
+
+
+def test_least_recently_used_sweeps_are_evicted(tmp_path):
+    cache = SweepCache(tmp_path, max_runs=2)
+    for rep_num in [1, 2, 3]:
+        writer, _ = cache.open("idn", rep_num, 0, 10, 2)
+        writer.close()
+    # using the first sweep again keeps it
+    cache.open("idn", 2, 0, 10, 2)[0].close()
+    cache.open("idn", 4, 0, 10, 2)[0].close()
+
+    assert sorted(run["rep_num"] for run in cache.runs()) == [2, 4]
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".pvcap")]) == 2
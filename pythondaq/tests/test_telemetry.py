@@ -0,0 +1,26 @@
+from pythondaq.telemetry import Telemetry
+
+
+def test_disabled_telemetry_records_nothing():
+    telemetry = Telemetry()
+    with telemetry.timer("scan.read"):
+        telemetry.count("visa.queries")
+    assert telemetry.to_dict() == {"counters": {}, "histograms": {}}
+
+
+def test_counters_and_histograms():
+    telemetry = Telemetry()
+    telemetry.enable()
+    telemetry.count("visa.queries", 3)
+    for seconds in (0.001, 0.002, 0.004):
+        telemetry.observe("scan.read", seconds)
+
+    summary = telemetry.to_dict()
+    assert summary["counters"] == {"visa.queries": 3}
+    assert summary["histograms"]["scan.read"]["count"] == 3
+    assert abs(summary["histograms"]["scan.read"]["sum"] - 0.007) < 1e-12
+
+    text = telemetry.to_prometheus()
+    assert "pythondaq_visa_queries_total 3" in text
+    assert 'pythondaq_scan_read_seconds_bucket{le="+Inf"} 3' in text
+    assert "pythondaq_scan_read_seconds_count 3" in text